@@ -0,0 +1,178 @@
+"""
+Vectorised acoustic features for 16 kHz mono PCM: framing, log-mel
+energies, MFCCs, voiced-frame detection and DTW alignment.
+
+Everything is plain NumPy. Feature extraction takes a batch of clips,
+frames them all and runs a single FFT and filterbank product over every
+frame at once.
+"""
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .audio_decode import PCM_SAMPLE_RATE
+
+FRAME_LENGTH = 400  # 25 ms
+HOP_LENGTH = 160  # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 13
+PRE_EMPHASIS = 0.97
+# A frame counts as voiced when it is this loud, in dB relative to full scale...
+VOICED_FLOOR_DBFS = -50.0
+# ...within this many dB of the clip's loudest frame...
+VOICED_RANGE_DB = 35.0
+# ...and this far above the background noise (the clip's quietest frames)
+NOISE_MARGIN_DB = 6.0
+# A clip this quiet with no louder moments is only background noise
+NOISE_CEILING_DBFS = -30.0
+
+
+def hop_seconds(sample_rate: int = PCM_SAMPLE_RATE) -> float:
+    """Duration of one feature frame step."""
+    return HOP_LENGTH / float(sample_rate)
+
+
+@lru_cache(maxsize=4)
+def mel_filterbank(
+    sample_rate: int = PCM_SAMPLE_RATE, n_fft: int = N_FFT, n_mels: int = N_MELS
+) -> np.ndarray:
+    """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)."""
+
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    low, high = hz_to_mel(20.0), hz_to_mel(min(7600.0, sample_rate / 2))
+    edges = mel_to_hz(np.linspace(low, high, n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    left, centre, right = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - left) / (centre - left)
+    falling = (right - bins) / (right - centre)
+    return np.maximum(0.0, np.minimum(rising, falling))
+
+
+@lru_cache(maxsize=4)
+def dct_matrix(n_mfcc: int = N_MFCC, n_mels: int = N_MELS) -> np.ndarray:
+    """Orthonormal DCT-II basis, shape (n_mfcc, n_mels)."""
+    k = np.arange(n_mfcc)[:, None]
+    n = np.arange(n_mels)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+@lru_cache(maxsize=4)
+def _window(length: int = FRAME_LENGTH) -> np.ndarray:
+    return np.hamming(length)
+
+
+def frame(pcm: np.ndarray) -> np.ndarray:
+    """Overlapping frames of a clip (a view, no copy), shape (frames, FRAME_LENGTH)."""
+    samples = np.asarray(pcm)
+    if len(samples) < FRAME_LENGTH:
+        samples = np.pad(samples, (0, FRAME_LENGTH - len(samples)))
+    windows = np.lib.stride_tricks.sliding_window_view(samples, FRAME_LENGTH)
+    return windows[::HOP_LENGTH]
+
+
+def frame_energy_db(pcm: np.ndarray) -> np.ndarray:
+    """RMS level of each frame in dBFS."""
+    frames = frame(pcm).astype(np.float64) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-6))
+
+
+def voiced_mask(energy_db: np.ndarray) -> np.ndarray:
+    """Frames loud enough, absolutely and relative to the peak and noise, to be speech."""
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    peak = float(energy_db.max())
+    noise = float(np.percentile(energy_db, 10))
+    if peak - noise < NOISE_MARGIN_DB and peak < NOISE_CEILING_DBFS:
+        # Quiet, steady background noise throughout: nothing stands out as speech
+        return np.zeros(len(energy_db), dtype=bool)
+    # Never demand more than peak - 20 dB, so a clip with no pauses still counts
+    threshold = max(
+        VOICED_FLOOR_DBFS, peak - VOICED_RANGE_DB, min(noise + NOISE_MARGIN_DB, peak - 20.0)
+    )
+    return energy_db >= threshold
+
+
+def voiced_bounds(pcm: np.ndarray) -> Tuple[int, int, int]:
+    """
+    (first, end, voiced) frame indices of the speech in a clip: the span
+    from the first to the last voiced frame, and how many frames in it
+    are voiced. (0, 0, 0) when nothing is.
+    """
+    mask = voiced_mask(frame_energy_db(pcm))
+    idx = np.flatnonzero(mask)
+    if len(idx) == 0:
+        return 0, 0, 0
+    return int(idx[0]), int(idx[-1]) + 1, int(len(idx))
+
+
+def log_mel_batch(clips: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """Log-mel energies for several clips, shape (frames, N_MELS) each."""
+    if not clips:
+        return []
+    framed = [frame(np.asarray(pcm, dtype=np.float64)) for pcm in clips]
+    counts = [len(f) for f in framed]
+    frames = np.concatenate(framed) / 32768.0
+    # Pre-emphasis within each frame, then window and one FFT for every frame
+    frames = np.concatenate([frames[:, :1], frames[:, 1:] - PRE_EMPHASIS * frames[:, :-1]], axis=1)
+    spectrum = np.fft.rfft(frames * _window(), n=N_FFT)
+    power = (spectrum.real**2 + spectrum.imag**2) / N_FFT
+    mel = np.log(power @ mel_filterbank().T + 1e-10)
+    return np.split(mel, np.cumsum(counts)[:-1])
+
+
+def mfcc_batch(clips: Sequence[np.ndarray], normalise: bool = True) -> List[np.ndarray]:
+    """
+    MFCCs (without c0) for several clips, shape (frames, N_MFCC - 1) each.
+    With `normalise`, each clip's coefficients are mean/variance normalised,
+    which removes most of the microphone and level differences.
+    """
+    basis = dct_matrix()[1:].T
+    out = []
+    for mel in log_mel_batch(clips):
+        coeffs = mel @ basis
+        if normalise and len(coeffs) > 1:
+            coeffs = (coeffs - coeffs.mean(axis=0)) / (coeffs.std(axis=0) + 1e-8)
+        out.append(coeffs.astype(np.float32))
+    return out
+
+
+def dtw_distance(a: np.ndarray, b: np.ndarray, band: float = 0.3) -> float:
+    """
+    Length-normalised DTW distance between two feature sequences.
+
+    The local cost matrix is built in one broadcast. The accumulation
+    sweeps anti-diagonals, so each Python step updates a whole diagonal
+    at once. `band` limits warping to that fraction of the longer
+    sequence (Sakoe-Chiba), plus the length difference.
+    """
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return float("inf")
+    diff = a[:, None, :].astype(np.float64) - b[None, :, :]
+    cost = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+    width = max(abs(n - m), int(band * max(n, m))) + 1
+
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for k in range(2, n + m + 1):
+        i = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j = k - i
+        # Sakoe-Chiba band around the scaled diagonal
+        keep = np.abs(i * m / n - j) <= width
+        i, j = i[keep], j[keep]
+        if len(i) == 0:
+            continue
+        best = np.minimum(np.minimum(acc[i - 1, j - 1], acc[i - 1, j]), acc[i, j - 1])
+        acc[i, j] = cost[i - 1, j - 1] + best
+    return float(acc[n, m] / (n + m))
@@ -0,0 +1,138 @@
+"""In-process audio decoding to 16 kHz mono PCM, and compact Opus encoding."""
+
+import io
+import shutil
+import subprocess
+from typing import List
+
+import numpy as np
+
+# PyAV is imported on first use (see load_av); None means it isn't installed
+_NOT_LOADED = object()
+av = _NOT_LOADED
+
+# Azure expects 16 kHz, 16-bit, mono PCM
+PCM_SAMPLE_RATE = 16000
+PCM_DTYPE = np.int16
+# Speech stays intelligible and scoreable well below this
+DEFAULT_OPUS_BITRATE = 24000
+OPUS_CONTENT_TYPE = "audio/webm"
+
+
+class DecodeError(ValueError):
+    """Raised when an upload cannot be decoded into PCM."""
+
+
+def load_av():
+    """Import PyAV if it hasn't been yet; returns the module or None."""
+    global av  # pylint: disable=global-statement
+    if av is _NOT_LOADED:
+        try:
+            import av as module  # pylint: disable=import-error,import-outside-toplevel
+        except ImportError:  # pragma: no cover - exercised only without PyAV installed
+            module = None
+        av = module
+    return av
+
+
+def decode_pcm(data: bytes, sample_rate: int = PCM_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an in-memory recording (webm/opus, mp4/aac, wav, ...) into a
+    1-D int16 NumPy array of mono PCM at `sample_rate`.
+
+    Uses libav in-process through PyAV when available, otherwise a single
+    piped ffmpeg process. Neither path writes an intermediate file.
+    """
+    if not data:
+        raise DecodeError("Empty audio upload")
+    if load_av() is not None:
+        return _decode_with_av(data, sample_rate)
+    return _decode_with_ffmpeg(data, sample_rate)
+
+
+def _decode_with_av(data: bytes, sample_rate: int) -> np.ndarray:
+    """Decode and resample with libav inside this process."""
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+    chunks: List[np.ndarray] = []
+    try:
+        with av.open(io.BytesIO(data), mode="r") as container:
+            if not container.streams.audio:
+                raise DecodeError("Upload contains no audio stream")
+            for frame in container.decode(audio=0):
+                for out in resampler.resample(frame):
+                    chunks.append(out.to_ndarray().reshape(-1))
+        # Drain samples buffered inside the resampler
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
+    except av.error.FFmpegError as exc:
+        raise DecodeError(f"Could not decode audio: {exc}") from exc
+
+    if not chunks:
+        return np.zeros(0, dtype=PCM_DTYPE)
+    # One copy into the final contiguous buffer
+    return np.concatenate(chunks).astype(PCM_DTYPE, copy=False)
+
+
+def _decode_with_ffmpeg(data: bytes, sample_rate: int) -> np.ndarray:
+    """Fallback: pipe the upload through one ffmpeg process, no temp files."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise DecodeError("Neither PyAV nor ffmpeg is available for decoding")
+    proc = subprocess.run(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            "pipe:0",
+            "-f",
+            "s16le",
+            "-acodec",
+            "pcm_s16le",
+            "-ac",
+            "1",
+            "-ar",
+            str(sample_rate),
+            "pipe:1",
+        ],
+        input=data,
+        capture_output=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        message = proc.stderr.decode("utf-8", "replace").strip()
+        raise DecodeError(f"Could not decode audio: {message}")
+    # frombuffer wraps ffmpeg's output without copying it again
+    return np.frombuffer(proc.stdout, dtype=PCM_DTYPE)
+
+
+def pcm_duration(pcm: np.ndarray, sample_rate: int = PCM_SAMPLE_RATE) -> float:
+    """Length of a PCM buffer in seconds."""
+    return len(pcm) / float(sample_rate)
+
+
+def encode_opus(
+    pcm: np.ndarray,
+    bitrate: int = DEFAULT_OPUS_BITRATE,
+    sample_rate: int = PCM_SAMPLE_RATE,
+) -> bytes:
+    """
+    Encode mono int16 PCM as Opus in a WebM container, which browsers
+    play back directly. Requires PyAV.
+    """
+    if load_av() is None:
+        raise DecodeError("PyAV is required to encode Opus")
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=sample_rate, layout="mono")
+        stream.bit_rate = bitrate
+        if len(pcm):
+            samples = np.ascontiguousarray(pcm, dtype=PCM_DTYPE).reshape(1, -1)
+            frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+            frame.sample_rate = sample_rate
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
@@ -2,15 +2,22 @@
 
 import os
 from datetime import datetime, timezone
-from typing import BinaryIO, Dict, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from bson import ObjectId  # pylint: disable=import-error
 from dotenv import load_dotenv  # pylint: disable=import-error
 from gridfs import GridFS  # pylint: disable=import-error
-from pymongo import MongoClient  # pylint: disable=import-error
+from pymongo import ASCENDING, DESCENDING, DeleteOne, MongoClient, UpdateOne  # pylint: disable=import-error
 
 load_dotenv()
 
+# Weight of the newest score in a spell's exponential moving average
+EMA_ALPHA = 0.3
+# How many recent scores each stats document keeps
+RECENT_SCORES = 10
+GRADES = ("O", "E", "A", "T")
+_DAY_MS = 86_400_000
+
 
 class AudioStore:
     """Store and retrieve audio files using MongoDB GridFS."""
@@ -22,7 +29,9 @@ class AudioStore:
         self._client = MongoClient(mongo_uri, tz_aware=True)
         self._db = self._client[db_name]
         self._fs = GridFS(self._db, collection=collection)
+        self._files_col = self._db[f"{collection}.files"]
         self._attempts_col = self._db["pronunciation_attempts"]
+        self._stats_col = self._db["attempt_stats"]
 
     @classmethod
     def from_env(cls, collection: str = "audio"):
@@ -33,6 +42,27 @@ class AudioStore:
             raise ValueError("MONGO_URI and DB_NAME environment variables must be set")
         return cls(mongo_uri, db_name, collection=collection)
 
+    @property
+    def db(self):
+        """The underlying database, for collections other than audio and attempts."""
+        return self._db
+
+    def ensure_indexes(self):
+        """Create the indexes history and stats queries rely on; safe to repeat."""
+        self._attempts_col.create_index(
+            [("user", ASCENDING), ("spell", ASCENDING), ("recorded_at", DESCENDING), ("_id", DESCENDING)]
+        )
+        self._attempts_col.create_index(
+            [("user", ASCENDING), ("recorded_at", DESCENDING), ("_id", DESCENDING)]
+        )
+        self._attempts_col.create_index([("spell", ASCENDING), ("recorded_at", DESCENDING)])
+        self._attempts_col.create_index("audio_file_id")
+        self._stats_col.create_index([("user", ASCENDING), ("spell", ASCENDING)], unique=True)
+        self._stats_col.create_index("stale", sparse=True)
+        self._files_col.create_index("metadata.pcm_sha256", sparse=True)
+        self._files_col.create_index([("metadata.compact", ASCENDING), ("uploadDate", ASCENDING)])
+        self._files_col.create_index("metadata.uploaded_at")
+
     def save_audio(  # pylint: disable=too-many-arguments
         self,
         file_obj: BinaryIO,
@@ -43,8 +73,16 @@ class AudioStore:
         score: Optional[float] = None,
         transcript: Optional[str] = None,
         extra_metadata: Optional[Dict[str, object]] = None,
+        file_id: Optional[ObjectId] = None,
+        user: Optional[str] = None,
+        grade: Optional[str] = None,
     ):
-        """Save audio file to GridFS and record attempt metadata."""
+        """
+        Save audio file to GridFS and record attempt metadata.
+        `file_id` lets callers pick the id up front (e.g. to return it
+        before the write has happened). Attempts by a known `user` also
+        update that user's rolling stats for the spell.
+        """
         metadata: Dict[str, object] = {
             "spell": spell,
             "filename": filename,
@@ -55,15 +93,19 @@ class AudioStore:
             metadata["score"] = score
         if transcript:
             metadata["transcript"] = transcript
+        if user:
+            metadata["user"] = user
         if extra_metadata:
             metadata.update(extra_metadata)
 
         # Store audio in GridFS
+        put_kwargs = {"_id": file_id} if file_id is not None else {}
         file_id = self._fs.put(
             file_obj,
             filename=filename,
             content_type=content_type,
             metadata=metadata,
+            **put_kwargs,
         )
 
         # Record attempt in pronunciation_attempts collection
@@ -76,25 +118,205 @@ class AudioStore:
             attempt_doc["score"] = score
         if transcript:
             attempt_doc["transcript"] = transcript
+        if user:
+            attempt_doc["user"] = user
+        if grade:
+            attempt_doc["grade"] = grade
 
         self._attempts_col.insert_one(attempt_doc)
+        if user:
+            self.update_stats(user, spell, score, grade, metadata["uploaded_at"])
 
         return file_id
 
+    def update_stats(  # pylint: disable=too-many-arguments
+        self,
+        user: str,
+        spell: str,
+        score: Optional[float],
+        grade: Optional[str],
+        recorded_at: datetime,
+    ):
+        """
+        Fold one attempt into the user's stats document for the spell with a
+        single atomic pipeline update, so readers never scan attempts.
+        """
+        self._stats_col.update_one(
+            {"user": user, "spell": spell},
+            stats_pipeline(score, grade, recorded_at),
+            upsert=True,
+        )
+
+    def mark_stats_stale(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Flag the stats documents of (user, spell) pairs whose attempts were
+        changed in place, until `rebuild_stats` recomputes them.
+        """
+        ops = [
+            UpdateOne({"user": user, "spell": spell}, {"$set": {"stale": True}}, upsert=True)
+            for user, spell in pairs
+        ]
+        if not ops:
+            return 0
+        self._stats_col.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    def stale_stats(self) -> Iterator[Tuple[str, str]]:
+        """(user, spell) of every stats document flagged by `mark_stats_stale`."""
+        for doc in self._stats_col.find({"stale": True}, {"_id": 0, "user": 1, "spell": 1}):
+            yield doc["user"], doc["spell"]
+
+    def rebuild_stats(self, user: str, spell: str) -> int:
+        """
+        Recompute a user's stats document for a spell from their attempts,
+        folding them in oldest first with the same pipeline as
+        `update_stats`, in one ordered bulk write. Returns how many
+        attempts were folded in.
+        """
+        key = {"user": user, "spell": spell}
+        ops = [DeleteOne(key)]
+        cursor = self._attempts_col.find(key, {"score": 1, "grade": 1, "recorded_at": 1}).sort(
+            [("recorded_at", ASCENDING), ("_id", ASCENDING)]
+        )
+        for attempt in cursor:
+            recorded_at = attempt.get("recorded_at") or attempt["_id"].generation_time
+            ops.append(
+                UpdateOne(
+                    key,
+                    stats_pipeline(attempt.get("score"), attempt.get("grade"), recorded_at),
+                    upsert=True,
+                )
+            )
+        self._stats_col.bulk_write(ops, ordered=True)
+        return len(ops) - 1
+
+    def get_stats(self, user: str, spell: Optional[str] = None) -> List[dict]:
+        """Precomputed stats documents for a user, one per spell attempted."""
+        query: Dict[str, object] = {"user": user}
+        if spell is not None:
+            query["spell"] = spell
+        return list(self._stats_col.find(query, {"_id": 0}).sort("spell", ASCENDING))
+
+    def iter_attempts(
+        self,
+        *,
+        user: Optional[str] = None,
+        spell: Optional[str] = None,
+        projection: Optional[Dict[str, int]] = None,
+        batch_size: int = 500,
+    ) -> Iterator[dict]:
+        """Stream attempts newest first without holding them all in memory."""
+        cursor = (
+            self._attempts_col.find(_attempt_query(user, spell), projection)
+            .sort([("recorded_at", DESCENDING), ("_id", DESCENDING)])
+            .batch_size(batch_size)
+        )
+        yield from cursor
+
+    def scan_attempts(
+        self,
+        query: Dict[str, object],
+        *,
+        after: Optional[ObjectId] = None,
+        until: Optional[ObjectId] = None,
+        projection: Optional[Dict[str, int]] = None,
+        batch_size: int = 500,
+    ) -> Iterator[dict]:
+        """
+        Stream attempts matching `query` oldest first, in `_id` order, from
+        just past `after` up to and including `until`. A job that notes the
+        last `_id` it finished can pick up from there.
+        """
+        query = dict(query)
+        id_range: Dict[str, object] = {}
+        if after is not None:
+            id_range["$gt"] = after
+        if until is not None:
+            id_range["$lte"] = until
+        if id_range:
+            query["_id"] = id_range
+        cursor = (
+            self._attempts_col.find(query, projection)
+            .sort("_id", ASCENDING)
+            .batch_size(batch_size)
+        )
+        yield from cursor
+
+    def last_attempt_id(self, query: Dict[str, object]) -> Optional[ObjectId]:
+        """`_id` of the newest attempt matching `query`, if any."""
+        doc = self._attempts_col.find_one(query, {"_id": 1}, sort=[("_id", DESCENDING)])
+        return doc["_id"] if doc else None
+
+    def update_attempts(self, updates: List[Tuple[ObjectId, object]]) -> int:
+        """
+        Apply (attempt id, update) pairs in one unordered bulk write; an
+        update may be a document or a pipeline. Returns how many changed.
+        """
+        if not updates:
+            return 0
+        result = self._attempts_col.bulk_write(
+            [UpdateOne({"_id": attempt_id}, update) for attempt_id, update in updates],
+            ordered=False,
+        )
+        return result.modified_count
+
+    def get_attempts_page(
+        self,
+        *,
+        user: Optional[str] = None,
+        spell: Optional[str] = None,
+        before: Optional[Tuple[datetime, ObjectId]] = None,
+        limit: int = 20,
+    ) -> Tuple[List[dict], Optional[Tuple[datetime, ObjectId]]]:
+        """
+        One page of attempts, newest first, plus the `before` value for the
+        next page (None on the last one). Pages are keyed on
+        (recorded_at, _id), so they stay cheap however deep they go.
+        """
+        query = _attempt_query(user, spell)
+        if before is not None:
+            recorded_at, last_id = before
+            query["$or"] = [
+                {"recorded_at": {"$lt": recorded_at}},
+                {"recorded_at": recorded_at, "_id": {"$lt": last_id}},
+            ]
+        items = list(
+            self._attempts_col.find(query)
+            .sort([("recorded_at", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, (items[-1]["recorded_at"], items[-1]["_id"])
+
     def get_audio(self, file_id: ObjectId):
-        """Retrieve audio file from GridFS."""
+        """
+        Retrieve audio file from GridFS, fully buffered.
+        Prefer `open_audio` + `iter_audio` for anything user-facing.
+        """
         grid_out = self._fs.get(file_id)
         audio_bytes = grid_out.read()
         metadata = grid_out.metadata or {}
         return audio_bytes, metadata
 
-    def delete_audio(self, file_id: ObjectId):
-        """Delete audio file from GridFS and related attempt records."""
-        self._fs.delete(file_id)
-        self._attempts_col.delete_many({"audio_file_id": file_id})
+    def delete_audio(self, file_id: ObjectId, attempt_id: Optional[ObjectId] = None) -> bool:
+        """
+        Delete attempt records and their audio file. With `attempt_id` only
+        that attempt goes, and a compacted clip it shares with other
+        attempts is kept for them. Returns whether the file was deleted.
+        """
+        query: Dict[str, object] = {"audio_file_id": file_id}
+        if attempt_id is not None:
+            query["_id"] = attempt_id
+        self._attempts_col.delete_many(query)
+        return self._delete_if_unreferenced(file_id)
 
     def get_attempts_by_spell(self, spell: str):
-        """Get all pronunciation attempts for a specific spell."""
+        """
+        Get all pronunciation attempts for a specific spell.
+        Prefer `iter_attempts` / `get_attempts_page` for long histories.
+        """
         return list(self._attempts_col.find({"spell": spell}).sort("recorded_at", -1))
     
     def load_audio_to_file(self, file_id, file_obj):
@@ -102,6 +324,181 @@ class AudioStore:
         Read audio from GridFS and write it into an open file object.
         `file_obj` is an already-open file handle (e.g. NamedTemporaryFile).
         """
-        grid_out = self._fs.get(file_id)   # assuming self._fs is your GridFS instance
-        file_obj.write(grid_out.read())
+        for chunk in self.iter_audio(self._fs.get(file_id)):
+            file_obj.write(chunk)
         file_obj.flush()
+
+    def open_audio(self, file_id: ObjectId):
+        """
+        Open a stored clip without reading it. The returned GridOut carries
+        `length`, `content_type` and `metadata`; raises gridfs.NoFile.
+        """
+        return self._fs.get(file_id)
+
+    def find_files(self, query: Dict[str, object], limit: int = 0) -> Iterator[dict]:
+        """GridFS file documents matching `query`, oldest first."""
+        return iter(
+            self._files_col.find(
+                query, {"length": 1, "uploadDate": 1, "contentType": 1, "metadata": 1}
+            )
+            .sort("uploadDate", ASCENDING)
+            .limit(limit)
+        )
+
+    def find_compact_clip(self, pcm_sha256: str) -> Optional[ObjectId]:
+        """Id of an already compacted clip with this decoded-audio hash, if any."""
+        doc = self._files_col.find_one(
+            {"metadata.pcm_sha256": pcm_sha256, "metadata.compact": True}, {"_id": 1}
+        )
+        return doc["_id"] if doc else None
+
+    def store_compact(self, data: bytes, *, filename: str, content_type: str, metadata: Dict[str, object]):
+        """Store a compacted clip as a new GridFS file and return its id."""
+        return self._fs.put(data, filename=filename, content_type=content_type, metadata=metadata)
+
+    def mark_compact(self, file_id: ObjectId, metadata: Dict[str, object]):
+        """Flag a stored clip as compacted without rewriting it."""
+        self._files_col.update_one(
+            {"_id": file_id},
+            {"$set": {f"metadata.{key}": value for key, value in metadata.items()}},
+        )
+
+    def repoint_attempts(
+        self, old_id: ObjectId, new_id: ObjectId, features: Optional[Dict[str, object]] = None
+    ) -> int:
+        """Move attempts from one stored clip to another; returns how many moved."""
+        update: Dict[str, object] = {"audio_file_id": new_id}
+        if features:
+            update["features"] = features
+        return self._attempts_col.update_many({"audio_file_id": old_id}, {"$set": update}).modified_count
+
+    def expire_audio(
+        self,
+        file_id: ObjectId,
+        features: Optional[Dict[str, object]] = None,
+        recorded_before: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Drop a clip's audio but keep its attempts, scores and `features`.
+        Attempts lose `audio_file_id` and gain `audio_expired_at`. With
+        `recorded_before`, only attempts older than that let go of the
+        clip; if newer ones still share it, the file is kept and its
+        `metadata.uploaded_at` moves up to the newest of them. Returns
+        whether the file was deleted.
+        """
+        query: Dict[str, object] = {"audio_file_id": file_id}
+        if recorded_before is not None:
+            query["recorded_at"] = {"$not": {"$gte": recorded_before}}
+        update: Dict[str, object] = {"audio_expired_at": datetime.now(tz=timezone.utc)}
+        if features:
+            update["features"] = features
+        self._attempts_col.update_many(query, {"$set": update, "$unset": {"audio_file_id": ""}})
+        return self._delete_if_unreferenced(file_id)
+
+    def _delete_if_unreferenced(self, file_id: ObjectId) -> bool:
+        # Compaction lets identical clips share one file: keep it while any
+        # attempt still points at it, due for expiry with the newest of them
+        newest = self._attempts_col.find_one(
+            {"audio_file_id": file_id}, {"recorded_at": 1}, sort=[("recorded_at", DESCENDING)]
+        )
+        if newest is not None:
+            if newest.get("recorded_at") is not None:
+                self._files_col.update_one(
+                    {"_id": file_id}, {"$max": {"metadata.uploaded_at": newest["recorded_at"]}}
+                )
+            return False
+        self._fs.delete(file_id)
+        return True
+
+    def delete_file(self, file_id: ObjectId):
+        """Delete a GridFS file only; attempt records are left alone."""
+        self._fs.delete(file_id)
+
+    @staticmethod
+    def iter_audio(
+        grid_out,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        Yield bytes [start, end) of an open clip one GridFS chunk at a time,
+        so memory stays at one chunk however long the clip is.
+        """
+        end = grid_out.length if end is None else min(end, grid_out.length)
+        chunk_size = chunk_size or grid_out.chunk_size
+        grid_out.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = grid_out.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _attempt_query(user: Optional[str], spell: Optional[str]) -> Dict[str, object]:
+    query: Dict[str, object] = {}
+    if user is not None:
+        query["user"] = user
+    if spell is not None:
+        query["spell"] = spell
+    return query
+
+
+def _inc(field: str, by) -> dict:
+    return {"$add": [{"$ifNull": [f"${field}", 0]}, by]}
+
+
+def stats_pipeline(score: Optional[float], grade: Optional[str], recorded_at: datetime) -> list:
+    """
+    Update pipeline that folds one attempt into a stats document:
+    attempt count, best score, running total, exponential moving average,
+    the last few scores, grade counts and the daily practice streak.
+    All expressions in a stage read the document as it was before it.
+    """
+    day = int(recorded_at.timestamp() * 1000) // _DAY_MS
+    fields: Dict[str, object] = {
+        "attempts": _inc("attempts", 1),
+        "first_at": {"$min": ["$first_at", recorded_at]},
+        "last_at": {"$max": ["$last_at", recorded_at]},
+        "last_day": {"$max": ["$last_day", day]},
+        "streak": {
+            "$switch": {
+                "branches": [
+                    # Same day (or an older attempt arriving late): unchanged
+                    {"case": {"$gte": [{"$ifNull": ["$last_day", -1]}, day]},
+                     "then": {"$ifNull": ["$streak", 1]}},
+                    {"case": {"$eq": ["$last_day", day - 1]}, "then": _inc("streak", 1)},
+                ],
+                "default": 1,
+            }
+        },
+    }
+    if score is not None:
+        fields.update(
+            {
+                "scored": _inc("scored", 1),
+                "total": _inc("total", score),
+                "best": {"$max": ["$best", score]},
+                "ema": {
+                    "$cond": [
+                        {"$eq": [{"$ifNull": ["$ema", None]}, None]},
+                        score,
+                        {"$add": [EMA_ALPHA * score, {"$multiply": [1 - EMA_ALPHA, "$ema"]}]},
+                    ]
+                },
+                "recent": {
+                    "$slice": [
+                        {"$concatArrays": [{"$ifNull": ["$recent", []]}, [score]]},
+                        -RECENT_SCORES,
+                    ]
+                },
+            }
+        )
+    if grade in GRADES:
+        fields[f"grades.{grade}"] = _inc(f"grades.{grade}", 1)
+    return [
+        {"$set": fields},
+        {"$set": {"best_streak": {"$max": ["$best_streak", "$streak"]}}},
+    ]
@@ -0,0 +1 @@
+"""Microbenchmarks and load tests for the ML client (not run by pytest)."""
@@ -0,0 +1,40 @@
+"""
+Storage saved by compacting uploads to mono Opus, per bitrate.
+
+Synthetic MediaRecorder-style clips (48 kHz stereo Opus in WebM) are
+decoded to 16 kHz PCM and re-encoded at each bitrate. The report shows
+bytes per second of audio and the share of storage saved.
+
+    python -m machine_learning_client.benchmarks.bench_compaction --bitrates 12000 16000 24000 32000
+"""
+
+import argparse
+
+from ..audio_decode import decode_pcm, encode_opus, pcm_duration
+from .clips import synth_clip, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bitrates", type=int, nargs="+", default=[12000, 16000, 24000, 32000])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2.0, 5.0, 10.0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'clip s':>7}  {'upload B':>9}  {'bitrate':>8}  {'opus B':>8}  {'saved':>6}  {'encode ms':>9}")
+    for seconds in args.seconds:
+        upload = synth_clip(seconds)
+        pcm = decode_pcm(upload)
+        for bitrate in args.bitrates:
+            compact = encode_opus(pcm, bitrate=bitrate)
+            assert abs(pcm_duration(decode_pcm(compact)) - pcm_duration(pcm)) < 0.1
+            timing = time_calls(lambda: encode_opus(pcm, bitrate=bitrate), args.repeat)
+            saved = 1 - len(compact) / len(upload)
+            print(
+                f"{seconds:>7.1f}  {len(upload):>9}  {bitrate:>8}  {len(compact):>8}  "
+                f"{saved:>6.1%}  {timing['p50_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the legacy temp-file + pydub/ffmpeg conversion against the
+in-process decoder.
+
+    SPEECH_KEY=x SPEECH_REGION=x \
+        python -m machine_learning_client.benchmarks.bench_decode --repeat 50
+
+The legacy and ffmpeg-pipe rows need ffmpeg on PATH (it is in the image).
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from .. import audio_decode
+from ..pronun_assess import convert_to_wav
+from .clips import synth_clip, time_calls
+
+
+def legacy_path(data: bytes) -> bytes:
+    """What /assess did before: temp .webm -> pydub/ffmpeg -> temp .wav -> read back."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp_in:
+        tmp_in.write(data)
+        input_path = tmp_in.name
+    wav_path = convert_to_wav(input_path)
+    try:
+        with open(wav_path, "rb") as wav:
+            return wav.read()
+    finally:
+        for path in (input_path, wav_path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    data = synth_clip(seconds=args.seconds)
+    audio_decode.load_av()
+    print(f"clip: {args.seconds:.1f}s webm/opus, {len(data)} bytes, {args.repeat} runs\n")
+
+    cases = {
+        "pyav in-process": lambda: audio_decode._decode_with_av(  # pylint: disable=protected-access
+            data, audio_decode.PCM_SAMPLE_RATE
+        ),
+    }
+    if shutil.which("ffmpeg"):
+        cases["ffmpeg pipe"] = lambda: audio_decode._decode_with_ffmpeg(  # pylint: disable=protected-access
+            data, audio_decode.PCM_SAMPLE_RATE
+        )
+        cases["legacy pydub + temp files"] = lambda: legacy_path(data)
+    else:
+        print("ffmpeg not on PATH: skipping the legacy and pipe paths\n")
+
+    print(f"{'path':<28}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, func in cases.items():
+        stats = time_calls(func, args.repeat)
+        print(f"{name:<28}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+How many scorer calls the local pre-scorer avoids, and what it does to latency.
+
+Each spell first learns --templates good renditions, as it would from
+attempts Azure scored highly. Then every attempt in the corpus goes
+through PreScorer.check. Forwarded attempts pay a simulated Azure call
+(--azure-latency, the local scorer's latency spec); attempts settled
+locally pay only the measured pre-scoring time.
+
+Without --corpus, attempts are synthesised (clips.synth_word): good
+renditions by varied speakers, other spells, mumbled, truncated and
+silent recordings. With --corpus, a JSONL manifest of recordings is
+used instead, one {"path", "spell", "label"} object per line, where
+label is "template" (learned first), "good" or anything else for an
+attempt that should fail.
+
+    python -m machine_learning_client.benchmarks.bench_prescore --attempts 20
+    python -m machine_learning_client.benchmarks.bench_prescore --corpus attempts.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from statistics import median
+
+import numpy as np
+
+from ..audio_decode import decode_pcm, load_av
+from ..prescore import PreScorer
+from ..scorers import parse_latency
+from .clips import synth_word
+
+SPELLS = [
+    "Lumos", "Nox", "Accio", "Alohomora", "Expelliarmus", "Wingardium Leviosa",
+    "Stupefy", "Protego", "Riddikulus", "Expecto Patronum", "Incendio", "Reparo",
+]
+# Attempt kinds in the synthetic corpus, and how often each occurs
+MIX = {"good": 0.5, "wrong_spell": 0.15, "mumbled": 0.1, "truncated": 0.1, "silent": 0.15}
+
+
+def _speaker(seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "tempo": rng.uniform(0.85, 1.2),
+        "pitch": rng.uniform(0.8, 1.25),
+        "formant_jitter": 0.05,
+        "noise_dbfs": rng.uniform(-65, -45),
+        "seed": seed,
+    }
+
+
+def synthetic_corpus(attempts_per_spell, templates, seed=0):
+    """(spell, label, pcm) triples: templates first, then a shuffled mix of attempts."""
+    rng = np.random.default_rng(seed)
+    learned, attempts = [], []
+    for s, spell in enumerate(SPELLS):
+        for k in range(templates):
+            learned.append((spell, "template", synth_word(spell, **_speaker(10_000 * s + k))))
+        kinds = rng.choice(list(MIX), size=attempts_per_spell, p=list(MIX.values()))
+        for k, kind in enumerate(kinds):
+            speaker = _speaker(10_000 * s + 1000 + k)
+            if kind == "good":
+                pcm = synth_word(spell, **speaker)
+            elif kind == "wrong_spell":
+                other = SPELLS[(s + 1 + rng.integers(len(SPELLS) - 1)) % len(SPELLS)]
+                pcm = synth_word(other, **speaker)
+            elif kind == "mumbled":
+                pcm = synth_word(spell, mumble=True, **speaker)
+            elif kind == "truncated":
+                pcm = synth_word(spell, **speaker)
+                pcm = pcm[: int(len(pcm) * rng.uniform(0.25, 0.4))]
+            else:
+                pcm = synth_word("", **speaker)
+            attempts.append((spell, str(kind), pcm))
+    order = rng.permutation(len(attempts))
+    return learned, [attempts[i] for i in order]
+
+
+def recorded_corpus(path):
+    """(spell, label, pcm) triples from a JSONL manifest of recordings."""
+    load_av()
+    base = os.path.dirname(os.path.abspath(path))
+    learned, attempts = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            with open(os.path.join(base, entry["path"]), "rb") as audio:
+                pcm = decode_pcm(audio.read())
+            item = (entry["spell"], entry.get("label", "good"), pcm)
+            (learned if item[1] == "template" else attempts).append(item)
+    return learned, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="JSONL manifest of recorded attempts")
+    parser.add_argument("--attempts", type=int, default=20, help="synthetic attempts per spell")
+    parser.add_argument("--templates", type=int, default=3, help="synthetic templates per spell")
+    parser.add_argument("--azure-latency", default="lognormal:400,0.35")
+    parser.add_argument("--reject-factor", type=float, default=1.6)
+    args = parser.parse_args()
+
+    if args.corpus:
+        learned, attempts = recorded_corpus(args.corpus)
+    else:
+        learned, attempts = synthetic_corpus(args.attempts, args.templates)
+
+    prescorer = PreScorer(reject_factor=args.reject_factor)
+    for spell, _, pcm in learned:
+        prescorer.learn(spell, pcm, {"success": True, "accuracy_score": 95.0})
+
+    azure = parse_latency(args.azure_latency)
+    rng = np.random.default_rng(1)
+    outcomes = defaultdict(Counter)
+    before, after, check_ms = [], [], []
+    for spell, label, pcm in attempts:
+        start = time.perf_counter()
+        result = prescorer.check(spell, pcm)
+        elapsed = time.perf_counter() - start
+        check_ms.append(elapsed * 1000)
+        remote = azure(rng.uniform(1e-9, 1 - 1e-9))
+        before.append(remote)
+        after.append(elapsed + (remote if result is None else 0.0))
+        outcomes[label][result["prescored"] if result else "forwarded"] += 1
+
+    total = len(attempts)
+    stats = prescorer.stats()
+    false_rejects = sum(n for reason, n in outcomes["good"].items() if reason != "forwarded")
+    good = sum(outcomes["good"].values())
+    print(f"cpus={os.cpu_count()} attempts={total} templates={len(learned)} "
+          f"azure latency={args.azure_latency}\n")
+    reasons = ["forwarded", "no_speech", "too_short", "mismatch"]
+    print(f"{'attempt':>12} " + " ".join(f"{r:>10}" for r in reasons))
+    for label in sorted(outcomes):
+        print(f"{label:>12} " + " ".join(f"{outcomes[label][r]:>10}" for r in reasons))
+    print()
+    print(f"scorer calls avoided: {stats['calls_avoided']}/{total} ({stats['avoided_rate']:.1%})")
+    if good:
+        print(f"good attempts graded T locally: {false_rejects}/{good} ({false_rejects / good:.1%})")
+    print(f"pre-scoring cost: p50 {median(check_ms):.1f} ms, max {max(check_ms):.1f} ms")
+    print(f"p50 latency: {median(before) * 1000:.0f} ms -> {median(after) * 1000:.0f} ms "
+          f"(mean {np.mean(before) * 1000:.0f} -> {np.mean(after) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
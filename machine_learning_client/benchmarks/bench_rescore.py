@@ -0,0 +1,91 @@
+"""
+Re-scoring throughput at several scorer concurrency levels.
+
+Stored attempts are simulated in memory: --attempts MediaRecorder-style
+Opus clips (clips.synth_clip) of 2 to 4 seconds. Each level runs
+Rescorer over all of them with the local scorer at --latency, decoding
+on --workers processes (0 = threads). The report gives attempts and
+seconds of audio re-scored per second of wall time.
+
+    python -m machine_learning_client.benchmarks.bench_rescore --attempts 200 --concurrency 1 4 16
+"""
+
+import argparse
+import os
+
+from bson import ObjectId
+
+from ..rescore import Rescorer
+from ..scorers import LocalScorer
+from ..vad import VoiceTrimmer
+from .clips import synth_clip
+
+
+class MemoryStore:
+    """Just the AudioStore methods Rescorer uses, over clips held in memory."""
+
+    def __init__(self, clips):
+        self.attempts = [
+            {"_id": ObjectId(), "spell": "Lumos", "audio_file_id": i, "score": 50.0, "grade": "E"}
+            for i in range(len(clips))
+        ]
+        self.clips = clips
+
+    def last_attempt_id(self, _query):
+        return self.attempts[-1]["_id"]
+
+    def scan_attempts(self, _query, **_kwargs):
+        return iter(self.attempts)
+
+    def open_audio(self, file_id):
+        return self.clips[file_id]
+
+    @staticmethod
+    def iter_audio(grid_out):
+        yield grid_out
+
+    @staticmethod
+    def update_attempts(updates):
+        return len(updates)
+
+    @staticmethod
+    def mark_stats_stale(pairs):
+        return len(pairs)
+
+    @staticmethod
+    def stale_stats():
+        return iter(())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--latency", default="lognormal:400,0.35")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    clips = [synth_clip(2.0 + (i % 5) * 0.5, seed=i) for i in range(args.attempts)]
+    print(f"cpus={os.cpu_count()} attempts={args.attempts} workers={args.workers} "
+          f"scorer latency={args.latency}\n")
+    print(f"{'concurrency':>11} {'attempts/s':>10} {'audio s/s':>9} {'decode s':>8} {'p50 ms':>7}")
+    for concurrency in args.concurrency:
+        report = Rescorer(
+            MemoryStore(clips),
+            LocalScorer(latency=args.latency),
+            trimmer=VoiceTrimmer(),
+            workers=args.workers,
+            concurrency=concurrency,
+            batch_size=args.batch_size,
+        ).run("rescore")
+        assert report["rescored"] == args.attempts, report
+        print(
+            f"{concurrency:>11} {report['attempts_per_second']:>10.1f} "
+            f"{report['audio_seconds_per_second']:>9.1f} {report['decode_seconds']:>8.2f} "
+            f"{report['score_p50_ms']:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
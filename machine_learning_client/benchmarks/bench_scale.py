@@ -0,0 +1,152 @@
+"""
+/assess throughput as ml-client replicas are added.
+
+Starts N uvicorn processes, each an independent replica with no state
+shared between them. Clients spread requests across the replicas round
+robin, standing in for the compose proxy. Decoding is real. Scoring uses
+the local scorer (SCORER_BACKEND=local) with a fixed --recognize-ms
+latency, like a call to Azure, so a replica's capacity is
+RECOGNIZE_WORKERS / latency. Every request has a distinct spell text, so
+no replica can answer from cache.
+
+    python -m machine_learning_client.benchmarks.bench_scale \\
+        --replicas 1 2 4 --recognize-workers 4 --recognize-ms 500 --duration 10
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .clips import synth_clip
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_replicas(count, args):
+    env = {k: v for k, v in os.environ.items() if k not in ("MONGO_URI", "DB_NAME")}
+    env.update(
+        SPEECH_KEY="bench",
+        SPEECH_REGION="bench",
+        SPEECH_POOL_SIZE="0",
+        SCORER_BACKEND="local",
+        LOCAL_SCORER_LATENCY=f"fixed:{args.recognize_ms}",
+        RECOGNIZE_WORKERS=str(args.recognize_workers),
+        RECOGNIZE_QUEUE="1024",
+        TRANSCODE_QUEUE="1024",
+        ASSESS_MAX_IN_FLIGHT="1024",
+        JOB_WORKERS="0",
+    )
+    replicas = []
+    for _ in range(count):
+        port = free_port()
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                sys.executable, "-m", "uvicorn", "machine_learning_client.convert:app",
+                "--port", str(port), "--log-level", "warning", "--no-access-log",
+            ],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        replicas.append((proc, f"http://127.0.0.1:{port}"))
+    return replicas
+
+
+async def wait_ready(client, urls):
+    deadline = time.monotonic() + 60
+    for url in urls:
+        while True:
+            try:
+                if (await client.get(f"{url}/readyz")).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} never became ready")
+            await asyncio.sleep(0.1)
+
+
+async def drive(client, urls, clips, concurrency, duration):
+    """Keep `concurrency` requests in flight for `duration` seconds."""
+    targets = itertools.cycle(urls)
+    counter = itertools.count()
+    done = []
+    errors = [0]
+    stop = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < stop:
+            i = next(counter)
+            start = time.perf_counter()
+            resp = await client.post(
+                f"{next(targets)}/assess",
+                files={"audio": ("clip.webm", clips[i % len(clips)], "audio/webm")},
+                data={"spell": f"Lumos {i}"},
+            )
+            if resp.status_code == 200:
+                done.append(time.perf_counter() - start)
+            else:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    done.sort()
+    p95 = done[int(len(done) * 0.95) - 1] * 1000 if done else 0.0
+    return len(done) / wall, p95, errors[0]
+
+
+async def main_async(args):
+    clips = [synth_clip(seconds=1.0, seed=seed) for seed in range(16)]
+    per_replica = args.recognize_workers / (args.recognize_ms / 1000)
+    print(
+        f"cpus={os.cpu_count()} recognize={args.recognize_ms:.0f}ms "
+        f"x {args.recognize_workers} workers (ceiling {per_replica:.0f} req/s per replica)\n"
+    )
+    print(f"{'replicas':>8} {'clients':>8} {'req/s':>8} {'p95 ms':>8} {'errors':>7} {'vs 1 replica':>13}")
+    baseline = None
+    limits = httpx.Limits(max_connections=1024, max_keepalive_connections=1024)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        for count in args.replicas:
+            replicas = start_replicas(count, args)
+            try:
+                urls = [url for _, url in replicas]
+                await wait_ready(client, urls)
+                concurrency = 2 * args.recognize_workers * count
+                rps, p95, errors = await drive(client, urls, clips, concurrency, args.duration)
+            finally:
+                for proc, _ in replicas:
+                    proc.terminate()
+                for proc, _ in replicas:
+                    proc.wait()
+            baseline = baseline or rps / count
+            print(
+                f"{count:>8} {concurrency:>8} {rps:>8.1f} {p95:>8.0f} {errors:>7} "
+                f"{rps / baseline:>12.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--recognize-workers", type=int, default=4)
+    parser.add_argument("--recognize-ms", type=float, default=500)
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Audio cut by voice-activity trimming, and what it costs.
+
+Recordings are synthesised the way MediaRecorder produces them: a spoken
+spell (clips.synth_word) with a random stretch of room noise before and
+after, from the click on "record" to the click on "stop". Each clip goes
+through VoiceTrimmer.trim; the report is the share of audio no longer
+sent to the scorer (Azure bills per second of audio) and the trim time.
+
+    python -m machine_learning_client.benchmarks.bench_vad --clips 200
+"""
+
+import argparse
+import os
+import time
+from statistics import median
+
+import numpy as np
+
+from ..vad import NoSpeechError, VoiceTrimmer
+from .bench_prescore import SPELLS, _speaker
+from .clips import synth_word
+
+
+def recording(spell, seed, rng, rate=16000):
+    """A spoken spell with `lead` and `tail` seconds of extra room noise."""
+    speaker = _speaker(seed)
+    word = synth_word(spell, **speaker).astype(np.float64)
+    lead, tail = rng.uniform(0.2, 2.0), rng.uniform(0.3, 2.5)
+    noise = 32768 * 10 ** (speaker["noise_dbfs"] / 20)
+    return np.concatenate(
+        [rng.normal(0, noise, int(lead * rate)), word, rng.normal(0, noise, int(tail * rate))]
+    ).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clips", type=int, default=200)
+    parser.add_argument("--pad-seconds", type=float, default=0.15)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    spells = [SPELLS[i % len(SPELLS)] for i in range(args.clips)]
+    clips = [(spell, recording(spell, i, rng)) for i, spell in enumerate(spells)]
+    trimmer = VoiceTrimmer(pad_seconds=args.pad_seconds)
+    trim_ms, saved, errors = [], [], 0
+    for spell, pcm in clips:
+        start = time.perf_counter()
+        try:
+            _, report = trimmer.trim(spell, pcm)
+        except NoSpeechError:
+            errors += 1
+            continue
+        trim_ms.append((time.perf_counter() - start) * 1000)
+        saved.append(report["seconds_saved"] / report["input_seconds"])
+
+    stats = trimmer.stats()
+    total = sum(len(pcm) for _, pcm in clips) / 16000
+    print(f"cpus={os.cpu_count()} clips={len(clips)} audio={total:.0f}s pad={args.pad_seconds}s\n")
+    print(f"audio not sent to the scorer: {stats['seconds_saved']:.0f}s of {total:.0f}s "
+          f"({stats['seconds_saved'] / total:.1%}), {stats['bytes_saved'] / 1e6:.1f} MB of PCM")
+    print(f"per clip: median {median(saved):.1%} cut; capped {stats['capped']}; "
+          f"wrongly rejected as silent {errors}")
+    print(f"trim cost: p50 {median(trim_ms):.2f} ms, max {max(trim_ms):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
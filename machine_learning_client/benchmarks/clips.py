@@ -0,0 +1,123 @@
+"""Synthetic recordings shared by the benchmarks."""
+
+import io
+import time
+import zlib
+from statistics import mean, median
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import av  # pylint: disable=import-error
+
+
+def synth_clip(
+    seconds: float = 2.0,
+    container_format: str = "webm",
+    codec: str = "libopus",
+    rate: int = 48000,
+    seed: int = 0,
+) -> bytes:
+    """Encode a voice-like tone burst (with silence either side) the way MediaRecorder would."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    envelope = np.zeros(n)
+    start, stop = int(n * 0.25), int(n * 0.75)
+    envelope[start:stop] = np.hanning(stop - start)
+    voiced = np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t)
+    signal = voiced * envelope * 9000 + rng.normal(0, 60, n)
+    mono = signal.astype(np.int16)
+    stereo = np.repeat(mono, 2).reshape(1, -1)
+
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=rate, layout="stereo")
+        frame = av.AudioFrame.from_ndarray(stereo, format="s16", layout="stereo")
+        frame.sample_rate = rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+# First and second formants (Hz) of the vowels a spell's letters map to
+VOWEL_FORMANTS = {
+    "a": (730, 1090),
+    "e": (530, 1840),
+    "i": (270, 2290),
+    "o": (570, 840),
+    "u": (300, 870),
+    "y": (440, 1600),
+}
+SCHWA = (500, 1500)
+
+
+def synth_word(
+    text: str,
+    *,
+    tempo: float = 1.0,
+    pitch: float = 1.0,
+    formant_jitter: float = 0.0,
+    noise_dbfs: float = -60.0,
+    mumble: bool = False,
+    rate: int = 16000,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    A crude spoken rendition of `text` as 16 kHz int16 PCM: each vowel
+    letter becomes a voiced segment with that vowel's formants, each
+    consonant a burst of band-limited noise, with silence either side.
+    `tempo`, `pitch` and `formant_jitter` vary the speaker; `mumble`
+    turns every vowel into a schwa and drops the consonants.
+    """
+    rng = np.random.default_rng(seed)
+    segments = [np.zeros(int(0.3 * rate))]
+    for letter in text.lower():
+        if not letter.isalpha():
+            continue
+        if letter in VOWEL_FORMANTS or mumble:
+            if mumble and letter not in VOWEL_FORMANTS:
+                continue
+            f1, f2 = SCHWA if mumble else VOWEL_FORMANTS[letter]
+            f1, f2 = (f * (1 + rng.uniform(-formant_jitter, formant_jitter)) for f in (f1, f2))
+            n = int(0.14 * rate / tempo)
+            t = np.arange(n) / rate
+            f0 = 120.0 * pitch * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+            phase = 2 * np.pi * np.cumsum(f0) / rate
+            voiced = np.zeros(n)
+            for h in range(1, int(4000 / (120.0 * pitch))):
+                freq = h * 120.0 * pitch
+                gain = np.exp(-(((freq - f1) / 90) ** 2)) + 0.6 * np.exp(-(((freq - f2) / 130) ** 2))
+                voiced += (gain + 0.02) * np.sin(h * phase)
+            segment = voiced / (np.abs(voiced).max() + 1e-9) * np.hanning(n) ** 0.5 * 0.6
+        else:
+            n = int(0.07 * rate / tempo)
+            centre = 1500 + (zlib.crc32(letter.encode()) % 4500)
+            spectrum = np.fft.rfft(rng.normal(0, 1, n))
+            freqs = np.fft.rfftfreq(n, 1.0 / rate)
+            spectrum *= np.exp(-(((freqs - centre) / 600) ** 2))
+            noise = np.fft.irfft(spectrum, n)
+            segment = noise / (np.abs(noise).max() + 1e-9) * np.hanning(n) * 0.25
+        segments.append(segment)
+    segments.append(np.zeros(int(0.3 * rate)))
+    signal = np.concatenate(segments) * 32767
+    signal += rng.normal(0, 32768 * 10 ** (noise_dbfs / 20), len(signal))
+    return np.clip(signal, -32768, 32767).astype(np.int16)
+
+
+def time_calls(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run `func` `repeat` times and summarise wall-clock latency in ms."""
+    func()  # warm-up
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": mean(samples),
+        "p50_ms": median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
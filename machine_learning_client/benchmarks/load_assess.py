@@ -0,0 +1,107 @@
+"""
+Load test for /assess: throughput as client concurrency grows.
+
+Decoding is real (a synthetic webm/opus clip). Azure is replaced by the
+local scorer and Mongo by a blocking sleep, each with the given latency.
+Those are exactly the kinds of call that used to stall the event loop.
+
+    python -m machine_learning_client.benchmarks.load_assess \\
+        --requests 200 --concurrency 1 2 4 8 16 32 --recognize-ms 300
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from statistics import median
+
+os.environ.setdefault("SPEECH_KEY", "bench")
+os.environ.setdefault("SPEECH_REGION", "bench")
+os.environ.setdefault("ASSESS_MAX_IN_FLIGHT", "1024")
+os.environ.setdefault("RECOGNIZE_WORKERS", "32")
+os.environ.setdefault("RECOGNIZE_QUEUE", "1024")
+os.environ.setdefault("TRANSCODE_QUEUE", "1024")
+
+import httpx  # pylint: disable=wrong-import-position
+
+from .. import convert  # pylint: disable=wrong-import-position
+from ..scorers import LocalScorer  # pylint: disable=wrong-import-position
+from .clips import synth_clip  # pylint: disable=wrong-import-position
+
+
+class SleepyStore:  # pylint: disable=too-few-public-methods
+    """Stand-in for AudioStore whose writes block like pymongo does."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def save_audio(self, *_args, **_kwargs):
+        """Pretend to write to GridFS."""
+        time.sleep(self.latency)
+
+
+def install_fakes(recognize_ms: float, mongo_ms: float):
+    """Swap Azure and Mongo for blocking sleeps."""
+
+    convert.scorer = LocalScorer(latency=f"fixed:{recognize_ms}")
+    convert.audio_store = SleepyStore(mongo_ms / 1000)
+
+
+async def run_level(client, clip: bytes, total: int, concurrency: int):
+    """Send `total` requests with at most `concurrency` outstanding."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one():
+        async with gate:
+            start = time.perf_counter()
+            resp = await client.post(
+                "/assess",
+                files={"audio": ("clip.webm", clip, "audio/webm")},
+                data={"spell": "Lumos"},
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "statuses": statuses,
+    }
+
+
+async def main_async(args):
+    install_fakes(args.recognize_ms, args.mongo_ms)
+    clip = synth_clip(seconds=2.0)
+    transport = httpx.ASGITransport(app=convert.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(
+            f"{args.requests} requests per level, recognize {args.recognize_ms} ms, "
+            f"mongo {args.mongo_ms} ms\n"
+        )
+        print(f"{'concurrency':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}  statuses")
+        for level in args.concurrency:
+            row = await run_level(client, clip, args.requests, level)
+            print(
+                f"{level:>12}{row['rps']:>10.1f}{row['p50_ms']:>10.1f}"
+                f"{row['p95_ms']:>10.1f}  {row['statuses']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--recognize-ms", type=float, default=300)
+    parser.add_argument("--mongo-ms", type=float, default=20)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
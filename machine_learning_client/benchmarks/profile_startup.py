@@ -0,0 +1,92 @@
+"""
+Cold-start profile of the ml-client service.
+
+Each run starts a fresh interpreter and records:
+- the heaviest imports behind `machine_learning_client.convert`
+  (from `python -X importtime`);
+- the time until the app has finished its lifespan startup and /healthz
+  answers;
+- the time until /readyz answers 200.
+
+The in-process server is Starlette's TestClient, so uvicorn's own
+startup (a few ms) is not included. Without MONGO_URI the readiness time
+covers only the speech warm-up. With fake credentials that warm-up still
+loads the SDK and builds recognizers, but their connections fail in the
+background.
+
+    SPEECH_KEY=x SPEECH_REGION=x \
+        python -m machine_learning_client.benchmarks.profile_startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+from machine_learning_client import convert
+t_import = time.perf_counter() - t0
+from fastapi.testclient import TestClient
+with TestClient(convert.app) as client:
+    assert client.get("/healthz").status_code == 200
+    t_live = time.perf_counter() - t0
+    t_ready = None
+    while time.perf_counter() - t0 < 30:
+        if client.get("/readyz").status_code == 200:
+            t_ready = time.perf_counter() - t0
+            break
+        time.sleep(0.005)
+print(json.dumps({"import": t_import, "live": t_live, "ready": t_ready}))
+"""
+
+
+def top_imports(count):
+    """(cumulative ms, module) for the slowest top-level imports of convert."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import machine_learning_client.convert"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and name.startswith(("   ", " ")) and not name.startswith("    "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def probe():
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, cwd=ROOT, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print("slowest imports under convert (cumulative ms):")
+    for ms, name in top_imports(args.top):
+        print(f"  {ms:>8.1f}  {name}")
+
+    runs = [probe() for _ in range(args.runs)]
+    print(f"\n{'run':>4} {'import ms':>10} {'live ms':>9} {'ready ms':>9}")
+    for i, run in enumerate(runs, 1):
+        ready = f"{run['ready'] * 1000:>9.0f}" if run["ready"] is not None else f"{'never':>9}"
+        print(f"{i:>4} {run['import'] * 1000:>10.0f} {run['live'] * 1000:>9.0f} {ready}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Background compaction and tiered retention for stored recordings.
+
+Stored clips go through these tiers as they age:
+
+1. Fresh: the upload is kept exactly as received.
+2. After AUDIO_COMPACT_AFTER_HOURS: it is re-encoded to mono Opus at
+   AUDIO_OPUS_BITRATE. Clips whose decoded audio is identical share
+   one stored file.
+3. After AUDIO_RETENTION_DAYS: the audio is deleted. Attempts keep
+   their scores plus a few summary features.
+
+Ages count from the original upload (`metadata.uploaded_at`), which a
+compacted copy carries over. A clip shared by several attempts is only
+deleted once the newest of them is past retention.
+
+Run once from the command line with:
+
+    python -m machine_learning_client.compaction --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError  # pylint: disable=import-error
+
+from .audio_decode import (
+    DEFAULT_OPUS_BITRATE,
+    OPUS_CONTENT_TYPE,
+    PCM_SAMPLE_RATE,
+    decode_pcm,
+    encode_opus,
+    pcm_duration,
+)
+
+LEASE_ID = "audio-compaction"
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+def pcm_digest(pcm: np.ndarray) -> str:
+    """Content hash of decoded audio, so re-encodes of one clip match."""
+    return hashlib.sha256(memoryview(np.ascontiguousarray(pcm)).cast("B")).hexdigest()
+
+
+def clip_features(pcm: np.ndarray) -> Dict[str, float]:
+    """Summary kept for an attempt once its audio has been dropped."""
+    if len(pcm) == 0:
+        return {"duration_s": 0.0, "rms_dbfs": -120.0, "peak_dbfs": -120.0}
+    samples = pcm.astype(np.float64) / 32768.0
+    rms = float(np.sqrt(np.mean(samples * samples)))
+    peak = float(np.max(np.abs(samples)))
+    return {
+        "duration_s": round(pcm_duration(pcm, PCM_SAMPLE_RATE), 3),
+        "rms_dbfs": round(20 * np.log10(max(rms, 1e-6)), 1),
+        "peak_dbfs": round(20 * np.log10(max(peak, 1e-6)), 1),
+    }
+
+
+class CompactionPolicy:
+    """When clips are compacted and when their audio is dropped."""
+
+    def __init__(
+        self,
+        compact_after: timedelta = timedelta(hours=24),
+        retain_for: timedelta = timedelta(days=30),
+        bitrate: int = DEFAULT_OPUS_BITRATE,
+    ):
+        self.compact_after = compact_after
+        self.retain_for = retain_for
+        self.bitrate = bitrate
+
+    @classmethod
+    def from_env(cls):
+        """Policy from AUDIO_COMPACT_AFTER_HOURS / AUDIO_RETENTION_DAYS / AUDIO_OPUS_BITRATE."""
+        return cls(
+            compact_after=timedelta(hours=float(os.getenv("AUDIO_COMPACT_AFTER_HOURS", "24"))),
+            retain_for=timedelta(days=float(os.getenv("AUDIO_RETENTION_DAYS", "30"))),
+            bitrate=int(os.getenv("AUDIO_OPUS_BITRATE", str(DEFAULT_OPUS_BITRATE))),
+        )
+
+
+class MaintenanceLease:
+    """
+    A lease document that lets only one replica run compaction at a time.
+    An expired lease can be taken over, so a crashed holder doesn't block it.
+    """
+
+    def __init__(self, collection, name: str = LEASE_ID, ttl: timedelta = timedelta(minutes=30)):
+        self._col = collection
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; False when another holder has it."""
+        now = _now()
+        try:
+            self._col.find_one_and_update(
+                {"_id": self.name, "$or": [{"expires_at": {"$lt": now}}, {"holder": self.holder}]},
+                {"$set": {"holder": self.holder, "expires_at": now + self.ttl}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def release(self):
+        """Give the lease up early."""
+        self._col.delete_one({"_id": self.name, "holder": self.holder})
+
+
+class Compactor:
+    """Apply a CompactionPolicy to the clips in an AudioStore."""
+
+    def __init__(
+        self,
+        store,
+        policy: Optional[CompactionPolicy] = None,
+        *,
+        decode: Callable[[bytes], np.ndarray] = decode_pcm,
+        encode: Callable[..., bytes] = encode_opus,
+        clock: Callable[[], datetime] = _now,
+    ):
+        self.store = store
+        self.policy = policy or CompactionPolicy()
+        self._decode = decode
+        self._encode = encode
+        self._clock = clock
+
+    def run(self, limit: int = 0, dry_run: bool = False) -> Dict[str, object]:
+        """
+        One pass: drop audio past retention, then compact what is due.
+        `limit` caps the files looked at per tier (0 = no cap). With
+        `dry_run`, everything is measured but nothing is written.
+        """
+        now = self._clock()
+        expire_before = now - self.policy.retain_for
+        compact_before = now - self.policy.compact_after
+        report = {
+            "dry_run": dry_run,
+            "scanned": 0,
+            "compacted": 0,
+            "deduplicated": 0,
+            "expired": 0,
+            "failed": 0,
+            "bytes_before": 0,
+            "bytes_after": 0,
+        }
+
+        for doc in self.store.find_files(
+            {
+                "$or": [
+                    {"metadata.uploaded_at": {"$lt": expire_before}},
+                    {"metadata.uploaded_at": {"$exists": False}, "uploadDate": {"$lt": expire_before}},
+                ]
+            },
+            limit,
+        ):
+            self._guard(report, self._expire, doc, dry_run, expire_before)
+        for doc in self.store.find_files(
+            {
+                "uploadDate": {"$lt": compact_before, "$gte": expire_before},
+                "metadata.compact": {"$ne": True},
+            },
+            limit,
+        ):
+            self._guard(report, self._compact, doc, dry_run)
+
+        report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+        return report
+
+    @staticmethod
+    def _guard(report, step, doc, *args):
+        report["scanned"] += 1
+        try:
+            step(report, doc, *args)
+        except Exception:  # pylint: disable=broad-except
+            report["failed"] += 1
+            traceback.print_exc()
+
+    def _read_pcm(self, file_id) -> np.ndarray:
+        data = b"".join(self.store.iter_audio(self.store.open_audio(file_id)))
+        return self._decode(data)
+
+    def _expire(self, report, doc, dry_run, expire_before):
+        metadata = doc.get("metadata") or {}
+        features = metadata.get("features")
+        if features is None:
+            try:
+                features = clip_features(self._read_pcm(doc["_id"]))
+            except Exception:  # pylint: disable=broad-except
+                # Retention still applies to a clip we can't decode
+                traceback.print_exc()
+                features = {"duration_s": None, "stored_bytes": doc.get("length", 0)}
+        if not dry_run and not self.store.expire_audio(doc["_id"], features, expire_before):
+            # Still shared with attempts inside retention
+            return
+        report["expired"] += 1
+        report["bytes_before"] += doc.get("length", 0)
+
+    def _compact(self, report, doc, dry_run):
+        file_id = doc["_id"]
+        length = doc.get("length", 0)
+        metadata = dict(doc.get("metadata") or {})
+        pcm = self._read_pcm(file_id)
+        digest = pcm_digest(pcm)
+        features = clip_features(pcm)
+        report["bytes_before"] += length
+
+        existing = self.store.find_compact_clip(digest)
+        if existing is not None and existing != file_id:
+            # Same audio is already stored compactly: share it
+            if not dry_run:
+                self.store.repoint_attempts(file_id, existing, features)
+                self.store.delete_file(file_id)
+            report["deduplicated"] += 1
+            return
+
+        compact = self._encode(pcm, bitrate=self.policy.bitrate)
+        extra = {"compact": True, "pcm_sha256": digest, "features": features}
+        if len(compact) >= length:
+            # Already smaller than our Opus profile; keep the original bytes
+            if not dry_run:
+                self.store.mark_compact(file_id, extra)
+            report["bytes_after"] += length
+            report["compacted"] += 1
+            return
+
+        metadata.update(extra)
+        # The new file's uploadDate is today: retention keeps counting from the original
+        metadata.setdefault("uploaded_at", doc.get("uploadDate"))
+        metadata.update(
+            {
+                "bitrate": self.policy.bitrate,
+                "original_length": length,
+                "original_content_type": doc.get("contentType") or metadata.get("content_type"),
+                "content_type": OPUS_CONTENT_TYPE,
+            }
+        )
+        if not dry_run:
+            new_id = self.store.store_compact(
+                compact,
+                filename=f"{file_id}.webm",
+                content_type=OPUS_CONTENT_TYPE,
+                metadata=metadata,
+            )
+            self.store.repoint_attempts(file_id, new_id, features)
+            self.store.delete_file(file_id)
+        report["bytes_after"] += len(compact)
+        report["compacted"] += 1
+
+
+def format_report(report: Dict[str, object]) -> str:
+    """One-line human summary of a compaction pass."""
+    before = report["bytes_before"] or 1
+    return (
+        f"{'[dry run] ' if report['dry_run'] else ''}"
+        f"scanned {report['scanned']}: compacted {report['compacted']}, "
+        f"deduplicated {report['deduplicated']}, expired {report['expired']}, "
+        f"failed {report['failed']}; {report['bytes_before']} -> {report['bytes_after']} bytes "
+        f"({report['bytes_saved']} saved, {100.0 * report['bytes_saved'] / before:.1f}%)"
+    )
+
+
+def main(argv=None):
+    from .audio_store import AudioStore  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description="Compact and expire stored recordings.")
+    parser.add_argument("--dry-run", action="store_true", help="measure only, write nothing")
+    parser.add_argument("--limit", type=int, default=0, help="max files per tier (0 = all)")
+    parser.add_argument("--bitrate", type=int, help="Opus bitrate in bits/s")
+    parser.add_argument("--compact-after-hours", type=float)
+    parser.add_argument("--retain-days", type=float)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    policy = CompactionPolicy.from_env()
+    if args.bitrate:
+        policy.bitrate = args.bitrate
+    if args.compact_after_hours is not None:
+        policy.compact_after = timedelta(hours=args.compact_after_hours)
+    if args.retain_days is not None:
+        policy.retain_for = timedelta(days=args.retain_days)
+
+    store = AudioStore.from_env()
+    store.ensure_indexes()
+    lease = MaintenanceLease(store.db["maintenance_locks"])
+    if not args.dry_run and not lease.acquire():
+        parser.exit(1, "Another compaction run holds the lease; try again later.\n")
+    try:
+        report = Compactor(store, policy).run(limit=args.limit, dry_run=args.dry_run)
+    finally:
+        if not args.dry_run:
+            lease.release()
+    print(json.dumps(report) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Bounded executors and admission control for the /assess pipeline."""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request cannot be admitted; maps to 503 + Retry-After."""
+
+    def __init__(self, what: str, retry_after: int):
+        super().__init__(f"{what} is at capacity, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Stage:
+    """
+    One pipeline stage backed by its own thread pool.
+
+    At most `workers` calls run at once and at most `max_queue` more may
+    wait for a worker; anything beyond that is rejected immediately
+    instead of queueing without bound.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, retry_after: int = 1):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix=f"assess-{name}"
+        )
+        # Only touched from the event loop thread, so no lock is needed
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args, bounded: bool = True, **kwargs):
+        """
+        Run a blocking callable on this stage's pool without blocking the loop.
+        `bounded=False` skips the queue limit (for work that must not be dropped).
+        """
+        if bounded and self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(f"{self.name} stage", self.retry_after)
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Current load and lifetime counters."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """Stop accepting work and let running calls finish."""
+        self._executor.shutdown(wait=True)
+
+
+class AdmissionLimiter:
+    """Cap how many requests may be inside the pipeline at the same time."""
+
+    def __init__(self, max_in_flight: int, retry_after: int = 1):
+        self.max_in_flight = max(1, max_in_flight)
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __aenter__(self):
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise OverloadedError("assessment service", self.retry_after)
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_flight -= 1
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        """Current load and rejection count."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+class Stages:  # pylint: disable=too-few-public-methods
+    """The three blocking stages of an assessment, each sized independently."""
+
+    def __init__(self, transcode: Stage, mongo: Stage, recognize: Stage):
+        self.transcode = transcode
+        self.mongo = mongo
+        self.recognize = recognize
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-stage counters."""
+        return {
+            stage.name: stage.stats() for stage in (self.transcode, self.mongo, self.recognize)
+        }
+
+    def shutdown(self):
+        """Shut every stage down."""
+        for stage in (self.transcode, self.mongo, self.recognize):
+            stage.shutdown()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def stages_from_env() -> Stages:
+    """
+    Build stages from TRANSCODE_/MONGO_/RECOGNIZE_ WORKERS and QUEUE env vars.
+    Transcoding is CPU-bound so it defaults to one worker per core; the
+    other two mostly wait on the network and get more threads.
+    """
+    retry_after = _env_int("RETRY_AFTER_SECONDS", 1)
+    cpus = os.cpu_count() or 1
+    return Stages(
+        transcode=Stage(
+            "transcode",
+            _env_int("TRANSCODE_WORKERS", cpus),
+            _env_int("TRANSCODE_QUEUE", max(32, 4 * cpus)),
+            retry_after,
+        ),
+        mongo=Stage(
+            "mongo", _env_int("MONGO_WORKERS", 4), _env_int("MONGO_QUEUE", 64), retry_after
+        ),
+        recognize=Stage(
+            "recognize",
+            _env_int("RECOGNIZE_WORKERS", 16),
+            _env_int("RECOGNIZE_QUEUE", 32),
+            retry_after,
+        ),
+    )
+
+
+def admission_from_env() -> AdmissionLimiter:
+    """Build the request admission limiter from ASSESS_MAX_IN_FLIGHT."""
+    return AdmissionLimiter(
+        _env_int("ASSESS_MAX_IN_FLIGHT", 64), _env_int("RETRY_AFTER_SECONDS", 1)
+    )
@@ -1,66 +1,734 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-import tempfile
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import List, Optional
+import asyncio
+import json
 import os
+import socket
+import time
 import traceback
 
+import numpy as np
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from .audio_decode import OPUS_CONTENT_TYPE, PCM_SAMPLE_RATE, DecodeError, encode_opus
 from .audio_store import AudioStore 
-from .pronun_assess import convert_to_wav, pronunciation_assessment
+from .compaction import CompactionPolicy, Compactor, MaintenanceLease, format_report
+from .concurrency import OverloadedError, admission_from_env, stages_from_env
+from .http_range import RangeNotSatisfiable, parse_range
+from .job_queue import FINISHED, JobQueue, JobWaiters, serialize_job
+from .prescore import PreScorer
+from .pronun_assess import decode_to_pcm, recognizer_pool
+from .result_cache import ResultCache, cache_key
+from .scorers import scorer_from_env
+from .vad import NoSpeechError, VoiceTrimmer
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    """
+    Connect to Mongo and start the background workers for as long as the
+    app is up. Nothing here waits on the network: warming Azure and
+    checking Mongo happen in the background, and /readyz reports when
+    they are done.
+    """
+    if audio_store is None:
+        connect_storage()
+    tasks = [asyncio.create_task(warm_up())]
+    if audio_store is not None and COMPACTION_INTERVAL > 0:
+        tasks.append(asyncio.create_task(compaction_loop()))
+    if job_queue is not None:
+        tasks += [asyncio.create_task(job_worker()) for _ in range(JOB_WORKERS)]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Mongo-backed state, set up by connect_storage() when the app starts.
+# Tests monkeypatch these directly.
+audio_store = None
+# Repeat submissions of the same clip are answered without calling Azure
+result_cache = ResultCache.from_env()
+# Queued assessments, so callers don't hold a connection open while Azure works
+job_queue = None
+# Cuts leading/trailing silence so Azure isn't sent (and doesn't bill) it
+trimmer = VoiceTrimmer.from_env()
+# Grades silent, truncated and clearly wrong clips locally instead of calling Azure
+prescorer = PreScorer.from_env()
+
+# Azure, or the local simulation for offline load tests (SCORER_BACKEND)
+scorer = scorer_from_env()
+
+# Blocking work runs on per-stage pools so the event loop stays free
+stages = stages_from_env()
+admission = admission_from_env()
+
+job_waiters = JobWaiters()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+MAX_JOB_WAIT_SECONDS = 30.0
+_job_wakeup = asyncio.Event()
+
+# Stored audio is compacted to Opus and eventually dropped; see compaction.py
+COMPACTION_INTERVAL = float(os.getenv("AUDIO_COMPACTION_INTERVAL", "3600"))
+COMPACTION_BATCH = int(os.getenv("AUDIO_COMPACTION_BATCH", "200"))
+last_compaction = None
+
+# What /readyz waits for. "mongo" stays None when storage isn't configured.
+readiness = {"scorer": False, "mongo": None}
+MONGO_RETRY_MAX_SECONDS = 10.0
+
+# Batch assessment: most clips per request, and how many of them are
+# scored at once, so one batch can't take over the stages
+BATCH_MAX_CLIPS = int(os.getenv("BATCH_MAX_CLIPS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Streamed attempts: how long to wait for the opening message, and the
+# longest a session may run before it is scored with what has arrived
+STREAM_START_TIMEOUT = 10.0
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "30"))
+
+
+def connect_storage():
+    """
+    Build the Mongo-backed store, cache tier and job queue from the
+    environment. MongoClient connects lazily, so this doesn't block.
+    """
+    global audio_store, result_cache, job_queue, prescorer  # pylint: disable=global-statement
+    try:
+        audio_store = AudioStore.from_env()
+    except ValueError:
+        # MONGO_URI / DB_NAME not set: score requests without storing them
+        print("MONGO_URI / DB_NAME not set; running without storage")
+        return
+    result_cache = ResultCache.from_env(audio_store.db["assessment_cache"])
+    job_queue = JobQueue.from_env(audio_store.db["assessment_jobs"])
+    prescorer = PreScorer.from_env(audio_store.db["spell_templates"])
+    readiness["mongo"] = False
+
+
+async def warm_up():
+    """Warm the scorer, then wait for Mongo and create indexes."""
+    try:
+        await asyncio.to_thread(scorer.warm_up)
+        readiness["scorer"] = True
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+    if audio_store is None:
+        return
+    delay = 0.1
+    while True:
+        try:
+            await stages.mongo.run(audio_store.db.command, "ping", bounded=False)
+            break
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Mongo not ready ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MONGO_RETRY_MAX_SECONDS)
+    readiness["mongo"] = True
+    await ensure_indexes()
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def ensure_indexes():
+    """Create every collection index the service queries by."""
+    creators = [
+        audio_store.ensure_indexes,
+        result_cache.ensure_indexes,
+        prescorer.templates.ensure_indexes,
+    ]
+    if job_queue is not None:
+        creators.append(job_queue.ensure_indexes)
+    for create in creators:
+        try:
+            await stages.mongo.run(create, bounded=False)
+        except Exception:
+            traceback.print_exc()
+
+
+def compact_once():
+    """One compaction pass, if no other replica is running one."""
+    lease = MaintenanceLease(audio_store.db["maintenance_locks"])
+    if not lease.acquire():
+        return None
+    try:
+        return Compactor(audio_store, CompactionPolicy.from_env()).run(limit=COMPACTION_BATCH)
+    finally:
+        lease.release()
+
+
+async def compaction_loop():
+    """Compact stored audio every COMPACTION_INTERVAL seconds."""
+    global last_compaction  # pylint: disable=global-statement
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL)
+        try:
+            # Long-running and CPU-heavy: keep it off the request stages
+            report = await asyncio.to_thread(compact_once)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            continue
+        if report is not None:
+            last_compaction = report
+            print(f"Audio compaction: {format_report(report)}")
+
+
+async def store_attempt(data: bytes, *, file_id, spell, filename, content_type, result, user=None):
+    """Persist the original upload and its score; runs after the response is sent."""
+    if audio_store is None:
+        # Running without storage (no MONGO_URI): nothing to keep
+        return
+    try:
+        await stages.mongo.run(
+            audio_store.save_audio,
+            BytesIO(data),
+            spell=spell,
+            filename=filename,
+            content_type=content_type,
+            score=result.get("accuracy_score"),
+            transcript=result.get("recognized_text"),
+            file_id=file_id,
+            user=user,
+            grade=result.get("grade"),
+            bounded=False,
+        )
+    except Exception:
+        traceback.print_exc()
+
+
+async def _cached_result(key: str):
+    """Memory tier first; only go to Mongo (off the loop) on a local miss."""
+    result = result_cache.get_local(key)
+    if result is None and result_cache.has_persistent_tier:
+        result = await stages.mongo.run(result_cache.get_persistent, key)
+    return result
 
-app = FastAPI()
-try:
-    # In normal runtime, use env config.
-    audio_store = AudioStore.from_env()
-except ValueError:
-    # In test/CI environments where MONGO_URI / DB_NAME are not set,
-    # allow import to succeed. Tests will monkeypatch `convert.audio_store`.
-    audio_store = None
 
 @app.post("/assess")
 async def assess_pronunciation(
+    background_tasks: BackgroundTasks,
     spell: str = Form(...),
     audio: UploadFile = File(...),
+    user: Optional[str] = Form(None),
 ):
-    try:
-        content_type = audio.content_type or "audio/webm"
-        if content_type == "video/webm":
-            content_type = "audio/webm"
+    async with admission:
+        return await _assess(background_tasks, spell, audio, user)
 
-        # Save the uploaded audio into GridFS
-        file_id = audio_store.save_audio(
-            audio.file,
-            spell=spell,
-            filename=audio.filename,
-            content_type=content_type,
-        )
 
-        # Dump audio bytes from GridFS to a temp source file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp_in:
-            # write into the open file object
-            audio_store.load_audio_to_file(file_id, tmp_in)
-            input_path = tmp_in.name  # remember the path for later
+def _normalise_content_type(content_type: Optional[str]) -> str:
+    content_type = content_type or "audio/webm"
+    return "audio/webm" if content_type == "video/webm" else content_type
 
-        # Convert that source file to WAV (Azure-friendly)
-        wav_path = convert_to_wav(input_path)
 
-        # Run pronunciation assessment on the WAV file
-        result = pronunciation_assessment(spell, wav_path)
+def _decode_and_trim(data: bytes, spell: str):
+    """Decoded PCM cut down to its speech, and the trim report."""
+    return trimmer.trim(spell, decode_to_pcm(data))
 
-        # Clean up temp files
-        for path in (input_path, wav_path):
-            try:
-                os.remove(path)
-            except OSError:
-                pass
 
-        # Include file_id in response
-        result["file_id"] = str(file_id)
+async def _score(data: bytes, spell: str, *, filename, content_type, defer, user=None) -> dict:
+    """
+    Decode and trim, score (or reuse a cached score) and schedule storage of one upload.
+    `defer(func, *args, **kwargs)` runs follow-up work after the caller answers.
+    """
+    # Decode the upload straight to PCM in memory, keeping only the speech
+    pcm, trim = await stages.transcode.run(_decode_and_trim, data, spell)
+
+    # Identical audio + spell reuses an earlier score
+    key = cache_key(pcm, spell)
+    result = await _cached_result(key)
+    if result is None:
+        # Clips that clearly fail are graded here and never reach the scorer
+        result = await stages.transcode.run(prescorer.check, spell, pcm)
+    if result is None:
+        # Run pronunciation assessment on the decoded audio
+        result = await stages.recognize.run(scorer.score, spell, pcm)
+        result_cache.put_local(key, result)
+        defer(stages.mongo.run, result_cache.put_persistent, key, dict(result), bounded=False)
+        if prescorer.should_learn(result):
+            defer(stages.transcode.run, prescorer.learn, spell, pcm, dict(result), bounded=False)
+        result["cached"] = False
+    elif result.get("prescored"):
+        result["cached"] = False
+    else:
+        result["cached"] = True
+
+    # Write the original upload to GridFS after the answer goes out,
+    # so scoring latency doesn't include the Mongo write.
+    file_id = ObjectId()
+    defer(
+        store_attempt,
+        data,
+        file_id=file_id,
+        spell=spell,
+        filename=filename,
+        content_type=content_type,
+        result=dict(result),
+        user=user,
+    )
 
+    # Include file_id in response
+    result["file_id"] = str(file_id)
+    if trim is not None:
+        result["trim"] = trim
+    return result
+
+
+async def _assess(
+    background_tasks: BackgroundTasks, spell: str, audio: UploadFile, user: Optional[str] = None
+):
+    try:
+        # Read the upload once
+        data = await audio.read()
+        result = await _score(
+            data,
+            spell,
+            filename=audio.filename,
+            content_type=_normalise_content_type(audio.content_type),
+            defer=background_tasks.add_task,
+            user=user,
+        )
         return JSONResponse(
             content=result,
             status_code=200
             )
 
+    except OverloadedError:
+        raise
+    except DecodeError as e:
+        # Corrupt or unsupported upload: the client's problem, not ours
+        raise HTTPException(status_code=415, detail=str(e))
+    except NoSpeechError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/assess/batch")
+async def assess_batch(
+    background_tasks: BackgroundTasks,
+    audio: List[UploadFile] = File(...),
+    spell: List[str] = Form(...),
+    user: Optional[str] = Form(None),
+):
+    """
+    Score several uploads in one request. `spell` is given once per clip,
+    or once for all of them. Clips go through the same decode, cache,
+    pre-score and scoring path as /assess, BATCH_CONCURRENCY at a time.
+    The response lists one result per clip, in order; a clip that could
+    not be scored gets {"success": false, "error"} without failing the rest.
+    """
+    if len(spell) == 1:
+        spell = spell * len(audio)
+    if len(spell) != len(audio):
+        raise HTTPException(status_code=422, detail="Give one spell, or one per audio file")
+    if len(audio) > BATCH_MAX_CLIPS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {BATCH_MAX_CLIPS} clips per batch"
+        )
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def score_one(upload: UploadFile, reference: str) -> dict:
+        async with slots:
+            try:
+                return await _score(
+                    await upload.read(),
+                    reference,
+                    filename=upload.filename,
+                    content_type=_normalise_content_type(upload.content_type),
+                    defer=background_tasks.add_task,
+                    user=user,
+                )
+            except OverloadedError as e:
+                return {"success": False, "error": str(e), "retry_after": e.retry_after}
+            except NoSpeechError as e:
+                return {"success": False, "error": str(e)}
+            except Exception as e:  # pylint: disable=broad-except
+                traceback.print_exc()
+                return {"success": False, "error": str(e)}
+
+    async with admission:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(score_one(a, s) for a, s in zip(audio, spell)))
+    return {
+        "results": results,
+        "scored": sum(1 for r in results if r.get("success")),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+@app.websocket("/ws/assess")
+async def assess_stream(websocket: WebSocket):
+    """
+    Score an attempt while it is being recorded.
+
+    The client opens with a JSON message {"spell", "user"?, "sample_rate"}
+    and then sends 16 kHz mono int16 PCM in binary messages. The server
+    answers {"event": "speech_start"} once it hears speech and
+    {"event": "speech_end"} once the speech is over; the client may also
+    send {"event": "stop"} itself. The last message is
+    {"event": "result", ...} with the fields /assess returns, or
+    {"event": "error", "error"}. Then the socket closes.
+    """
+    await websocket.accept()
+    try:
+        start = await asyncio.wait_for(websocket.receive_json(), STREAM_START_TIMEOUT)
+        spell = str(start["spell"])
+        if int(start.get("sample_rate", PCM_SAMPLE_RATE)) != PCM_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be {PCM_SAMPLE_RATE}")
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+        await _end_stream(websocket, {"event": "error", "error": f"Bad opening message: {e!r}"})
+        return
+
+    followups = []
+    try:
+        async with admission:
+            result = await _score_stream(
+                websocket,
+                spell,
+                user=start.get("user"),
+                defer=lambda func, *args, **kwargs: followups.append((func, args, kwargs)),
+            )
+    except WebSocketDisconnect:
+        return
+    except OverloadedError as e:
+        message = {"event": "error", "error": str(e), "retry_after": e.retry_after}
+    except NoSpeechError as e:
+        message = {"event": "error", "error": str(e)}
+    except Exception as e:  # pylint: disable=broad-except
+        traceback.print_exc()
+        message = {"event": "error", "error": str(e)}
+    else:
+        message = {"event": "result", **result}
+    await _end_stream(websocket, message)
+    for func, args, kwargs in followups:
+        await func(*args, **kwargs)
+
+
+async def _end_stream(websocket: WebSocket, message: dict):
+    """Send the last message and close, unless the client already went away."""
+    try:
+        await websocket.send_json(message)
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+async def _score_stream(websocket: WebSocket, spell: str, *, user, defer) -> dict:
+    """
+    Feed the socket's audio through the endpointer into a scoring stream
+    as it arrives, and return the result once speech ends.
+    """
+    endpointer = trimmer.endpointer(spell)
+    stream = pending = None
+    speech = []
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    try:
+        while not endpointer.ended:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive(), max(0.0, deadline - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                message = {"type": "websocket.receive", "text": '{"event": "stop"}'}
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                out = endpointer.feed(np.frombuffer(message["bytes"], dtype=np.int16))
+            elif json.loads(message.get("text") or "{}").get("event") == "stop":
+                out = endpointer.finish()
+            else:
+                continue
+
+            if endpointer.started and stream is None:
+                stream = await stages.recognize.run(scorer.open_stream, spell)
+                if stream.incremental:
+                    # The scorer listens while the user is still speaking
+                    pending = asyncio.ensure_future(
+                        stages.recognize.run(stream.result, bounded=False)
+                    )
+                await websocket.send_json({"event": "speech_start"})
+            if len(out):
+                stream.write(out)
+                speech.append(out)
+        stream.close()
+        await websocket.send_json({"event": "speech_end"})
+    except NoSpeechError:
+        trimmer.reject()
+        raise
+    except BaseException:
+        if stream is not None:
+            stream.close()
+        if pending is not None:
+            pending.cancel()
+        raise
+
+    pcm = np.concatenate(speech)
+    trim = endpointer.report()
+    trimmer.record(trim)
+    # Identical audio + spell reuses an earlier score, as uploads do. An
+    # incremental scorer was called at speech onset, so a hit would save
+    # nothing: its result only goes into the cache for later attempts.
+    key = cache_key(pcm, spell)
+    result = await _cached_result(key) if pending is None else None
+    cached = result is not None and not result.get("prescored")
+    if result is None:
+        # An incremental scorer has been listening since speech began, so a
+        # local verdict now saves no call; it is counted as such
+        result = await stages.transcode.run(prescorer.check, spell, pcm, pending is not None)
+    if result is None:
+        result = await (pending or stages.recognize.run(stream.result))
+        result_cache.put_local(key, result)
+        defer(stages.mongo.run, result_cache.put_persistent, key, dict(result), bounded=False)
+        if prescorer.should_learn(result):
+            defer(stages.transcode.run, prescorer.learn, spell, pcm, dict(result), bounded=False)
+    elif pending is not None:
+        # Answered without it; the scorer's answer, when it comes, is not needed
+        pending.cancel()
+        pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+    result["cached"] = cached
+
+    file_id = ObjectId()
+    defer(store_stream, pcm, file_id=file_id, spell=spell, result=dict(result), user=user)
+    result["file_id"] = str(file_id)
+    result["trim"] = trim
+    return result
+
+
+async def store_stream(pcm: np.ndarray, *, file_id, spell, result, user=None):
+    """Keep a streamed attempt's speech, compressed to Opus, like an upload."""
+    if audio_store is None:
+        return
+    try:
+        data = await stages.transcode.run(encode_opus, pcm, bounded=False)
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return
+    await store_attempt(
+        data,
+        file_id=file_id,
+        spell=spell,
+        filename="stream.webm",
+        content_type=OPUS_CONTENT_TYPE,
+        result=result,
+        user=user,
+    )
+
+
+def _require_job_queue():
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is not configured")
+    return job_queue
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    spell: str = Form(...),
+    audio: UploadFile = File(...),
+    user: Optional[str] = Form(None),
+):
+    """Queue an upload for assessment and return its job id straight away."""
+    queue = _require_job_queue()
+    data = await audio.read()
+    job_id = await stages.mongo.run(
+        queue.enqueue,
+        data,
+        spell=spell,
+        filename=audio.filename,
+        content_type=_normalise_content_type(audio.content_type),
+        user=user,
+    )
+    _job_wakeup.set()
+    return {"job_id": str(job_id), "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0.0):
+    """
+    A job's status and, once finished, its result. With `wait`, hold the
+    request open (long-poll) for up to that many seconds until it finishes.
+    """
+    queue = _require_job_queue()
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    oid = ObjectId(job_id)
+    deadline = time.monotonic() + min(max(wait, 0.0), MAX_JOB_WAIT_SECONDS)
+    # Other long-polls may share the job's event: only the last one out drops it
+    job_waiters.acquire(job_id)
+    try:
+        while True:
+            # Register before reading so a finish in between is not missed
+            event = job_waiters.event(job_id)
+            job = await stages.mongo.run(queue.get, oid)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found")
+            remaining = deadline - time.monotonic()
+            if job["status"] in FINISHED or remaining <= 0:
+                return serialize_job(job)
+            # Woken at once when this process finishes the job; otherwise
+            # re-read periodically in case another replica ran it.
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, JOB_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        job_waiters.release(job_id)
+
+
+async def run_job(job: dict):
+    """Score one claimed job and record the outcome."""
+    job_id = job["_id"]
+    followups = []
+    try:
+        if job.get("attempts", 1) > job_queue.max_attempts:
+            await stages.mongo.run(
+                job_queue.fail, job_id, "Gave up after repeated worker failures", bounded=False
+            )
+            return
+        try:
+            result = await _score(
+                bytes(job["audio"]),
+                job["spell"],
+                filename=job.get("filename"),
+                content_type=job.get("content_type", "audio/webm"),
+                user=job.get("user"),
+                defer=lambda func, *args, **kwargs: followups.append((func, args, kwargs)),
+            )
+        except OverloadedError as e:
+            # Leave it for later (or for a less busy replica)
+            await stages.mongo.run(job_queue.release, job_id, bounded=False)
+            await asyncio.sleep(e.retry_after)
+            return
+        except (NoSpeechError, DecodeError) as e:
+            # The upload itself is unusable, as /assess would have answered
+            await stages.mongo.run(job_queue.fail, job_id, str(e), bounded=False)
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            traceback.print_exc()
+            await stages.mongo.run(job_queue.fail, job_id, str(e), bounded=False)
+            return
+        await stages.mongo.run(job_queue.complete, job_id, result, bounded=False)
+    finally:
+        job_waiters.notify(str(job_id))
+    for func, args, kwargs in followups:
+        await func(*args, **kwargs)
+
+
+async def job_worker():
+    """Claim and run jobs until cancelled."""
+    while True:
+        try:
+            job = await stages.mongo.run(job_queue.claim, bounded=False)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            job = None
+        if job is None:
+            _job_wakeup.clear()
+            try:
+                await asyncio.wait_for(_job_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await run_job(job)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+
+
+@app.get("/audio/{file_id}")
+async def get_audio(file_id: str, request: Request):
+    """
+    Stream a stored clip chunk by chunk, honouring a single byte Range so
+    players can seek without downloading the whole file.
+    """
+    if audio_store is None:
+        raise HTTPException(status_code=503, detail="Audio storage is not configured")
+    if not ObjectId.is_valid(file_id):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    try:
+        grid_out = await stages.mongo.run(audio_store.open_audio, ObjectId(file_id))
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    length = grid_out.length
+    headers = {"Accept-Ranges": "bytes"}
+    try:
+        byte_range = parse_range(request.headers.get("range"), length)
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{length}"
+        return Response(status_code=416, headers=headers)
+
+    status_code = 200
+    start, end = 0, length - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        audio_store.iter_audio(grid_out, start, end + 1),
+        status_code=status_code,
+        headers=headers,
+        media_type=grid_out.content_type or "application/octet-stream",
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving its event loop."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: the scorer is warm (for Azure: SDK loaded, recognizers
+    connecting) and Mongo (when configured) has answered a ping. 503
+    until then, so no traffic is routed here before the first request
+    can be served quickly.
+    """
+    ready = readiness["scorer"] and readiness["mongo"] is not False
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "scorer": readiness["scorer"],
+            "backend": scorer.name,
+            "mongo": readiness["mongo"],
+        },
+    )
+
+
+@app.get("/stats")
+async def stats():
+    """Runtime counters for the scoring pipeline."""
+    return {
+        "replica": socket.gethostname(),
+        "scorer": scorer.stats(),
+        "prescore": prescorer.stats(),
+        "vad": trimmer.stats(),
+        "recognizer_pool": recognizer_pool.stats(),
+        "result_cache": result_cache.stats(),
+        "admission": admission.stats(),
+        "stages": stages.stats(),
+        "compaction": last_compaction,
+    }
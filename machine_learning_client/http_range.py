@@ -0,0 +1,45 @@
+"""Parsing of single-range HTTP Range headers (RFC 9110 section 14)."""
+
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range lies outside the resource."""
+
+    def __init__(self, length: int):
+        super().__init__(f"Range not satisfiable for {length} bytes")
+        self.length = length
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (first, last) byte positions requested by `header`, or None
+    to send the whole resource. Malformed headers and multi-range requests
+    are ignored, as the RFC allows; ranges past the end raise
+    RangeNotSatisfiable.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the final N bytes
+            suffix = int(last)
+            # An empty resource has no final bytes to send
+            if suffix <= 0 or length == 0:
+                raise RangeNotSatisfiable(length)
+            return max(0, length - suffix), length - 1
+        start = int(first)
+        end = int(last) if last else length - 1
+    except ValueError:
+        return None
+    if start >= length:
+        raise RangeNotSatisfiable(length)
+    if end < start:
+        return None
+    return start, min(end, length - 1)
@@ -0,0 +1,201 @@
+"""Mongo-backed queue of pronunciation assessment jobs."""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from bson import Binary, ObjectId  # pylint: disable=import-error
+from pymongo import ASCENDING, ReturnDocument  # pylint: disable=import-error
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+# Fields a client may see; the uploaded audio stays server-side
+PUBLIC_FIELDS = {
+    "status": 1,
+    "spell": 1,
+    "user": 1,
+    "result": 1,
+    "error": 1,
+    "attempts": 1,
+    "created_at": 1,
+    "finished_at": 1,
+}
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+class JobQueue:
+    """
+    Assessment jobs stored in one collection, so queued work survives
+    restarts and any replica can pick it up.
+
+    Workers claim a job atomically and hold it under a lease. A job
+    whose worker died is claimed again once its lease runs out, up to
+    `max_attempts` times. Finished jobs drop their audio and expire
+    `keep_seconds` later through a TTL index.
+    """
+
+    def __init__(
+        self,
+        collection,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 3,
+        keep_seconds: int = 86400,
+    ):
+        self._col = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.keep_seconds = keep_seconds
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._indexed = False
+
+    @classmethod
+    def from_env(cls, collection):
+        """Create a queue tuned by JOB_LEASE_SECONDS / JOB_MAX_ATTEMPTS / JOB_KEEP_SECONDS."""
+        return cls(
+            collection,
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "120")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            keep_seconds=int(os.getenv("JOB_KEEP_SECONDS", "86400")),
+        )
+
+    def ensure_indexes(self):
+        """Index the claim query and expire finished jobs."""
+        if self._indexed:
+            return
+        self._col.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+        self._col.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+        self._col.create_index("expire_at", expireAfterSeconds=0)
+        self._indexed = True
+
+    def enqueue(  # pylint: disable=too-many-arguments
+        self,
+        data: bytes,
+        *,
+        spell: str,
+        filename: str,
+        content_type: str,
+        user: Optional[str] = None,
+    ) -> ObjectId:
+        """Store an upload as a queued job and return its id."""
+        self.ensure_indexes()
+        job_id = ObjectId()
+        doc = {
+            "_id": job_id,
+            "status": QUEUED,
+            "spell": spell,
+            "filename": filename,
+            "content_type": content_type,
+            "audio": Binary(data),
+            "attempts": 0,
+            "created_at": _now(),
+        }
+        if user:
+            doc["user"] = user
+        self._col.insert_one(doc)
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Atomically take the oldest runnable job, or None when there is none."""
+        now = _now()
+        return self._col.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED},
+                    {"status": RUNNING, "lease_until": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": self.worker_id,
+                    "started_at": now,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _finish(self, job_id: ObjectId, fields: Dict[str, object]) -> bool:
+        now = _now()
+        fields.update(
+            {"finished_at": now, "expire_at": now + timedelta(seconds=self.keep_seconds)}
+        )
+        res = self._col.update_one(
+            # Only the current lease holder may finish the job
+            {"_id": job_id, "status": RUNNING, "worker": self.worker_id},
+            {"$set": fields, "$unset": {"audio": "", "lease_until": ""}},
+        )
+        return res.modified_count == 1
+
+    def complete(self, job_id: ObjectId, result: dict) -> bool:
+        """Record a job's result."""
+        return self._finish(job_id, {"status": DONE, "result": result})
+
+    def fail(self, job_id: ObjectId, error: str) -> bool:
+        """Record that a job could not be scored."""
+        return self._finish(job_id, {"status": FAILED, "error": error})
+
+    def release(self, job_id: ObjectId) -> bool:
+        """Give a claimed job back to the queue (e.g. when overloaded)."""
+        res = self._col.update_one(
+            {"_id": job_id, "status": RUNNING, "worker": self.worker_id},
+            {"$set": {"status": QUEUED}, "$inc": {"attempts": -1}, "$unset": {"lease_until": ""}},
+        )
+        return res.modified_count == 1
+
+    def get(self, job_id: ObjectId) -> Optional[dict]:
+        """A job's public fields, or None."""
+        return self._col.find_one({"_id": job_id}, PUBLIC_FIELDS)
+
+
+class JobWaiters:
+    """
+    Wake long-polling requests in this process when a job finishes here.
+    Jobs finished by another replica are noticed by re-reading Mongo.
+    """
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def acquire(self, job_id: str):
+        """Register a waiter on `job_id`; pair every call with `release`."""
+        self._waiting[job_id] = self._waiting.get(job_id, 0) + 1
+
+    def release(self, job_id: str):
+        """Unregister a waiter; the job's event is dropped with the last one."""
+        count = self._waiting.get(job_id, 0) - 1
+        if count > 0:
+            self._waiting[job_id] = count
+        else:
+            self._waiting.pop(job_id, None)
+            self._events.pop(job_id, None)
+
+    def event(self, job_id: str) -> asyncio.Event:
+        """Event that is set when `job_id` finishes in this process (while acquired)."""
+        return self._events.setdefault(job_id, asyncio.Event())
+
+    def notify(self, job_id: str):
+        """Wake everyone waiting on `job_id`."""
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+
+def serialize_job(job: dict) -> dict:
+    """JSON-safe view of a job document."""
+    out = {"job_id": str(job["_id"])}
+    for field in PUBLIC_FIELDS:
+        if field in job:
+            value = job[field]
+            out[field] = value.isoformat() if isinstance(value, datetime) else value
+    return out
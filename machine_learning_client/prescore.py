@@ -0,0 +1,274 @@
+"""
+Local pre-scoring: grade clearly failing attempts without calling Azure.
+
+Before a clip goes to the scorer it is checked against reference
+templates for its spell. A template is the MFCCs of an earlier attempt
+that Azure scored highly, so templates build up on their own as the app
+is used. A clip is graded "T" locally when it is:
+
+- silent or nearly so;
+- far shorter than the spell's templates (truncated);
+- far from every template under DTW, relative to how far the templates
+  are from each other.
+
+Anything else is forwarded to the scorer. Until a spell has enough
+templates, only the silence check applies.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson import Binary
+
+from .acoustic import FRAME_LENGTH, HOP_LENGTH, dtw_distance, hop_seconds, mfcc_batch, voiced_bounds
+from .pronun_assess import grade_from_score
+
+# Local verdicts never claim more than this, so they always grade "T"
+MAX_LOCAL_SCORE = 19.0
+
+
+def _spell_key(spell: str) -> str:
+    return spell.strip().lower()
+
+
+def speech_span(pcm: np.ndarray) -> np.ndarray:
+    """The clip from its first to its last voiced frame."""
+    first, end, _ = voiced_bounds(pcm)
+    return pcm[first * HOP_LENGTH:(end - 1) * HOP_LENGTH + FRAME_LENGTH] if end else pcm[:0]
+
+
+class TemplateStore:
+    """
+    Reference MFCC templates per spell: an in-process copy in front of an
+    optional Mongo collection shared by every replica. A spell's templates
+    are re-read from Mongo at most every `refresh_seconds`.
+    """
+
+    def __init__(self, collection=None, max_per_spell: int = 5, refresh_seconds: float = 300.0):
+        self._col = collection
+        self.max_per_spell = max_per_spell
+        self.refresh_seconds = refresh_seconds
+        self._local: Dict[str, List[np.ndarray]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._spread: Dict[str, Optional[float]] = {}
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        """Index templates by spell, newest first."""
+        if self._col is not None:
+            self._col.create_index([("spell", 1), ("created_at", -1)])
+
+    def _load(self, key: str) -> List[np.ndarray]:
+        docs = self._col.find({"spell": key}, {"mfcc": 1, "dims": 1}).sort("created_at", -1)
+        return [
+            np.frombuffer(doc["mfcc"], dtype=np.float32).reshape(-1, doc["dims"])
+            for doc in docs.limit(self.max_per_spell)
+        ]
+
+    def get(self, spell: str, now: Optional[float] = None) -> List[np.ndarray]:
+        """Templates for a spell (may read Mongo, so call it off the event loop)."""
+        key = _spell_key(spell)
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            templates = self._local.get(key)
+            fresh = now - self._loaded_at.get(key, float("-inf")) < self.refresh_seconds
+        if templates is not None and (fresh or self._col is None):
+            return templates
+        if self._col is None:
+            return []
+        try:
+            templates = self._load(key)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            return templates or []
+        with self._lock:
+            self._local[key] = templates
+            self._loaded_at[key] = now
+            self._spread.pop(key, None)
+        return templates
+
+    def add(self, spell: str, mfcc: np.ndarray):
+        """Keep a new template (the oldest beyond max_per_spell is dropped)."""
+        key = _spell_key(spell)
+        mfcc = np.ascontiguousarray(mfcc, dtype=np.float32)
+        with self._lock:
+            templates = [mfcc] + self._local.get(key, [])
+            self._local[key] = templates[: self.max_per_spell]
+            self._spread.pop(key, None)
+        if self._col is not None:
+            try:
+                self._col.insert_one(
+                    {
+                        "spell": key,
+                        "mfcc": Binary(mfcc.tobytes()),
+                        "dims": int(mfcc.shape[1]),
+                        "frames": int(mfcc.shape[0]),
+                        "created_at": datetime.now(tz=timezone.utc),
+                    }
+                )
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+
+    def spread(self, spell: str, templates: List[np.ndarray]) -> Optional[float]:
+        """Median DTW distance between a spell's templates (cached until they change)."""
+        key = _spell_key(spell)
+        with self._lock:
+            if key in self._spread:
+                return self._spread[key]
+        pairs = [
+            dtw_distance(templates[i], templates[j])
+            for i in range(len(templates))
+            for j in range(i + 1, len(templates))
+        ]
+        value = float(np.median(pairs)) if pairs else None
+        with self._lock:
+            self._spread[key] = value
+        return value
+
+    def counts(self) -> Dict[str, int]:
+        """Templates held in memory per spell."""
+        with self._lock:
+            return {key: len(value) for key, value in self._local.items()}
+
+
+class PreScorer:
+    """Decide locally when a clip clearly fails; otherwise defer to the scorer."""
+
+    def __init__(
+        self,
+        templates: Optional[TemplateStore] = None,
+        *,
+        enabled: bool = True,
+        min_speech_seconds: float = 0.15,
+        min_templates: int = 2,
+        min_coverage: float = 0.45,
+        reject_factor: float = 1.6,
+        learn_min_score: float = 80.0,
+    ):
+        self.templates = templates or TemplateStore()
+        self.enabled = enabled
+        self.min_speech_seconds = min_speech_seconds
+        self.min_templates = min_templates
+        self.min_coverage = min_coverage
+        self.reject_factor = reject_factor
+        self.learn_min_score = learn_min_score
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.forwarded = 0
+        self.rejected: Dict[str, int] = {"no_speech": 0, "too_short": 0, "mismatch": 0}
+        # Local verdicts on streams whose scorer session was already open
+        self.rejected_after_open = 0
+        self.learned = 0
+
+    @classmethod
+    def from_env(cls, collection=None):
+        """Pre-scorer tuned by PRESCORE_* variables; PRESCORE_ENABLED=0 turns it off."""
+        return cls(
+            TemplateStore(
+                collection,
+                max_per_spell=int(os.getenv("PRESCORE_TEMPLATES_PER_SPELL", "5")),
+            ),
+            enabled=os.getenv("PRESCORE_ENABLED", "1") not in ("0", "false", "no"),
+            min_templates=int(os.getenv("PRESCORE_MIN_TEMPLATES", "2")),
+            min_coverage=float(os.getenv("PRESCORE_MIN_COVERAGE", "0.45")),
+            reject_factor=float(os.getenv("PRESCORE_REJECT_FACTOR", "1.6")),
+            learn_min_score=float(os.getenv("PRESCORE_LEARN_MIN_SCORE", "80")),
+        )
+
+    def _verdict(self, spell: str, reason: str, score: float, scorer_opened: bool) -> dict:
+        with self._lock:
+            self.rejected[reason] += 1
+            if scorer_opened:
+                self.rejected_after_open += 1
+        score = round(min(MAX_LOCAL_SCORE, max(0.0, score)), 1)
+        grade = grade_from_score(score)
+        return {
+            "success": True,
+            "recognized_text": "",
+            "accuracy_score": score,
+            "reference_text": spell,
+            "grade": grade["grade"],
+            "grade_label": grade["label"],
+            "prescored": reason,
+        }
+
+    def check(self, spell: str, pcm: np.ndarray, scorer_opened: bool = False) -> Optional[dict]:
+        """
+        A local "T" result when the clip clearly fails, else None (send it
+        to the scorer). Blocking and CPU-bound. `scorer_opened` says the
+        scorer is already working on this clip (a stream recognised as it
+        arrived), so a local verdict no longer saves a call.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.checked += 1
+        _, _, voiced = voiced_bounds(pcm)
+        if voiced * hop_seconds() < self.min_speech_seconds:
+            return self._verdict(spell, "no_speech", 0.0, scorer_opened)
+
+        templates = self.templates.get(spell)
+        if len(templates) >= self.min_templates:
+            features = mfcc_batch([speech_span(pcm)])[0]
+            expected = float(np.median([len(t) for t in templates]))
+            coverage = len(features) / expected
+            if coverage < self.min_coverage:
+                return self._verdict(
+                    spell, "too_short", MAX_LOCAL_SCORE * coverage / self.min_coverage, scorer_opened
+                )
+            spread = self.templates.spread(spell, templates)
+            if spread:
+                threshold = self.reject_factor * spread
+                distance = min(dtw_distance(features, t) for t in templates)
+                if distance > threshold:
+                    return self._verdict(
+                        spell, "mismatch", MAX_LOCAL_SCORE * threshold / distance, scorer_opened
+                    )
+
+        with self._lock:
+            self.forwarded += 1
+        return None
+
+    def should_learn(self, result: dict) -> bool:
+        """Whether a scorer result is good enough to become a template."""
+        return (
+            self.enabled
+            and bool(result.get("success"))
+            and not result.get("prescored")
+            and (result.get("accuracy_score") or 0.0) >= self.learn_min_score
+        )
+
+    def learn(self, spell: str, pcm: np.ndarray, result: dict):
+        """Keep a clip the scorer rated highly as a template for its spell."""
+        if not self.should_learn(result):
+            return
+        span = speech_span(pcm)
+        if len(span) == 0:
+            return
+        self.templates.add(spell, mfcc_batch([span])[0])
+        with self._lock:
+            self.learned += 1
+
+    def stats(self) -> Dict[str, object]:
+        """
+        How many clips were settled locally. Each one is an avoided scorer
+        call unless the scorer had already been opened for it.
+        """
+        with self._lock:
+            avoided = sum(self.rejected.values()) - self.rejected_after_open
+            return {
+                "enabled": self.enabled,
+                "checked": self.checked,
+                "forwarded": self.forwarded,
+                "rejected": dict(self.rejected),
+                "rejected_after_open": self.rejected_after_open,
+                "calls_avoided": avoided,
+                "avoided_rate": avoided / self.checked if self.checked else 0.0,
+                "learned": self.learned,
+                "spells_with_templates": len(self.templates.counts()),
+            }
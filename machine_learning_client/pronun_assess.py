@@ -1,8 +1,9 @@
-from azure.cognitiveservices.speech import SpeechConfig, AudioConfig
-import azure.cognitiveservices.speech as speechsdk
 import os
+import numpy as np
 from dotenv import load_dotenv
-from pydub import AudioSegment
+
+from .audio_decode import PCM_SAMPLE_RATE, decode_pcm, load_av
+from .speech_pool import PooledRecognizer, RecognizerPool
 
 # point to parent directory
 
@@ -10,12 +11,94 @@ load_dotenv()
 
 speech_region = os.getenv("SPEECH_REGION")
 api_key = os.getenv("SPEECH_KEY")
+speech_language = os.getenv("SPEECH_LANGUAGE", "en-US")
+
+
+def require_credentials():
+    """Fail clearly when Azure is used without credentials configured."""
+    if not api_key or not speech_region:
+        raise RuntimeError("SPEECH_KEY and SPEECH_REGION must be set")
 
-if not api_key or not speech_region:
-    raise RuntimeError("SPEECH_KEY and SPEECH_REGION must be set")
 
 # print(f"The API key is: {api_key}")
 
+PCM_SAMPLE_WIDTH = 2
+
+# The Speech SDK and pydub are slow to import, so they are loaded on
+# first use (or by warm_up) rather than when the service starts.
+speechsdk = None
+SpeechConfig = None
+AudioConfig = None
+AudioSegment = None
+
+
+def load_speech_sdk():
+    """Import the Azure Speech SDK if it hasn't been yet."""
+    global speechsdk, SpeechConfig, AudioConfig  # pylint: disable=global-statement
+    if speechsdk is None:
+        import azure.cognitiveservices.speech as sdk  # pylint: disable=import-outside-toplevel
+
+        speechsdk = sdk
+    if SpeechConfig is None:
+        SpeechConfig = speechsdk.SpeechConfig
+    if AudioConfig is None:
+        AudioConfig = speechsdk.audio.AudioConfig
+    return speechsdk
+
+# SpeechConfig objects are reusable, so build one per region
+_speech_configs = {}
+
+
+def _speech_config(region: str):
+    require_credentials()
+    load_speech_sdk()
+    config = _speech_configs.get(region)
+    if config is None:
+        config = SpeechConfig(subscription=api_key, region=region)
+        _speech_configs[region] = config
+    return config
+
+
+def _build_pooled_recognizer(region: str, language: str) -> PooledRecognizer:
+    """Create a push-stream recognizer and open its service connection ahead of use."""
+    load_speech_sdk()
+    stream_format = speechsdk.audio.AudioStreamFormat(
+        samples_per_second=PCM_SAMPLE_RATE,
+        bits_per_sample=PCM_SAMPLE_WIDTH * 8,
+        channels=1,
+    )
+    push_stream = speechsdk.audio.PushAudioInputStream(stream_format)
+    recognizer = speechsdk.SpeechRecognizer(
+        speech_config=_speech_config(region),
+        language=language,
+        audio_config=AudioConfig(stream=push_stream),
+    )
+    slot = PooledRecognizer((region, language), recognizer, push_stream)
+    connection = speechsdk.Connection.from_recognizer(recognizer)
+    connection.disconnected.connect(slot.mark_unhealthy)
+    connection.open(False)
+    slot.connection = connection
+    return slot
+
+
+recognizer_pool = RecognizerPool(
+    _build_pooled_recognizer,
+    size=int(os.getenv("SPEECH_POOL_SIZE", "2")),
+    max_idle=float(os.getenv("SPEECH_POOL_MAX_IDLE", "60")),
+    sweep_interval=float(os.getenv("SPEECH_POOL_SWEEP_SECONDS", "20")),
+)
+
+
+def warm_up():
+    """
+    Load the decoder and Speech SDK and pre-connect recognizers for the
+    default region and language, so the first request doesn't pay for it.
+    """
+    load_av()
+    load_speech_sdk()
+    recognizer_pool.warm(speech_region, speech_language)
+
+
 def grade_from_score(score: float) -> dict:
     if score >= 70:
         return {"grade": "O", "label": "Outstanding", "color": "good"}
@@ -26,25 +109,75 @@ def grade_from_score(score: float) -> dict:
     else:
         return {"grade": "T", "label": "Troll", "color": "bad"}
     
-def pronunciation_assessment(reference_text, user_audio):
-
-    speech_config = SpeechConfig(subscription=api_key, region=speech_region)
-    audio_config = AudioConfig(filename=user_audio) 
-    # audio_config = AudioConfig(use_default_microphone=True)
-    speech_recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config, language="en-US", audio_config=audio_config)
-
+def _apply_assessment_config(recognizer, reference_text):
     pronunciation_config = speechsdk.PronunciationAssessmentConfig(
         reference_text=reference_text,
         grading_system=speechsdk.PronunciationAssessmentGradingSystem.HundredMark,
         granularity=speechsdk.PronunciationAssessmentGranularity.Phoneme,
         enable_miscue=False)
 
-    pronunciation_config.apply_to(speech_recognizer)
+    pronunciation_config.apply_to(recognizer)
+
+
+class StreamingAssessment:
+    """
+    One utterance assessed while it is still arriving. Audio written here
+    goes straight into a pooled recognizer's push stream, so with
+    `result()` already running on another thread Azure recognises as the
+    user speaks. Closing the stream ends the utterance; the score follows.
+    """
+
+    incremental = True
+
+    def __init__(self, reference_text):
+        load_speech_sdk()
+        self.reference_text = reference_text
+        self._slot = recognizer_pool.acquire(speech_region, speech_language)
+        _apply_assessment_config(self._slot.recognizer, reference_text)
+
+    def write(self, pcm):
+        """Append a chunk of 16 kHz mono int16 PCM."""
+        self._slot.push_stream.write(_pcm_bytes(pcm))
+
+    def close(self):
+        """No more audio: Azure finishes the utterance."""
+        self._slot.push_stream.close()
+
+    def result(self) -> dict:
+        """Blocking: wait for Azure's assessment of everything written."""
+        try:
+            speech_recognition_result = self._slot.recognizer.recognize_once()
+        finally:
+            recognizer_pool.release(self._slot)
+        return _assessment_result(self.reference_text, speech_recognition_result)
+
+
+def pronunciation_assessment(reference_text, user_audio):
+    """
+    Score `user_audio` against `reference_text`. `user_audio` is either a
+    WAV path or decoded 16 kHz mono PCM; PCM goes through a pooled,
+    pre-connected recognizer.
+    """
+    load_speech_sdk()
+    if not isinstance(user_audio, str):
+        stream = StreamingAssessment(reference_text)
+        stream.write(user_audio)
+        stream.close()
+        return stream.result()
+
+    audio_config = AudioConfig(filename=user_audio)
+    # audio_config = AudioConfig(use_default_microphone=True)
+    speech_recognizer = speechsdk.SpeechRecognizer(speech_config=_speech_config(speech_region), language=speech_language, audio_config=audio_config)
+    _apply_assessment_config(speech_recognizer, reference_text)
 
     # print("Speak now...")
 
     speech_recognition_result = speech_recognizer.recognize_once()
+    return _assessment_result(reference_text, speech_recognition_result)
+
 
+def _assessment_result(reference_text, speech_recognition_result) -> dict:
+    """The /assess payload for a finished recognition."""
     # check recognition succeed
     print("Reason:", speech_recognition_result.reason)
     print("Recognized text:", speech_recognition_result.text)
@@ -89,10 +222,28 @@ def pronunciation_assessment(reference_text, user_audio):
         "grade_label": grade_info["label"],
     }
 
+def _pcm_bytes(user_audio) -> bytes:
+    """Raw little-endian int16 bytes for a PCM array or buffer."""
+    if isinstance(user_audio, np.ndarray):
+        return user_audio.astype(np.int16, copy=False).tobytes()
+    return bytes(user_audio)
+
+
+def decode_to_pcm(data: bytes) -> np.ndarray:
+    """
+    Decode an uploaded recording (e.g. webm/mp4) held in memory
+    into 16 kHz mono int16 PCM samples.
+    """
+    return decode_pcm(data, PCM_SAMPLE_RATE)
+
+
 def convert_to_wav(src_path: str) -> str:
     """
     Convert an audio file (e.g. webm/mp4) to PCM WAV and return the wav path.
     """
+    global AudioSegment  # pylint: disable=global-statement
+    if AudioSegment is None:
+        from pydub import AudioSegment  # pylint: disable=import-outside-toplevel,redefined-outer-name
     wav_path = src_path + ".wav"
     audio = AudioSegment.from_file(src_path)
     audio = audio.set_frame_rate(16000).set_channels(1) 
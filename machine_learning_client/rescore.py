@@ -0,0 +1,503 @@
+"""
+Bulk re-scoring of stored attempts.
+
+After grading thresholds or scorer settings change, historical attempts
+in `pronunciation_attempts` can be brought up to date:
+
+- `regrade` recomputes each attempt's grade from its stored score with
+  the current grade_from_score. No audio is read and no scorer is called.
+- `rescore` streams attempts that still have audio, decodes the clips on
+  a process pool, trims them as /assess does, and scores them with at
+  most `concurrency` scorer calls in flight.
+
+Either way, results are written back with one bulk write per batch. An
+attempt's first `previous` {score, grade} is kept alongside the new one.
+After each batch, the run's checkpoint records the last attempt done, so
+an interrupted run picks up where it stopped. A run only covers attempts
+that existed when it started.
+
+The `attempt_stats` documents of every (user, spell) whose attempts
+changed are flagged stale with each batch. When the run ends they are
+rebuilt from the attempts, so the dashboard shows the new grades. An
+interrupted run leaves the flags behind for the next run to rebuild.
+
+    python -m machine_learning_client.rescore --mode regrade --dry-run
+    python -m machine_learning_client.rescore --run thresholds-2024-06 --spell Lumos
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import traceback
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from .audio_decode import PCM_SAMPLE_RATE, decode_pcm, pcm_duration
+from .compaction import MaintenanceLease
+from .pronun_assess import grade_from_score
+from .vad import NoSpeechError
+
+MODES = ("rescore", "regrade")
+# Score latencies kept for the p50 in the report
+LATENCY_SAMPLES = 10_000
+# Threads that read clips from GridFS, on top of the scoring threads
+READ_THREADS = 4
+
+
+class LeaseLostError(RuntimeError):
+    """Another process took over the run's lease; this one must stop writing."""
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+def _batches(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timed(func, *args):
+    """(func(*args), seconds it took); runs in the decoding worker, so pool queueing isn't counted."""
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+
+def _stats_keys(attempts: Iterable[dict]) -> List[Tuple[str, str]]:
+    """Distinct (user, spell) of attempts that have a user, in a stable order."""
+    return sorted({(a["user"], a["spell"]) for a in attempts if a.get("user") and a.get("spell")})
+
+
+def rescore_update(result: dict, run: str) -> list:
+    """
+    Update pipeline that records a new score on an attempt, keeping the
+    first score and grade it replaces under `previous`.
+    """
+    fields: Dict[str, object] = {
+        "score": result.get("accuracy_score"),
+        "grade": result.get("grade"),
+        "rescored_at": _now(),
+        "rescore_run": run,
+    }
+    if result.get("recognized_text"):
+        fields["transcript"] = result["recognized_text"]
+    return [
+        {"$set": {"previous": {"$ifNull": ["$previous", {"score": "$score", "grade": "$grade"}]}}},
+        {"$set": fields},
+        {"$unset": ["rescore_error"]},
+    ]
+
+
+def error_update(error: str, run: str) -> dict:
+    """Update that notes why an attempt could not be re-scored; its score is left alone."""
+    return {"$set": {"rescore_error": error, "rescored_at": _now(), "rescore_run": run}}
+
+
+class RescoreCheckpoint:
+    """
+    Progress of one named run, kept in a Mongo collection: the last
+    attempt finished, the newest attempt the run covers, and totals.
+    """
+
+    def __init__(self, collection, run: str):
+        self._col = collection
+        self.run = run
+
+    def load(self) -> Optional[dict]:
+        """The saved checkpoint, or None for a new run."""
+        return self._col.find_one({"_id": self.run})
+
+    def start(self, scope: Dict[str, object], until: Optional[ObjectId]):
+        """Record a new run's scope and the newest attempt it covers."""
+        self._col.replace_one(
+            {"_id": self.run},
+            {**scope, "until_id": until, "last_id": None, "totals": {},
+             "started_at": _now(), "updated_at": _now(), "finished_at": None},
+            upsert=True,
+        )
+
+    def save(self, last_id: ObjectId, totals: Dict[str, int]):
+        """Note that every attempt up to `last_id` is done."""
+        self._col.update_one(
+            {"_id": self.run},
+            {"$set": {"last_id": last_id, "totals": totals, "updated_at": _now()}},
+        )
+
+    def finish(self, totals: Dict[str, int]):
+        """Mark the run complete."""
+        self._col.update_one(
+            {"_id": self.run},
+            {"$set": {"totals": totals, "updated_at": _now(), "finished_at": _now()}},
+        )
+
+
+class Rescorer:  # pylint: disable=too-many-instance-attributes
+    """Re-grade or re-score the attempts in an AudioStore."""
+
+    def __init__(
+        self,
+        store,
+        scorer=None,
+        *,
+        trimmer=None,
+        decode: Callable[[bytes], object] = decode_pcm,
+        workers: int = 0,
+        concurrency: int = 8,
+        batch_size: int = 100,
+        progress: Optional[Callable[[Dict[str, object]], None]] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        lease=None,
+    ):
+        """
+        `workers` is the size of the decoding process pool; 0 decodes on
+        threads instead. `concurrency` bounds scorer calls in flight.
+        `progress` is called with the report after each batch. A `lease`
+        (MaintenanceLease) is renewed after each batch written; if it has
+        been taken over, the run stops with LeaseLostError.
+        """
+        self.store = store
+        self.scorer = scorer
+        self.trimmer = trimmer
+        self._decode = decode
+        self.workers = max(0, workers)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self._progress = progress
+        self._clock = clock
+        self.lease = lease
+
+    def run(  # pylint: disable=too-many-arguments
+        self,
+        mode: str = "rescore",
+        *,
+        run: str = "rescore",
+        spell: Optional[str] = None,
+        user: Optional[str] = None,
+        checkpoint: Optional[RescoreCheckpoint] = None,
+        limit: int = 0,
+        dry_run: bool = False,
+    ) -> Dict[str, object]:
+        """
+        One pass over the attempts selected by `spell` / `user`. With a
+        `checkpoint`, a run already under way resumes after its last
+        batch. `limit` caps the attempts looked at (0 = no cap). With
+        `dry_run`, everything is scored but nothing is written.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if mode == "rescore" and self.scorer is None:
+            raise ValueError("rescore mode needs a scorer")
+        query: Dict[str, object] = {}
+        if spell is not None:
+            query["spell"] = spell
+        if user is not None:
+            query["user"] = user
+        if mode == "rescore":
+            query["audio_file_id"] = {"$exists": True}
+            projection = {"spell": 1, "user": 1, "audio_file_id": 1, "score": 1, "grade": 1}
+        else:
+            query["score"] = {"$ne": None}
+            projection = {"spell": 1, "user": 1, "score": 1, "grade": 1}
+
+        scope = {"mode": mode, "spell": spell, "user": user}
+        saved = checkpoint.load() if checkpoint is not None and not dry_run else None
+        if saved is not None:
+            if {key: saved.get(key) for key in scope} != scope:
+                started = {key: saved.get(key) for key in scope}
+                raise ValueError(f"run {run!r} was started with {started!r}; pick another run name")
+            after, until = saved.get("last_id"), saved.get("until_id")
+        else:
+            after, until = None, self.store.last_attempt_id(query)
+            if checkpoint is not None and not dry_run:
+                checkpoint.start(scope, until)
+
+        report = self._new_report(mode, run, dry_run, saved)
+        if until is not None:
+            attempts = self.store.scan_attempts(query, after=after, until=until, projection=projection)
+            if limit:
+                attempts = (a for _, a in zip(range(limit), attempts))
+            save = checkpoint.save if checkpoint is not None and not dry_run else None
+            if mode == "regrade":
+                self._regrade(attempts, report, run, dry_run, save)
+            else:
+                asyncio.run(self._rescore(attempts, report, run, dry_run, save))
+        if not dry_run:
+            for user_id, spell_name in list(self.store.stale_stats()):
+                self.store.rebuild_stats(user_id, spell_name)
+                report["stats_rebuilt"] += 1
+        if checkpoint is not None and not dry_run and not limit:
+            checkpoint.finish(report["totals"])
+        self._finish_report(report)
+        return report
+
+    def _new_report(self, mode, run, dry_run, saved) -> Dict[str, object]:
+        return {
+            "run": run,
+            "mode": mode,
+            "dry_run": dry_run,
+            "resumed": saved is not None,
+            "scanned": 0,
+            "rescored": 0,
+            "changed": 0,
+            "failed": 0,
+            "no_speech": 0,
+            "written": 0,
+            "stats_rebuilt": 0,
+            "audio_seconds": 0.0,
+            "decode_seconds": 0.0,
+            "score_seconds": 0.0,
+            "grades_before": Counter(),
+            "grades_after": Counter(),
+            "totals": dict((saved or {}).get("totals") or {}),
+            "_started": self._clock(),
+            "_latencies": deque(maxlen=LATENCY_SAMPLES),
+        }
+
+    def _finish_report(self, report):
+        elapsed = self._clock() - report.pop("_started")
+        latencies = sorted(report.pop("_latencies"))
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["attempts_per_second"] = round(report["scanned"] / elapsed, 2) if elapsed > 0 else 0.0
+        report["audio_seconds_per_second"] = (
+            round(report["audio_seconds"] / elapsed, 2) if elapsed > 0 else 0.0
+        )
+        report["score_p50_ms"] = (
+            round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None
+        )
+        for key in ("audio_seconds", "decode_seconds", "score_seconds"):
+            report[key] = round(report[key], 3)
+        report["grades_before"] = dict(report["grades_before"])
+        report["grades_after"] = dict(report["grades_after"])
+
+    def _flush(self, report, batch, updates, counts, dry_run, save, changed):
+        """
+        Add one batch to the report, write its updates and flag the stats
+        of the attempts in `changed`, then checkpoint past it.
+        """
+        for key, n in counts.items():
+            report[key] += n
+        if not dry_run:
+            report["written"] += self.store.update_attempts(updates)
+            self.store.mark_stats_stale(_stats_keys(changed))
+        totals = report["totals"]
+        for key in ("scanned", "rescored", "changed", "failed", "no_speech"):
+            totals[key] = totals.get(key, 0) + counts[key]
+        if save is not None:
+            save(batch[-1]["_id"], dict(totals))
+        if self._progress is not None:
+            self._progress(report)
+        if self.lease is not None and not dry_run and not self.lease.acquire():
+            raise LeaseLostError(f"lost the lease on run {report['run']!r}; stopping after this batch")
+
+    # Regrade: scores are kept, only the grade boundaries changed
+
+    def _regrade(self, attempts, report, run, dry_run, save):
+        for batch in _batches(attempts, self.batch_size):
+            counts: Counter = Counter(scanned=len(batch))
+            updates: List[Tuple[ObjectId, object]] = []
+            changed = []
+            for attempt in batch:
+                grade = grade_from_score(attempt["score"])["grade"]
+                report["grades_before"][attempt.get("grade")] += 1
+                report["grades_after"][grade] += 1
+                if grade != attempt.get("grade"):
+                    counts["changed"] += 1
+                    changed.append(attempt)
+                    updates.append((attempt["_id"], rescore_update(
+                        {"accuracy_score": attempt["score"], "grade": grade}, run)))
+            self._flush(report, batch, updates, counts, dry_run, save, changed)
+
+    # Rescore: decode and score every clip again
+
+    def _decode_pool(self) -> Executor:
+        if self.workers:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1, thread_name_prefix="rescore-decode"
+        )
+
+    async def _rescore(self, attempts, report, run, dry_run, save):
+        """
+        Each batch's attempts are started before the previous batch is
+        awaited, so decoding the next batch overlaps scoring this one.
+        """
+        slots = asyncio.Semaphore(self.concurrency)
+        with self._decode_pool() as decoder, ThreadPoolExecutor(
+            max_workers=self.concurrency + READ_THREADS, thread_name_prefix="rescore"
+        ) as threads:
+            pending = None
+            for batch in _batches(attempts, self.batch_size):
+                tasks = [
+                    asyncio.ensure_future(self._rescore_one(attempt, decoder, threads, slots, report))
+                    for attempt in batch
+                ]
+                if pending is not None:
+                    await self._finish_batch(*pending, report, run, dry_run, save)
+                pending = (batch, tasks)
+                # Let the new batch's reads start before blocking on the cursor again
+                await asyncio.sleep(0)
+            if pending is not None:
+                await self._finish_batch(*pending, report, run, dry_run, save)
+
+    async def _finish_batch(self, batch, tasks, report, run, dry_run, save):
+        outcomes = await asyncio.gather(*tasks)
+        counts: Counter = Counter(scanned=len(batch))
+        updates: List[Tuple[ObjectId, object]] = []
+        changed = []
+        for attempt, (outcome, result) in zip(batch, outcomes):
+            report["grades_before"][attempt.get("grade")] += 1
+            counts[outcome] += 1
+            if outcome != "rescored":
+                updates.append((attempt["_id"], error_update(result, run)))
+                continue
+            report["grades_after"][result.get("grade")] += 1
+            if result.get("grade") != attempt.get("grade"):
+                counts["changed"] += 1
+            if (result.get("accuracy_score"), result.get("grade")) != (
+                attempt.get("score"), attempt.get("grade")
+            ):
+                changed.append(attempt)
+            updates.append((attempt["_id"], rescore_update(result, run)))
+        self._flush(report, batch, updates, counts, dry_run, save, changed)
+
+    async def _rescore_one(self, attempt, decoder, threads, slots, report):
+        """("rescored", result), or ("failed" / "no_speech", error) for one attempt."""
+        loop = asyncio.get_running_loop()
+        spell = attempt.get("spell") or ""
+        try:
+            data = await loop.run_in_executor(threads, self._read, attempt["audio_file_id"])
+            pcm, seconds = await loop.run_in_executor(decoder, _timed, self._decode, data)
+            report["decode_seconds"] += seconds
+            report["audio_seconds"] += pcm_duration(pcm, PCM_SAMPLE_RATE)
+            if self.trimmer is not None:
+                # Off the loop, which is busy handing out score calls; a
+                # thread because the trimmer keeps shared counters
+                pcm, _ = await loop.run_in_executor(threads, self.trimmer.trim, spell, pcm)
+            async with slots:
+                start = self._clock()
+                result = await loop.run_in_executor(threads, self.scorer.score, spell, pcm)
+                elapsed = self._clock() - start
+            report["score_seconds"] += elapsed
+            report["_latencies"].append(elapsed)
+        except NoSpeechError as e:
+            return "no_speech", str(e)
+        except Exception as e:  # pylint: disable=broad-except
+            traceback.print_exc()
+            return "failed", str(e) or type(e).__name__
+        if not result.get("success"):
+            return "failed", result.get("error") or "Scoring failed"
+        return "rescored", result
+
+    def _read(self, file_id) -> bytes:
+        return b"".join(self.store.iter_audio(self.store.open_audio(file_id)))
+
+
+def format_report(report: Dict[str, object]) -> str:
+    """Human summary of a re-scoring pass, with its throughput."""
+    head = (
+        f"{'[dry run] ' if report['dry_run'] else ''}{report['mode']} run {report['run']!r}"
+        f"{' (resumed)' if report['resumed'] else ''}: scanned {report['scanned']}, "
+    )
+    speed = f"{report['elapsed_seconds']:.1f}s, {report['attempts_per_second']:.1f} attempts/s"
+    if report["mode"] == "rescore":
+        p50 = report["score_p50_ms"]
+        head += (
+            f"rescored {report['rescored']}, grade changed {report['changed']}, "
+            f"failed {report['failed']}, no speech {report['no_speech']}"
+        )
+        speed += (
+            f", {report['audio_seconds_per_second']:.1f} s of audio/s; "
+            f"decode {report['decode_seconds']:.1f}s, score {report['score_seconds']:.1f}s"
+            f" (p50 {'-' if p50 is None else p50} ms)"
+        )
+    else:
+        head += f"grade changed {report['changed']}"
+    return "\n".join(
+        [
+            f"{head}; {report['written']} written, {report['stats_rebuilt']} stats rebuilt",
+            speed,
+            f"grades {report['grades_before']} -> {report['grades_after']}",
+        ]
+    )
+
+
+def _progress_line(report):
+    elapsed = time.perf_counter() - report["_started"]
+    rate = report["scanned"] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"  {report['scanned']} attempts, {rate:.1f}/s, "
+        f"{report['failed'] + report['no_speech']} not scored",
+        file=sys.stderr,
+    )
+
+
+def main(argv=None):
+    # pylint: disable=import-outside-toplevel
+    from .audio_store import AudioStore
+    from .scorers import scorer_from_env
+    from .vad import VoiceTrimmer
+
+    parser = argparse.ArgumentParser(description="Re-grade or re-score stored attempts.")
+    parser.add_argument("--mode", choices=MODES, default="rescore")
+    parser.add_argument("--run", default=None, help="checkpoint name; reuse it to resume")
+    parser.add_argument("--spell")
+    parser.add_argument("--user")
+    parser.add_argument("--limit", type=int, default=0, help="max attempts (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="decoding processes (0 = threads)")
+    parser.add_argument("--concurrency", type=int, default=8, help="scorer calls in flight")
+    parser.add_argument("--dry-run", action="store_true", help="score only, write nothing")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    run = args.run or args.mode
+
+    store = AudioStore.from_env()
+    lease = MaintenanceLease(store.db["maintenance_locks"], name=f"rescore-{run}")
+    if not args.dry_run and not lease.acquire():
+        parser.exit(1, f"Run {run!r} is already going elsewhere; try again later.\n")
+    scorer = scorer_from_env() if args.mode == "rescore" else None
+    rescorer = Rescorer(
+        store,
+        scorer,
+        trimmer=VoiceTrimmer.from_env() if args.mode == "rescore" else None,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        progress=None if args.json else _progress_line,
+        lease=None if args.dry_run else lease,
+    )
+    try:
+        report = rescorer.run(
+            args.mode,
+            run=run,
+            spell=args.spell,
+            user=args.user,
+            checkpoint=RescoreCheckpoint(store.db["rescore_checkpoints"], run),
+            limit=args.limit,
+            dry_run=args.dry_run,
+        )
+    except LeaseLostError as e:
+        parser.exit(1, f"{e}\nResume it later with the same --run.\n")
+    finally:
+        if not args.dry_run:
+            lease.release()
+    print(json.dumps(report, default=str) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Content-addressed cache of pronunciation assessment results."""
+
+import hashlib
+import os
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+# Bump when the shape or meaning of cached results changes
+CACHE_VERSION = "1"
+
+
+def cache_key(pcm, reference_text: str) -> str:
+    """Hash of the decoded PCM plus the reference text it was scored against."""
+    digest = hashlib.sha256()
+    digest.update(CACHE_VERSION.encode())
+    digest.update(b"\0")
+    digest.update(reference_text.strip().lower().encode("utf-8"))
+    digest.update(b"\0")
+    if not isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.ascontiguousarray(pcm)
+    # Hash the sample buffer in place rather than copying it to bytes
+    digest.update(memoryview(pcm).cast("B"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier result cache: an in-process LRU in front of a Mongo
+    collection whose documents expire through a TTL index.
+    Only successful assessments are cached, so transient Azure
+    failures are retried rather than remembered.
+    """
+
+    def __init__(self, collection=None, max_entries: int = 1024, ttl_seconds: int = 7 * 86400):
+        self._col = collection
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._lru: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexed = False
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, collection=None):
+        """Create a cache sized by RESULT_CACHE_SIZE / RESULT_CACHE_TTL."""
+        return cls(
+            collection,
+            max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+            ttl_seconds=int(os.getenv("RESULT_CACHE_TTL", str(7 * 86400))),
+        )
+
+    @property
+    def has_persistent_tier(self) -> bool:
+        """Whether a Mongo collection backs the in-memory tier."""
+        return self._col is not None
+
+    def ensure_indexes(self):
+        """Create the TTL index that expires persistent entries."""
+        if self._col is None or self._indexed:
+            return
+        self._col.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        self._indexed = True
+
+    def get_local(self, key: str) -> Optional[dict]:
+        """Look the key up in memory only."""
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return dict(result)
+            if self._col is None:
+                self.misses += 1
+            return None
+
+    def get_persistent(self, key: str) -> Optional[dict]:
+        """Look the key up in Mongo (blocking) and promote a hit into memory."""
+        if self._col is None:
+            return None
+        doc = self._col.find_one({"_id": key}, {"result": 1})
+        with self._lock:
+            if doc is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+        self._remember(key, doc["result"])
+        return dict(doc["result"])
+
+    def put_local(self, key: str, result: dict):
+        """Store a result in memory."""
+        if result.get("success"):
+            self._remember(key, result)
+
+    def put_persistent(self, key: str, result: dict):
+        """Store a result in Mongo (blocking); errors are logged, not raised."""
+        if self._col is None or not result.get("success"):
+            return
+        try:
+            self.ensure_indexes()
+            self._col.replace_one(
+                {"_id": key},
+                {"result": result, "created_at": datetime.now(tz=timezone.utc)},
+                upsert=True,
+            )
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+
+    def _remember(self, key: str, result: dict):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._lru[key] = dict(result)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        """Hit counters; every hit is one Azure call that was not made."""
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "azure_calls_saved": hits,
+            }
@@ -0,0 +1,284 @@
+"""
+Pronunciation scorer backends.
+
+A scorer turns decoded 16 kHz mono PCM plus the reference text into the
+result payload /assess returns. SCORER_BACKEND picks one:
+
+- ``azure`` (default): Azure Speech pronunciation assessment.
+- ``local``: a deterministic simulation with configurable latency and
+  failure rates, so the upload -> decode -> score path can be
+  benchmarked, soak-tested and run in CI without Azure.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from statistics import NormalDist
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from . import pronun_assess
+
+
+class ScoringStream:
+    """
+    One utterance handed to a scorer chunk by chunk: `write` as audio
+    arrives, `close` when speech ends, then `result` (blocking). When
+    `incremental` is set the scorer works while audio is still arriving,
+    and `result` should already be running before `close`.
+    """
+
+    incremental = False
+
+    def write(self, pcm: np.ndarray):
+        """Append a chunk of 16 kHz mono int16 PCM."""
+        raise NotImplementedError
+
+    def close(self):
+        """No more audio."""
+
+    def result(self) -> dict:
+        """Blocking: the score for everything written."""
+        raise NotImplementedError
+
+
+class BufferedStream(ScoringStream):
+    """Collects the chunks and scores the whole clip once it is closed."""
+
+    def __init__(self, scorer: "Scorer", reference_text: str):
+        self._scorer = scorer
+        self.reference_text = reference_text
+        self._chunks = []
+
+    def write(self, pcm):
+        self._chunks.append(np.asarray(pcm, dtype=np.int16))
+
+    def result(self):
+        pcm = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.int16)
+        return self._scorer.score(self.reference_text, pcm)
+
+
+class Scorer:
+    """Interface every backend implements."""
+
+    name = "scorer"
+
+    def score(self, reference_text: str, pcm: np.ndarray) -> dict:
+        """Blocking: score `pcm` against `reference_text`."""
+        raise NotImplementedError
+
+    def open_stream(self, reference_text: str) -> ScoringStream:
+        """Start scoring an utterance that arrives in chunks (may block briefly)."""
+        return BufferedStream(self, reference_text)
+
+    def warm_up(self):
+        """Prepare for the first request (load SDKs, open connections)."""
+
+    def stats(self) -> Dict[str, object]:
+        """Backend counters for /stats."""
+        return {"backend": self.name}
+
+
+class AzureScorer(Scorer):
+    """Azure Speech pronunciation assessment through the warm recognizer pool."""
+
+    name = "azure"
+
+    def __init__(self):
+        pronun_assess.require_credentials()
+
+    def score(self, reference_text, pcm):
+        return pronun_assess.pronunciation_assessment(reference_text, pcm)
+
+    def open_stream(self, reference_text):
+        # Azure recognises from the push stream while the user is still speaking
+        return pronun_assess.StreamingAssessment(reference_text)
+
+    def warm_up(self):
+        pronun_assess.warm_up()
+
+
+def parse_latency(spec: str) -> Callable[[float], float]:
+    """
+    Latency distribution from a spec, as a function of a uniform u in
+    (0, 1) returning seconds:
+
+    - ``fixed:MS``
+    - ``uniform:LO_MS,HI_MS``
+    - ``normal:MEAN_MS,SD_MS`` (clipped at 0)
+    - ``lognormal:MEDIAN_MS,SIGMA`` (long right tail, like real network calls)
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(v) for v in params.split(",")] if params else []
+        if kind == "fixed" and len(values) == 1:
+            (ms,) = values
+            return lambda _u: ms / 1000
+        if kind == "uniform" and len(values) == 2:
+            lo, hi = values
+            return lambda u: (lo + u * (hi - lo)) / 1000
+        if kind == "normal" and len(values) == 2:
+            dist = NormalDist(*values)
+            return lambda u: max(0.0, dist.inv_cdf(u)) / 1000
+        if kind == "lognormal" and len(values) == 2:
+            median, sigma = values
+            unit = NormalDist()
+            return lambda u: median * float(np.exp(sigma * unit.inv_cdf(u))) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Bad latency spec {spec!r}")
+
+
+class LocalScorer(Scorer):
+    """
+    Simulated scorer with Azure-shaped results.
+
+    Everything is derived from a hash of the audio and reference text, so
+    the same clip always gets the same score, outcome and latency.
+    Near-silent clips get a "no match", just as Azure would return.
+    `failure_rate` of the rest are cancelled, as on a service error. The
+    remainder score on a spread centred near `mean_score`. A clip streamed
+    in chunks scores exactly as it would in one piece.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        latency: str = "lognormal:400,0.35",
+        failure_rate: float = 0.0,
+        no_match_rate: float = 0.0,
+        mean_score: float = 65.0,
+        silence_dbfs: float = -50.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.latency_spec = latency
+        self._latency = parse_latency(latency)
+        self.failure_rate = failure_rate
+        self.no_match_rate = no_match_rate
+        self.mean_score = mean_score
+        self.silence_dbfs = silence_dbfs
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.no_matches = 0
+
+    @classmethod
+    def from_env(cls):
+        """Scorer tuned by LOCAL_SCORER_LATENCY / _FAILURE_RATE / _NO_MATCH_RATE / _MEAN."""
+        return cls(
+            latency=os.getenv("LOCAL_SCORER_LATENCY", "lognormal:400,0.35"),
+            failure_rate=float(os.getenv("LOCAL_SCORER_FAILURE_RATE", "0")),
+            no_match_rate=float(os.getenv("LOCAL_SCORER_NO_MATCH_RATE", "0")),
+            mean_score=float(os.getenv("LOCAL_SCORER_MEAN", "65")),
+        )
+
+    def score(self, reference_text, pcm):
+        stream = self.open_stream(reference_text)
+        stream.write(pcm)
+        stream.close()
+        return stream.result()
+
+    def open_stream(self, reference_text):
+        return _LocalStream(self, reference_text)
+
+    def _result(self, reference_text: str, digest: bytes, silent: bool) -> dict:
+        # Four reproducible values in (0, 1) for this clip and text
+        u_latency, u_outcome, u_score, u_spread = [
+            (int.from_bytes(digest[i * 4:i * 4 + 4], "big") + 0.5) / 2**32 for i in range(4)
+        ]
+        self._sleep(self._latency(u_latency))
+        with self._lock:
+            self.calls += 1
+
+        if silent or u_outcome < self.no_match_rate:
+            with self._lock:
+                self.no_matches += 1
+            return {
+                "success": False,
+                "error": "No speech could be recognized (simulated)",
+                "reference_text": reference_text,
+            }
+        if u_outcome < self.no_match_rate + self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            return {
+                "success": False,
+                "error": "Recognition canceled: simulated failure",
+                "error_details": "LocalScorer failure_rate",
+                "reference_text": reference_text,
+            }
+
+        # Roughly bell-shaped around mean_score, clipped to Azure's 0-100 scale
+        spread = NormalDist(self.mean_score, 18.0 + 6.0 * u_spread)
+        accuracy = round(min(100.0, max(0.0, spread.inv_cdf(u_score))), 1)
+        grade = pronun_assess.grade_from_score(accuracy)
+        return {
+            "success": True,
+            "recognized_text": reference_text if accuracy >= 20 else "",
+            "accuracy_score": accuracy,
+            "reference_text": reference_text,
+            "grade": grade["grade"],
+            "grade_label": grade["label"],
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "latency": self.latency_spec,
+                "calls": self.calls,
+                "failures": self.failures,
+                "no_matches": self.no_matches,
+            }
+
+
+class _LocalStream(ScoringStream):
+    """Hashes and meters each chunk as it arrives; the simulated call happens on result()."""
+
+    def __init__(self, scorer: LocalScorer, reference_text: str):
+        self._scorer = scorer
+        self.reference_text = reference_text
+        self._digest = hashlib.sha256(reference_text.encode("utf-8"))
+        self._samples = 0
+        self._energy = 0.0
+
+    def write(self, pcm):
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        self._digest.update(memoryview(pcm).cast("B"))
+        samples = pcm.astype(np.float64) / 32768.0
+        self._samples += len(samples)
+        self._energy += float(np.dot(samples, samples))
+
+    def result(self):
+        rms = np.sqrt(self._energy / self._samples) if self._samples else 0.0
+        silent = 20 * np.log10(max(rms, 1e-6)) < self._scorer.silence_dbfs
+        return self._scorer._result(  # pylint: disable=protected-access
+            self.reference_text, self._digest.digest(), silent
+        )
+
+
+BACKENDS = {"azure": AzureScorer, "local": LocalScorer.from_env}
+
+
+def scorer_from_env(backend: Optional[str] = None) -> Scorer:
+    """
+    The scorer named by SCORER_BACKEND (default ``azure``). When no backend
+    is named and the Azure credentials are missing, the local scorer is used
+    instead, so the service still imports in development and tests.
+    """
+    explicit = backend or os.getenv("SCORER_BACKEND")
+    if not explicit and not (pronun_assess.api_key and pronun_assess.speech_region):
+        print("SPEECH_KEY / SPEECH_REGION not set; using the local scorer")
+        return LocalScorer.from_env()
+    backend = (explicit or "azure").strip().lower()
+    try:
+        factory = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Unknown SCORER_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}"
+        ) from None
+    return factory()
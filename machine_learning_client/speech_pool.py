@@ -0,0 +1,193 @@
+"""Bounded pool of pre-connected speech recognizers."""
+
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+PoolKey = Tuple[str, str]  # (region, language)
+
+
+class PooledRecognizer:  # pylint: disable=too-few-public-methods
+    """A recognizer wired to its own push stream, optionally pre-connected."""
+
+    def __init__(self, key: PoolKey, recognizer, push_stream, connection=None):
+        self.key = key
+        self.recognizer = recognizer
+        self.push_stream = push_stream
+        self.connection = connection
+        self.created_at = time.monotonic()
+        # When it last went into the pool; max_idle is measured from here
+        self.idle_since = self.created_at
+        self.healthy = True
+
+    def mark_unhealthy(self, *_args):
+        """Connection callback: the service dropped this recognizer's connection."""
+        self.healthy = False
+
+    def close(self):
+        """Best-effort release of the underlying connection."""
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+
+class RecognizerPool:
+    """
+    Keep up to `size` warm recognizers per (region, language).
+
+    A recognizer reads from a single push stream, so each one scores one
+    clip. The saving is in building it and opening its service connection
+    before the request arrives. Used recognizers are dropped and replaced
+    in the background. Ones idle for more than `max_idle` seconds, or whose
+    connection went away, are evicted and replaced, either on the next
+    acquire or by a sweep every `sweep_interval` seconds, so a quiet pool
+    stays warm instead of draining to misses.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, str], PooledRecognizer],
+        size: int = 2,
+        max_idle: float = 60.0,
+        background_refill: bool = True,
+        sweep_interval: float = 0.0,
+    ):
+        self._factory = factory
+        self.size = max(0, size)
+        self.max_idle = max_idle
+        self._background_refill = background_refill
+        self.sweep_interval = sweep_interval
+        self._sweeper: Optional[threading.Thread] = None
+        self._idle: Dict[PoolKey, Deque[PooledRecognizer]] = {}
+        self._pending: Dict[PoolKey, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.failures = 0
+
+    def _is_fresh(self, slot: PooledRecognizer) -> bool:
+        return slot.healthy and time.monotonic() - slot.idle_since <= self.max_idle
+
+    def acquire(self, region: str, language: str) -> PooledRecognizer:
+        """Take a warm recognizer if one is available, else build one now."""
+        key = (region, language)
+        slot: Optional[PooledRecognizer] = None
+        stale = []
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            while idle:
+                candidate = idle.popleft()
+                if self._is_fresh(candidate):
+                    slot = candidate
+                    break
+                stale.append(candidate)
+            self.evictions += len(stale)
+            if slot is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        for old in stale:
+            old.close()
+        if slot is None:
+            slot = self._factory(region, language)
+        # Replaces the slot taken and any evicted above
+        self._refill(key)
+        return slot
+
+    def release(self, slot: PooledRecognizer):
+        """Return a used recognizer. Its stream is spent, so it is discarded."""
+        slot.close()
+        self._refill(slot.key)
+
+    def warm(self, region: str, language: str):
+        """Fill the pool for a key synchronously (e.g. at startup), and start sweeping."""
+        self._fill((region, language))
+        self._start_sweeper()
+
+    def sweep(self) -> int:
+        """Evict idle recognizers that went stale or lost their connection, and replace them."""
+        stale = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                fresh = [slot for slot in idle if self._is_fresh(slot)]
+                stale += [(key, slot) for slot in idle if not self._is_fresh(slot)]
+                self._idle[key] = deque(fresh)
+            self.evictions += len(stale)
+        for _, old in stale:
+            old.close()
+        for key in {key for key, _ in stale}:
+            self._refill(key)
+        return len(stale)
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self.sweep_interval <= 0 or self.size == 0 or self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+
+    def _refill(self, key: PoolKey):
+        if self.size == 0:
+            return
+        if self._background_refill:
+            threading.Thread(target=self._fill, args=(key,), daemon=True).start()
+        else:
+            self._fill(key)
+
+    def _fill(self, key: PoolKey):
+        with self._lock:
+            missing = self.size - len(self._idle.get(key, ())) - self._pending.get(key, 0)
+            if missing <= 0:
+                return
+            self._pending[key] = self._pending.get(key, 0) + missing
+        try:
+            for _ in range(missing):
+                try:
+                    slot = self._factory(*key)
+                except Exception:  # pylint: disable=broad-except
+                    with self._lock:
+                        self.failures += 1
+                    traceback.print_exc()
+                    continue
+                with self._lock:
+                    slot.idle_since = time.monotonic()
+                    self._idle.setdefault(key, deque()).append(slot)
+        finally:
+            with self._lock:
+                self._pending[key] -= missing
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters and current idle recognizers per key."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "failures": self.failures,
+                "idle": {f"{k[0]}/{k[1]}": len(v) for k, v in self._idle.items()},
+            }
+
+    def close(self):
+        """Drop every idle recognizer."""
+        with self._lock:
+            slots = [slot for idle in self._idle.values() for slot in idle]
+            self._idle.clear()
+        for slot in slots:
+            slot.close()
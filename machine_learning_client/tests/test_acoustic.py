@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from ..acoustic import (
+    HOP_LENGTH,
+    N_MFCC,
+    dtw_distance,
+    frame,
+    frame_energy_db,
+    log_mel_batch,
+    mfcc_batch,
+    voiced_bounds,
+)
+
+RATE = 16000
+
+
+def tones(*freqs, seconds=0.2, amplitude=8000):
+    """A tone per frequency, one after another."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    return np.concatenate([amplitude * np.sin(2 * np.pi * f * t) for f in freqs]).astype(np.int16)
+
+
+def padded(pcm, seconds=0.3, noise=30, seed=0):
+    """`pcm` with quiet background noise either side."""
+    rng = np.random.default_rng(seed)
+    pad = np.zeros(int(RATE * seconds))
+    signal = np.concatenate([pad, pcm.astype(np.float64), pad]) + rng.normal(0, noise, 2 * len(pad) + len(pcm))
+    return signal.astype(np.int16)
+
+
+def test_frame_is_a_strided_view():
+    pcm = np.arange(1600, dtype=np.int16)
+    frames = frame(pcm)
+
+    assert frames.shape == (1 + (1600 - 400) // HOP_LENGTH, 400)
+    assert frames[1, 0] == HOP_LENGTH
+    assert np.shares_memory(frames, pcm)
+    # Clips shorter than one frame still give one (zero-padded) frame
+    assert frame(np.ones(10, dtype=np.int16)).shape == (1, 400)
+
+
+def test_frame_energy_of_full_scale_sine_is_about_minus_3_dbfs():
+    energy = frame_energy_db(tones(440, seconds=0.5, amplitude=32767))
+    assert energy == pytest.approx(-3.0, abs=0.1)
+
+
+def test_voiced_bounds_finds_the_speech_between_the_pauses():
+    pcm = padded(tones(300, 600, seconds=0.25))
+    first, end, voiced = voiced_bounds(pcm)
+
+    hop = HOP_LENGTH / RATE
+    assert first * hop == pytest.approx(0.3, abs=0.03)
+    assert end * hop == pytest.approx(0.8, abs=0.03)
+    assert voiced == pytest.approx(end - first, abs=2)
+
+
+def test_voiced_bounds_of_silence_and_steady_noise_is_empty():
+    assert voiced_bounds(np.zeros(16000, dtype=np.int16)) == (0, 0, 0)
+    noise = np.random.default_rng(1).normal(0, 200, 16000).astype(np.int16)
+    assert voiced_bounds(noise) == (0, 0, 0)
+
+
+def test_voiced_bounds_ignores_background_noise_louder_than_the_floor():
+    # Noise at about -44 dBFS is above the absolute floor but well below the speech
+    pcm = padded(tones(300, seconds=0.5, amplitude=12000), noise=200)
+    first, end, _ = voiced_bounds(pcm)
+    assert first > 20 and end < 90
+
+
+def test_batch_features_match_one_clip_at_a_time():
+    clips = [tones(300, 900), tones(1200, seconds=0.5), tones(500)[:100]]
+    batch = log_mel_batch(clips)
+
+    assert [len(m) for m in batch] == [len(frame(c)) for c in clips]
+    for clip, mel in zip(clips, batch):
+        np.testing.assert_allclose(log_mel_batch([clip])[0], mel)
+    assert log_mel_batch([]) == []
+
+
+def test_mfcc_drops_c0_and_normalises_each_clip():
+    (coeffs,) = mfcc_batch([tones(300, 900, 1500)])
+
+    assert coeffs.dtype == np.float32
+    assert coeffs.shape[1] == N_MFCC - 1
+    np.testing.assert_allclose(coeffs.mean(axis=0), 0, atol=1e-4)
+    # Level changes don't change normalised MFCCs
+    (louder,) = mfcc_batch([tones(300, 900, 1500, amplitude=16000)])
+    np.testing.assert_allclose(coeffs, louder, atol=1e-2)
+
+
+def test_dtw_tolerates_tempo_but_not_different_content():
+    word = mfcc_batch([tones(300, 900, 1500)])[0]
+    slower = mfcc_batch([tones(300, 900, 1500, seconds=0.3)])[0]
+    other = mfcc_batch([tones(1500, 300, 2500)])[0]
+
+    assert dtw_distance(word, word) == 0.0
+    assert dtw_distance(word, slower) < dtw_distance(word, other) / 2
+    assert dtw_distance(word, slower) == pytest.approx(dtw_distance(slower, word))
+    assert dtw_distance(word, word[:0]) == float("inf")
@@ -0,0 +1,101 @@
+import io
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+from .. import audio_decode
+from ..audio_decode import DecodeError, decode_pcm, pcm_duration
+
+av = pytest.importorskip("av")
+
+
+def _encode(container_format, codec, seconds=0.5, rate=48000, layout="stereo"):
+    """Encode a sine tone into an in-memory container."""
+    buf = io.BytesIO()
+    with av.open(buf, mode="w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=rate, layout=layout)
+        channels = len(stream.layout.channels)
+        t = np.arange(int(seconds * rate)) / rate
+        tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+        samples = np.tile(tone, (channels, 1)).T.reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(samples, format="s16", layout=layout)
+        frame.sample_rate = rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("container_format,codec", [("webm", "libopus"), ("wav", "pcm_s16le")])
+def test_decode_pcm_resamples_to_16k_mono(container_format, codec):
+    data = _encode(container_format, codec, seconds=0.5)
+
+    pcm = decode_pcm(data)
+
+    assert pcm.dtype == np.int16
+    assert pcm.ndim == 1
+    # Codec priming/padding may add a few ms either side
+    assert pcm_duration(pcm) == pytest.approx(0.5, abs=0.05)
+    assert np.abs(pcm).max() > 1000
+
+
+def test_decode_pcm_rejects_empty_upload():
+    with pytest.raises(DecodeError):
+        decode_pcm(b"")
+
+
+def test_decode_pcm_rejects_garbage():
+    with pytest.raises(DecodeError):
+        decode_pcm(b"definitely not audio" * 10)
+
+
+def test_ffmpeg_fallback_pipes_without_temp_files(monkeypatch):
+    monkeypatch.setattr(audio_decode, "av", None)
+    monkeypatch.setattr(audio_decode.shutil, "which", lambda _: "/usr/bin/ffmpeg")
+    raw = np.array([1, 2, 3], dtype=np.int16).tobytes()
+    with patch.object(audio_decode.subprocess, "run") as mock_run:
+        mock_run.return_value = Mock(returncode=0, stdout=raw, stderr=b"")
+        pcm = decode_pcm(b"webm bytes")
+
+    assert pcm.tolist() == [1, 2, 3]
+    args, kwargs = mock_run.call_args
+    assert args[0][args[0].index("-i") + 1] == "pipe:0"
+    assert args[0][-1] == "pipe:1"
+    assert kwargs["input"] == b"webm bytes"
+
+
+def test_ffmpeg_fallback_reports_errors(monkeypatch):
+    monkeypatch.setattr(audio_decode, "av", None)
+    monkeypatch.setattr(audio_decode.shutil, "which", lambda _: "/usr/bin/ffmpeg")
+    with patch.object(audio_decode.subprocess, "run") as mock_run:
+        mock_run.return_value = Mock(returncode=1, stdout=b"", stderr=b"Invalid data")
+        with pytest.raises(DecodeError, match="Invalid data"):
+            decode_pcm(b"webm bytes")
+
+
+def test_decode_without_any_backend(monkeypatch):
+    monkeypatch.setattr(audio_decode, "av", None)
+    monkeypatch.setattr(audio_decode.shutil, "which", lambda _: None)
+    with pytest.raises(DecodeError):
+        decode_pcm(b"webm bytes")
+
+
+def test_encode_opus_round_trips_smaller():
+    t = np.arange(32000) / 16000
+    pcm = (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+
+    compact = audio_decode.encode_opus(pcm, bitrate=16000)
+
+    assert len(compact) < pcm.nbytes / 8
+    assert pcm_duration(decode_pcm(compact)) == pytest.approx(2.0, abs=0.05)
+
+
+def test_load_av_imports_once_and_respects_missing_backend(monkeypatch):
+    monkeypatch.setattr(audio_decode, "av", audio_decode._NOT_LOADED)
+    assert audio_decode.load_av() is av
+    assert audio_decode.av is av
+
+    monkeypatch.setattr(audio_decode, "av", None)
+    assert audio_decode.load_av() is None
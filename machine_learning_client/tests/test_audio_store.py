@@ -2,7 +2,8 @@ import pytest
 from unittest.mock import MagicMock, patch
 from io import BytesIO
 from bson import ObjectId
-from ..audio_store import AudioStore
+from datetime import datetime, timezone
+from ..audio_store import RECENT_SCORES, AudioStore, stats_pipeline
 
 
 @pytest.fixture
@@ -75,18 +76,48 @@ def test_save_audio_with_transcript(mock_mongo):
     attempt_call = mock_attempts_col.insert_one.call_args[0][0]
     assert attempt_call["transcript"] == "Lumos"
 
+def test_save_audio_with_preassigned_id(mock_mongo):
+    _, mock_db, mock_gridfs, mock_attempts_col = mock_mongo
+    store = AudioStore("mongodb://localhost:27017", "test_db")
+    store._fs = mock_gridfs
+    store._attempts_col = mock_attempts_col
+    file_id = ObjectId()
+    mock_gridfs.put.return_value = file_id
+
+    result_id = store.save_audio(
+        BytesIO(b"fake audio data"), spell="Lumos", filename="test.webm", file_id=file_id
+    )
+
+    assert result_id == file_id
+    assert mock_gridfs.put.call_args[1]["_id"] == file_id
+    attempt_call = mock_attempts_col.insert_one.call_args[0][0]
+    assert attempt_call["audio_file_id"] == file_id
+
 def test_delete_audio(mock_mongo):
     _, mock_db, mock_gridfs, mock_attempts_col = mock_mongo
     store = AudioStore("mongodb://localhost:27017", "test_db")
     store._fs = mock_gridfs
     store._attempts_col = mock_attempts_col
     file_id = ObjectId()
-    store.delete_audio(file_id)
+    mock_attempts_col.find_one.return_value = None
+    assert store.delete_audio(file_id) is True
 
     mock_gridfs.delete.assert_called_once_with(file_id)
     mock_attempts_col.delete_many.assert_called_once_with({"audio_file_id": file_id})
 
 
+def test_delete_audio_of_one_attempt_keeps_a_shared_clip(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    file_id, attempt_id = ObjectId(), ObjectId()
+    mock_attempts_col.find_one.return_value = {"_id": ObjectId(), "recorded_at": datetime(2024, 6, 1)}
+
+    assert store.delete_audio(file_id, attempt_id) is False
+
+    mock_attempts_col.delete_many.assert_called_once_with({"audio_file_id": file_id, "_id": attempt_id})
+    mock_gridfs.delete.assert_not_called()
+
+
 def test_get_attempts_by_spell(mock_mongo):
     _, mock_db, mock_gridfs, mock_attempts_col = mock_mongo
     store = AudioStore("mongodb://localhost:27017", "test_db")
@@ -107,16 +138,252 @@ def test_get_attempts_by_spell(mock_mongo):
     mock_cursor.sort.assert_called_once_with("recorded_at", -1)
 
 
+class FakeGridOut(BytesIO):
+    """Enough of gridfs.GridOut for the streaming readers."""
+
+    def __init__(self, data, chunk_size=4):
+        super().__init__(data)
+        self.length = len(data)
+        self.chunk_size = chunk_size
+        self.reads = []
+
+    def read(self, size=-1):
+        assert size != -1, "whole-file read"
+        self.reads.append(size)
+        return super().read(size)
+
+
 def test_load_audio_to_file(mock_mongo):
     _, mock_db, mock_gridfs, mock_attempts_col = mock_mongo
     store = AudioStore("mongodb://localhost:27017", "test_db")
     store._fs = mock_gridfs
     store._attempts_col = mock_attempts_col
     file_id = ObjectId()
-    mock_grid_out = MagicMock()
-    mock_grid_out.read.return_value = b"audio data"
+    mock_grid_out = FakeGridOut(b"audio data")
     mock_gridfs.get.return_value = mock_grid_out
     file_obj = BytesIO()
     store.load_audio_to_file(file_id, file_obj)
     mock_gridfs.get.assert_called_once_with(file_id)
-    assert file_obj.getvalue() == b"audio data"
\ No newline at end of file
+    assert file_obj.getvalue() == b"audio data"
+    assert max(mock_grid_out.reads) <= mock_grid_out.chunk_size
+
+
+def test_iter_audio_reads_ranges_chunk_by_chunk():
+    grid_out = FakeGridOut(bytes(range(20)), chunk_size=8)
+
+    chunks = list(AudioStore.iter_audio(grid_out, start=3, end=15))
+
+    assert b"".join(chunks) == bytes(range(3, 15))
+    assert [len(c) for c in chunks] == [8, 4]
+    assert list(AudioStore.iter_audio(grid_out, start=18, end=100)) == [bytes([18, 19])]
+
+
+def make_store(mock_gridfs, mock_attempts_col):
+    store = AudioStore("mongodb://localhost:27017", "test_db")
+    store._fs = mock_gridfs
+    store._attempts_col = mock_attempts_col
+    store._stats_col = MagicMock()
+    return store
+
+
+def test_ensure_indexes_covers_history_and_stats(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+
+    store.ensure_indexes()
+
+    keys = [c.args[0] for c in mock_attempts_col.create_index.call_args_list]
+    assert [("user", 1), ("spell", 1), ("recorded_at", -1), ("_id", -1)] in keys
+    assert [("spell", 1), ("recorded_at", -1)] in keys
+    assert [c.args for c in store._stats_col.create_index.call_args_list] == [
+        ([("user", 1), ("spell", 1)],),
+        ("stale",),
+    ]
+
+
+def test_save_audio_with_user_updates_rolling_stats(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    mock_gridfs.put.return_value = ObjectId()
+
+    store.save_audio(BytesIO(b"x"), spell="Lumos", filename="a.webm", score=80.0, user="u1", grade="E")
+
+    attempt = mock_attempts_col.insert_one.call_args[0][0]
+    assert attempt["user"] == "u1"
+    assert attempt["grade"] == "E"
+    query, pipeline = store._stats_col.update_one.call_args.args
+    assert query == {"user": "u1", "spell": "Lumos"}
+    assert store._stats_col.update_one.call_args.kwargs["upsert"] is True
+    assert "grades.E" in pipeline[0]["$set"]
+
+
+def test_rebuild_stats_refolds_attempts_oldest_first(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    first, second = datetime(2024, 6, 1, tzinfo=timezone.utc), datetime(2024, 6, 2, tzinfo=timezone.utc)
+    mock_attempts_col.find.return_value.sort.return_value = iter([
+        {"_id": ObjectId(), "score": 35.0, "grade": "A", "recorded_at": first},
+        {"_id": ObjectId(), "score": 85.0, "grade": "O", "recorded_at": second},
+    ])
+
+    assert store.rebuild_stats("u1", "Lumos") == 2
+
+    key = {"user": "u1", "spell": "Lumos"}
+    assert mock_attempts_col.find.call_args.args[0] == key
+    mock_attempts_col.find.return_value.sort.assert_called_once_with([("recorded_at", 1), ("_id", 1)])
+    ops = store._stats_col.bulk_write.call_args.args[0]
+    assert store._stats_col.bulk_write.call_args.kwargs["ordered"] is True
+    assert ops[0]._filter == key
+    assert [op._doc for op in ops[1:]] == [
+        stats_pipeline(35.0, "A", first),
+        stats_pipeline(85.0, "O", second),
+    ]
+    assert all(op._upsert for op in ops[1:])
+
+
+def test_mark_stats_stale_and_list_them(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    store._stats_col.find.return_value = iter([{"user": "u1", "spell": "Lumos"}])
+
+    assert store.mark_stats_stale([]) == 0
+    store._stats_col.bulk_write.assert_not_called()
+    assert store.mark_stats_stale([("u1", "Lumos")]) == 1
+    op = store._stats_col.bulk_write.call_args.args[0][0]
+    assert (op._filter, op._doc) == ({"user": "u1", "spell": "Lumos"}, {"$set": {"stale": True}})
+    assert list(store.stale_stats()) == [("u1", "Lumos")]
+
+
+def test_save_audio_without_user_skips_stats(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+
+    store.save_audio(BytesIO(b"x"), spell="Lumos", filename="a.webm", score=80.0)
+
+    assert "user" not in mock_attempts_col.insert_one.call_args[0][0]
+    store._stats_col.update_one.assert_not_called()
+
+
+def test_stats_pipeline_fields():
+    recorded_at = datetime(2024, 3, 2, 12, tzinfo=timezone.utc)
+    day = int(recorded_at.timestamp()) // 86400
+    stage = stats_pipeline(72.0, "E", recorded_at)[0]["$set"]
+
+    assert stage["best"] == {"$max": ["$best", 72.0]}
+    assert stage["recent"]["$slice"][1] == -RECENT_SCORES
+    assert stage["last_day"] == {"$max": ["$last_day", day]}
+    assert stage["streak"]["$switch"]["branches"][1]["case"] == {"$eq": ["$last_day", day - 1]}
+
+    # Unscored attempts count but leave the score aggregates alone
+    unscored = stats_pipeline(None, None, recorded_at)[0]["$set"]
+    assert "attempts" in unscored
+    assert not {"best", "ema", "total", "recent"} & unscored.keys()
+    assert not any(key.startswith("grades.") for key in unscored)
+
+
+def test_get_attempts_page_uses_keyset_cursor(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = [{"_id": ObjectId(), "recorded_at": now} for _ in range(3)]
+    mock_attempts_col.find.return_value.sort.return_value.limit.return_value = docs
+
+    items, before = store.get_attempts_page(user="u1", spell="Lumos", limit=2)
+
+    assert items == docs[:2]
+    assert before == (now, docs[1]["_id"])
+    mock_attempts_col.find.return_value.sort.return_value.limit.assert_called_once_with(3)
+
+    mock_attempts_col.find.return_value.sort.return_value.limit.return_value = docs[2:]
+    items, nxt = store.get_attempts_page(user="u1", before=before, limit=2)
+    query = mock_attempts_col.find.call_args.args[0]
+    assert query["user"] == "u1"
+    assert {"recorded_at": now, "_id": {"$lt": docs[1]["_id"]}} in query["$or"]
+    assert items == docs[2:] and nxt is None
+
+
+def test_iter_attempts_streams_in_batches(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    cursor = mock_attempts_col.find.return_value.sort.return_value.batch_size.return_value
+    cursor.__iter__.return_value = iter([{"score": 1}, {"score": 2}])
+
+    assert list(store.iter_attempts(user="u1", batch_size=50)) == [{"score": 1}, {"score": 2}]
+    mock_attempts_col.find.assert_called_once_with({"user": "u1"}, None)
+    mock_attempts_col.find.return_value.sort.return_value.batch_size.assert_called_once_with(50)
+
+
+def test_expire_audio_keeps_attempts(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    file_id = ObjectId()
+    mock_attempts_col.find_one.return_value = None
+
+    assert store.expire_audio(file_id, {"duration_s": 1.2}) is True
+
+    query, update = mock_attempts_col.update_many.call_args.args
+    assert query == {"audio_file_id": file_id}
+    assert update["$set"]["features"] == {"duration_s": 1.2}
+    assert "audio_expired_at" in update["$set"]
+    assert update["$unset"] == {"audio_file_id": ""}
+    mock_gridfs.delete.assert_called_once_with(file_id)
+    mock_attempts_col.delete_many.assert_not_called()
+
+
+def test_expire_audio_keeps_a_clip_newer_attempts_share(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    store._files_col = MagicMock()
+    file_id = ObjectId()
+    cutoff, newest = datetime(2024, 5, 1), datetime(2024, 5, 20)
+    mock_attempts_col.find_one.return_value = {"_id": ObjectId(), "recorded_at": newest}
+
+    assert store.expire_audio(file_id, recorded_before=cutoff) is False
+
+    query = mock_attempts_col.update_many.call_args.args[0]
+    assert query == {"audio_file_id": file_id, "recorded_at": {"$not": {"$gte": cutoff}}}
+    store._files_col.update_one.assert_called_once_with(
+        {"_id": file_id}, {"$max": {"metadata.uploaded_at": newest}}
+    )
+    mock_gridfs.delete.assert_not_called()
+
+
+def test_repoint_attempts(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    old_id, new_id = ObjectId(), ObjectId()
+    mock_attempts_col.update_many.return_value.modified_count = 2
+
+    assert store.repoint_attempts(old_id, new_id) == 2
+    mock_attempts_col.update_many.assert_called_once_with(
+        {"audio_file_id": old_id}, {"$set": {"audio_file_id": new_id}}
+    )
+
+
+def test_scan_attempts_resumes_in_id_order(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    after, until = ObjectId(), ObjectId()
+    cursor = mock_attempts_col.find.return_value.sort.return_value.batch_size.return_value
+    cursor.__iter__.return_value = iter([{"_id": until}])
+
+    assert list(store.scan_attempts({"spell": "Lumos"}, after=after, until=until)) == [{"_id": until}]
+    mock_attempts_col.find.assert_called_once_with(
+        {"spell": "Lumos", "_id": {"$gt": after, "$lte": until}}, None
+    )
+    mock_attempts_col.find.return_value.sort.assert_called_once_with("_id", 1)
+
+
+def test_update_attempts_is_one_unordered_bulk_write(mock_mongo):
+    _, _, mock_gridfs, mock_attempts_col = mock_mongo
+    store = make_store(mock_gridfs, mock_attempts_col)
+    first, second = ObjectId(), ObjectId()
+    mock_attempts_col.bulk_write.return_value.modified_count = 2
+
+    assert store.update_attempts([(first, {"$set": {"grade": "O"}}), (second, [{"$set": {"grade": "T"}}])]) == 2
+    ops = mock_attempts_col.bulk_write.call_args.args[0]
+    assert [op._filter for op in ops] == [{"_id": first}, {"_id": second}]
+    assert mock_attempts_col.bulk_write.call_args.kwargs == {"ordered": False}
+
+    assert store.update_attempts([]) == 0
+    assert mock_attempts_col.bulk_write.call_count == 1
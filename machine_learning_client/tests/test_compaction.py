@@ -0,0 +1,278 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from ..compaction import (
+    CompactionPolicy,
+    Compactor,
+    MaintenanceLease,
+    clip_features,
+    format_report,
+    pcm_digest,
+)
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def tone(seconds=1.0, freq=220):
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (np.sin(2 * np.pi * freq * t) * 8000).astype(np.int16)
+
+
+class FakeStore:
+    """In-memory stand-in for the AudioStore methods compaction uses."""
+
+    def __init__(self):
+        self.files = {}
+        self.attempts = []
+
+    def add(self, data, age, pcm, **metadata):
+        file_id = ObjectId()
+        self.files[file_id] = {
+            "_id": file_id,
+            "data": data,
+            "pcm": pcm,
+            "length": len(data),
+            "uploadDate": NOW - age,
+            "contentType": "audio/webm",
+            "metadata": dict(metadata, uploaded_at=NOW - age),
+        }
+        self.attempts.append({"audio_file_id": file_id, "score": 80.0, "recorded_at": NOW - age})
+        return file_id
+
+    def find_files(self, query, limit=0):
+        for doc in sorted(self.files.values(), key=lambda d: d["uploadDate"]):
+            if "$or" in query:
+                uploaded = doc["metadata"].get("uploaded_at", doc["uploadDate"])
+                if uploaded >= query["$or"][0]["metadata.uploaded_at"]["$lt"]:
+                    continue
+            else:
+                date = query["uploadDate"]
+                if doc["uploadDate"] >= date["$lt"] or doc["uploadDate"] < date["$gte"]:
+                    continue
+                if doc["metadata"].get("compact"):
+                    continue
+            yield dict(doc)
+
+    def open_audio(self, file_id):
+        return self.files[file_id]
+
+    def iter_audio(self, grid_out):
+        yield grid_out["data"]
+
+    def find_compact_clip(self, digest):
+        for doc in self.files.values():
+            if doc["metadata"].get("compact") and doc["metadata"].get("pcm_sha256") == digest:
+                return doc["_id"]
+        return None
+
+    def store_compact(self, data, *, filename, content_type, metadata):
+        file_id = ObjectId()
+        self.files[file_id] = {"_id": file_id, "data": data, "length": len(data),
+                               "uploadDate": NOW, "metadata": metadata, "pcm": None}
+        return file_id
+
+    def mark_compact(self, file_id, metadata):
+        self.files[file_id]["metadata"].update(metadata)
+
+    def repoint_attempts(self, old_id, new_id, features=None):
+        for attempt in self.attempts:
+            if attempt.get("audio_file_id") == old_id:
+                attempt.update(audio_file_id=new_id, features=features)
+
+    def expire_audio(self, file_id, features=None, recorded_before=None):
+        for attempt in self.attempts:
+            if attempt.get("audio_file_id") == file_id and attempt["recorded_at"] < recorded_before:
+                attempt.pop("audio_file_id")
+                attempt["features"] = features
+        sharing = [a["recorded_at"] for a in self.attempts if a.get("audio_file_id") == file_id]
+        if sharing:
+            metadata = self.files[file_id]["metadata"]
+            metadata["uploaded_at"] = max(metadata["uploaded_at"], *sharing)
+            return False
+        del self.files[file_id]
+        return True
+
+    def delete_file(self, file_id):
+        del self.files[file_id]
+
+
+def make_compactor(store, **policy):
+    pcm_by_data = {doc["data"]: doc["pcm"] for doc in store.files.values()}
+    decode = pcm_by_data.__getitem__
+    encode = MagicMock(side_effect=lambda pcm, bitrate: b"opus" + bytes(len(pcm) // 1000))
+    compactor = Compactor(
+        store,
+        CompactionPolicy(compact_after=timedelta(hours=1), retain_for=timedelta(days=30), **policy),
+        decode=decode,
+        encode=encode,
+        clock=lambda: NOW,
+    )
+    return compactor, encode
+
+
+def test_compacts_due_clips_and_reports_savings():
+    store = FakeStore()
+    fresh = store.add(b"fresh" * 1000, timedelta(minutes=5), tone())
+    due = store.add(b"due" * 10000, timedelta(hours=2), tone())
+    compactor, encode = make_compactor(store, bitrate=16000)
+
+    report = compactor.run()
+
+    assert fresh in store.files  # too young to touch
+    assert due not in store.files
+    new_id = store.attempts[1]["audio_file_id"]
+    new = store.files[new_id]
+    assert new["metadata"]["compact"] is True
+    assert new["metadata"]["pcm_sha256"] == pcm_digest(tone())
+    assert new["metadata"]["original_length"] == 30000
+    assert store.attempts[1]["features"]["duration_s"] == 1.0
+    encode.assert_called_once()
+    assert encode.call_args.kwargs["bitrate"] == 16000
+    assert report["compacted"] == 1
+    assert report["bytes_saved"] == 30000 - new["length"]
+
+
+def test_identical_audio_is_stored_once():
+    store = FakeStore()
+    store.add(b"first upload", timedelta(hours=3), tone())
+    store.add(b"second upload, other container", timedelta(hours=2), tone())
+    compactor, encode = make_compactor(store)
+
+    report = compactor.run()
+
+    assert report["compacted"] == 1 and report["deduplicated"] == 1
+    assert len(store.files) == 1
+    assert store.attempts[0]["audio_file_id"] == store.attempts[1]["audio_file_id"]
+    encode.assert_called_once()
+
+
+def test_clips_smaller_than_opus_are_only_flagged():
+    store = FakeStore()
+    tiny = store.add(b"x", timedelta(hours=2), tone())
+    compactor, _ = make_compactor(store)
+
+    report = compactor.run()
+
+    assert store.files[tiny]["data"] == b"x"
+    assert store.files[tiny]["metadata"]["compact"] is True
+    assert report["bytes_saved"] == 0
+
+
+def test_expired_audio_keeps_scores_and_features():
+    store = FakeStore()
+    old = store.add(b"old" * 100, timedelta(days=45), tone(0.5))
+    compactor, _ = make_compactor(store)
+
+    report = compactor.run()
+
+    assert old not in store.files
+    attempt = store.attempts[0]
+    assert "audio_file_id" not in attempt
+    assert attempt["score"] == 80.0
+    assert attempt["features"]["duration_s"] == 0.5
+    assert report["expired"] == 1 and report["bytes_saved"] == 300
+
+
+def test_compacted_clips_expire_from_their_original_upload():
+    store = FakeStore()
+    store.add(b"due" * 10000, timedelta(days=29, hours=23), tone())
+    compactor, _ = make_compactor(store)
+    compactor.run()
+    new_id = store.attempts[0]["audio_file_id"]
+    assert store.files[new_id]["uploadDate"] == NOW
+    assert store.files[new_id]["metadata"]["uploaded_at"] == NOW - timedelta(days=29, hours=23)
+
+    compactor._clock = lambda: NOW + timedelta(hours=2)
+    report = compactor.run()
+
+    assert report["expired"] == 1
+    assert new_id not in store.files
+    assert "audio_file_id" not in store.attempts[0]
+
+
+def test_shared_clips_are_kept_until_every_attempt_has_expired():
+    store = FakeStore()
+    store.add(b"first upload", timedelta(days=20), tone())
+    store.add(b"second upload, other container", timedelta(days=5), tone())
+    compactor, _ = make_compactor(store)
+    compactor._clock = lambda: NOW - timedelta(days=4)
+    compactor.run()
+    shared = store.attempts[0]["audio_file_id"]
+    assert store.attempts[1]["audio_file_id"] == shared
+
+    compactor._clock = lambda: NOW + timedelta(days=15)
+    report = compactor.run()
+
+    assert report["expired"] == 0
+    assert "audio_file_id" not in store.attempts[0]
+    assert store.attempts[1]["audio_file_id"] == shared
+    assert store.files[shared]["metadata"]["uploaded_at"] == NOW - timedelta(days=5)
+
+    compactor._clock = lambda: NOW + timedelta(days=26)
+    assert compactor.run()["expired"] == 1
+    assert shared not in store.files
+    assert "audio_file_id" not in store.attempts[1]
+
+
+def test_undecodable_clips_still_expire():
+    store = FakeStore()
+    old = store.add(b"garbage", timedelta(days=45), None)
+    compactor, _ = make_compactor(store)
+    compactor._decode = MagicMock(side_effect=ValueError("bad container"))
+
+    report = compactor.run(limit=1)
+
+    assert old not in store.files
+    assert store.attempts[0]["features"] == {"duration_s": None, "stored_bytes": 7}
+    assert report["expired"] == 1 and report["failed"] == 0
+
+
+def test_dry_run_writes_nothing():
+    store = FakeStore()
+    store.add(b"due" * 10000, timedelta(hours=2), tone())
+    store.add(b"old" * 100, timedelta(days=45), tone())
+    before = {k: dict(v) for k, v in store.files.items()}
+    compactor, _ = make_compactor(store)
+
+    report = compactor.run(dry_run=True)
+
+    assert store.files.keys() == before.keys()
+    assert report["compacted"] == 1 and report["expired"] == 1
+    assert report["bytes_saved"] > 0
+    assert "[dry run]" in format_report(report)
+
+
+def test_failures_are_counted_not_raised():
+    store = FakeStore()
+    store.add(b"broken", timedelta(hours=2), None)
+    compactor, _ = make_compactor(store)
+    compactor._decode = MagicMock(side_effect=ValueError("bad container"))
+
+    report = compactor.run()
+
+    assert report["failed"] == 1 and report["scanned"] == 1
+
+
+def test_clip_features():
+    features = clip_features(tone())
+    assert features["duration_s"] == 1.0
+    assert features["peak_dbfs"] == pytest.approx(20 * np.log10(8000 / 32768), abs=0.2)
+    assert clip_features(np.zeros(0, dtype=np.int16))["rms_dbfs"] == -120.0
+
+
+def test_maintenance_lease_is_exclusive():
+    col = MagicMock()
+    lease = MaintenanceLease(col)
+    assert lease.acquire() is True
+    query = col.find_one_and_update.call_args.args[0]
+    assert {"holder": lease.holder} in query["$or"]
+
+    col.find_one_and_update.side_effect = DuplicateKeyError("held")
+    assert lease.acquire() is False
+    lease.release()
+    col.delete_one.assert_called_once_with({"_id": "audio-compaction", "holder": lease.holder})
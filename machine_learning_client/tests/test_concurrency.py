@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ..concurrency import AdmissionLimiter, OverloadedError, Stage, stages_from_env
+
+
+def test_stage_runs_blocking_work_off_the_event_loop():
+    stage = Stage("recognize", workers=2, max_queue=0)
+    loop_thread = threading.get_ident()
+
+    async def main():
+        return await stage.run(threading.get_ident)
+
+    worker_thread = asyncio.run(main())
+
+    assert worker_thread != loop_thread
+    assert stage.stats()["completed"] == 1
+    stage.shutdown()
+
+
+def test_stage_rejects_beyond_workers_plus_queue():
+    stage = Stage("transcode", workers=1, max_queue=1, retry_after=3)
+
+    async def main():
+        first = asyncio.ensure_future(stage.run(time.sleep, 0.05))
+        second = asyncio.ensure_future(stage.run(time.sleep, 0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError) as excinfo:
+            await stage.run(time.sleep, 0)
+        await asyncio.gather(first, second)
+        return excinfo.value
+
+    error = asyncio.run(main())
+
+    assert error.retry_after == 3
+    assert stage.stats()["rejected"] == 1
+    assert stage.stats()["pending"] == 0
+    stage.shutdown()
+
+
+def test_unbounded_run_bypasses_queue_limit():
+    stage = Stage("mongo", workers=1, max_queue=0)
+
+    async def main():
+        first = asyncio.ensure_future(stage.run(time.sleep, 0.02))
+        await asyncio.sleep(0)
+        await stage.run(time.sleep, 0, bounded=False)
+        await first
+
+    asyncio.run(main())
+
+    assert stage.stats()["rejected"] == 0
+    assert stage.stats()["completed"] == 2
+    stage.shutdown()
+
+
+def test_stages_run_concurrently_on_the_loop():
+    stage = Stage("recognize", workers=4, max_queue=0)
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(stage.run(time.sleep, 0.1) for _ in range(4)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+
+    assert elapsed < 0.3
+    stage.shutdown()
+
+
+def test_admission_limiter():
+    limiter = AdmissionLimiter(max_in_flight=1, retry_after=2)
+
+    async def main():
+        async with limiter:
+            with pytest.raises(OverloadedError):
+                async with limiter:
+                    pass
+        async with limiter:
+            pass
+
+    asyncio.run(main())
+
+    assert limiter.stats() == {"max_in_flight": 1, "in_flight": 0, "rejected": 1}
+
+
+def test_stages_from_env(monkeypatch):
+    monkeypatch.setenv("TRANSCODE_WORKERS", "3")
+    monkeypatch.setenv("MONGO_QUEUE", "7")
+    monkeypatch.setenv("RECOGNIZE_WORKERS", "5")
+
+    stages = stages_from_env()
+
+    stats = stages.stats()
+    assert stats["transcode"]["workers"] == 3
+    assert stats["mongo"]["max_queue"] == 7
+    assert stats["recognize"]["workers"] == 5
+    stages.shutdown()
@@ -1,10 +1,19 @@
+import asyncio
+import threading
+import time
 import os
+import numpy as np
 import pytest
 from io import BytesIO
 from unittest.mock import Mock, patch
 from bson import ObjectId
 from fastapi.testclient import TestClient
 from .. import convert
+from ..audio_decode import DecodeError
+from ..concurrency import AdmissionLimiter
+from ..prescore import PreScorer
+from ..vad import VoiceTrimmer
+from ..result_cache import ResultCache
 
 os.environ["SPEECH_KEY"] = "fake_key"
 os.environ["SPEECH_REGION"] = "fake_region"
@@ -31,8 +40,12 @@ def mock_dependencies(monkeypatch):
 
     # Override attributes on the imported convert module
     monkeypatch.setattr(convert, "audio_store", mock_store)
-    monkeypatch.setattr(convert, "convert_to_wav", mock_convert)
-    monkeypatch.setattr(convert, "pronunciation_assessment", mock_assess)
+    monkeypatch.setattr(convert, "decode_to_pcm", mock_convert)
+    monkeypatch.setattr(convert.scorer, "score", mock_assess)
+    monkeypatch.setattr(convert, "result_cache", ResultCache())
+    # Most tests send placeholder audio; trimming and pre-scoring have their own tests below
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer(enabled=False))
+    monkeypatch.setattr(convert, "prescorer", PreScorer(enabled=False))
 
     return mock_store, mock_convert, mock_assess
 
@@ -45,9 +58,7 @@ def audio_file():
 def test_assess_success(client, mock_dependencies, audio_file):
     mock_store, mock_convert, mock_assess = mock_dependencies
 
-    file_id = ObjectId()
-    mock_store.save_audio.return_value = file_id
-    mock_convert.return_value = "/tmp/test.webm.wav"
+    mock_convert.return_value = b"\x00\x00" * 160
     mock_assess.return_value = {
         "success": True,
         "recognized_text": "Lumos",
@@ -67,4 +78,673 @@ def test_assess_success(client, mock_dependencies, audio_file):
     assert result["success"] is True
     assert result["recognized_text"] == "Lumos"
     assert result["grade"] == "O"
-    assert result["file_id"] == str(file_id)
\ No newline at end of file
+
+    # Audio was decoded from memory and scored without a GridFS read-back
+    mock_convert.assert_called_once_with(b"fake audio data")
+    mock_assess.assert_called_once_with("Lumos", mock_convert.return_value)
+    mock_store.load_audio_to_file.assert_not_called()
+
+    # The original upload is stored in the background under the returned id
+    mock_store.save_audio.assert_called_once()
+    save_kwargs = mock_store.save_audio.call_args.kwargs
+    assert save_kwargs["file_id"] == ObjectId(result["file_id"])
+    assert save_kwargs["score"] == 85.5
+    assert save_kwargs["content_type"] == "audio/webm"
+
+
+def test_assess_background_save_failure_does_not_fail_request(
+    client, mock_dependencies, audio_file
+):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    mock_convert.return_value = b"\x00\x00"
+    mock_assess.return_value = {"success": True, "accuracy_score": 50.0}
+    mock_store.save_audio.side_effect = RuntimeError("mongo down")
+
+    files = {"audio": ("test.webm", audio_file, "video/webm")}
+    response = client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 200
+    assert "file_id" in response.json()
+
+
+def test_assess_decode_error_returns_500(client, mock_dependencies, audio_file):
+    _, mock_convert, mock_assess = mock_dependencies
+    mock_convert.side_effect = RuntimeError("bad container")
+
+    files = {"audio": ("test.webm", audio_file, "audio/webm")}
+    response = client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 500
+    assert "bad container" in response.json()["detail"]
+    mock_assess.assert_not_called()
+
+def test_assess_undecodable_upload_returns_415(client, mock_dependencies, audio_file):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    mock_convert.side_effect = DecodeError("Could not decode audio: Invalid data found")
+
+    files = {"audio": ("test.webm", audio_file, "audio/webm")}
+    response = client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 415
+    assert response.json()["detail"] == "Could not decode audio: Invalid data found"
+    mock_assess.assert_not_called()
+    mock_store.save_audio.assert_not_called()
+
+def test_stats_reports_pool_counters(client):
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    pool_stats = response.json()["recognizer_pool"]
+    assert {"hits", "misses", "hit_rate", "evictions"} <= pool_stats.keys()
+
+
+def test_assess_over_capacity_returns_503_with_retry_after(
+    client, mock_dependencies, audio_file, monkeypatch
+):
+    _, _, mock_assess = mock_dependencies
+    limiter = AdmissionLimiter(max_in_flight=1, retry_after=5)
+    limiter.in_flight = 1  # another request already holds the only slot
+    monkeypatch.setattr(convert, "admission", limiter)
+
+    files = {"audio": ("test.webm", audio_file, "audio/webm")}
+    response = client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert response.json()["success"] is False
+    mock_assess.assert_not_called()
+
+
+def test_stats_reports_stage_counters(client, mock_dependencies, audio_file):
+    _, mock_convert, mock_assess = mock_dependencies
+    mock_convert.return_value = b"\x00\x00"
+    mock_assess.return_value = {"success": True, "accuracy_score": 50.0}
+
+    client.post("/assess", files={"audio": ("a.webm", audio_file, "audio/webm")}, data={"spell": "Lumos"})
+    body = client.get("/stats").json()
+
+    assert set(body["stages"]) == {"transcode", "mongo", "recognize"}
+    assert body["stages"]["recognize"]["completed"] >= 1
+    assert body["admission"]["in_flight"] == 0
+
+
+def test_repeat_submission_is_served_from_cache(client, mock_dependencies):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    mock_convert.return_value = np.arange(320, dtype=np.int16)
+    mock_assess.return_value = {
+        "success": True,
+        "recognized_text": "Lumos",
+        "accuracy_score": 85.5,
+        "grade": "O",
+    }
+
+    def post():
+        files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+        return client.post("/assess", files=files, data={"spell": "Lumos"}).json()
+
+    first, second = post(), post()
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["accuracy_score"] == 85.5
+    assert second["file_id"] != first["file_id"]
+    mock_assess.assert_called_once()
+    # Both attempts are still recorded
+    assert mock_store.save_audio.call_count == 2
+    assert client.get("/stats").json()["result_cache"]["azure_calls_saved"] == 1
+
+
+def test_failed_assessment_is_not_cached(client, mock_dependencies):
+    _, mock_convert, mock_assess = mock_dependencies
+    mock_convert.return_value = np.arange(320, dtype=np.int16)
+    mock_assess.return_value = {"success": False, "error": "Recognition canceled"}
+
+    for _ in range(2):
+        files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+        client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert mock_assess.call_count == 2
+
+
+def test_silent_clip_is_graded_without_calling_the_scorer(client, mock_dependencies, monkeypatch):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    monkeypatch.setattr(convert, "prescorer", PreScorer())
+    mock_convert.return_value = np.zeros(16000, dtype=np.int16)
+
+    files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+    result = client.post("/assess", files=files, data={"spell": "Lumos"}).json()
+
+    assert result["grade"] == "T"
+    assert result["prescored"] == "no_speech"
+    assert result["cached"] is False
+    mock_assess.assert_not_called()
+    # The attempt is still recorded, and counts as an avoided scorer call
+    assert mock_store.save_audio.call_args.kwargs["grade"] == "T"
+    assert client.get("/stats").json()["prescore"]["calls_avoided"] == 1
+
+
+def test_high_scoring_attempt_becomes_a_template(client, mock_dependencies, monkeypatch):
+    _, mock_convert, mock_assess = mock_dependencies
+    prescorer = PreScorer()
+    monkeypatch.setattr(convert, "prescorer", prescorer)
+    t = np.arange(16000) / 16000
+    mock_convert.return_value = (8000 * np.sin(2 * np.pi * 300 * t) * (t > 0.3)).astype(np.int16)
+    mock_assess.return_value = {"success": True, "accuracy_score": 91.0, "grade": "O"}
+
+    files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+    client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    mock_assess.assert_called_once()
+    assert len(prescorer.templates.get("Lumos")) == 1
+    assert prescorer.stats()["learned"] == 1
+
+
+def speech(seconds=1.0, pause=1.0):
+    """A tone burst with `pause` seconds of near-silence either side."""
+    t = np.arange(int(16000 * seconds)) / 16000
+    quiet = np.zeros(int(16000 * pause))
+    return np.concatenate([quiet, 8000 * np.sin(2 * np.pi * 300 * t), quiet]).astype(np.int16)
+
+
+def test_silence_is_trimmed_before_scoring(client, mock_dependencies, monkeypatch):
+    _, mock_convert, mock_assess = mock_dependencies
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer(pad_seconds=0.1))
+    mock_convert.return_value = speech(seconds=1.0, pause=1.5)
+    mock_assess.return_value = {"success": True, "accuracy_score": 70.0, "grade": "E"}
+
+    files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+    result = client.post("/assess", files=files, data={"spell": "Lumos"}).json()
+
+    scored = mock_assess.call_args[0][1]
+    assert len(scored) / 16000 == pytest.approx(1.2, abs=0.05)
+    assert result["trim"]["input_seconds"] == 4.0
+    assert result["trim"]["seconds_saved"] == pytest.approx(2.8, abs=0.05)
+    assert result["trim"]["bytes_saved"] == 2 * (len(mock_convert.return_value) - len(scored))
+    assert result["trim"]["capped"] is False
+    assert client.get("/stats").json()["vad"]["trimmed"] == 1
+
+
+def test_long_speech_is_capped_by_spell_length(client, mock_dependencies, monkeypatch):
+    _, mock_convert, mock_assess = mock_dependencies
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer(pad_seconds=0))
+    mock_convert.return_value = speech(seconds=8.0, pause=0.5)
+    mock_assess.return_value = {"success": True, "accuracy_score": 30.0, "grade": "A"}
+
+    files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+    result = client.post("/assess", files=files, data={"spell": "Nox"}).json()
+
+    # 1 s plus 0.25 s per letter
+    assert len(mock_assess.call_args[0][1]) == int(1.75 * 16000)
+    assert result["trim"]["capped"] is True
+
+
+def test_clip_without_speech_is_rejected(client, mock_dependencies, monkeypatch):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer())
+    mock_convert.return_value = np.zeros(32000, dtype=np.int16)
+
+    files = {"audio": ("test.webm", BytesIO(b"fake audio data"), "audio/webm")}
+    response = client.post("/assess", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "No speech detected in the recording"
+    mock_assess.assert_not_called()
+    mock_store.save_audio.assert_not_called()
+
+
+class FakeJobQueue:
+    """In-memory stand-in for JobQueue."""
+
+    max_attempts = 3
+
+    def __init__(self):
+        self.jobs = {}
+
+    def enqueue(self, data, *, spell, filename, content_type, user=None):
+        job_id = ObjectId()
+        self.jobs[job_id] = {
+            "_id": job_id, "status": "queued", "spell": spell, "filename": filename,
+            "content_type": content_type, "audio": data, "attempts": 0, "user": user,
+        }
+        return job_id
+
+    def claim(self):
+        for job in self.jobs.values():
+            if job["status"] == "queued":
+                job["status"] = "running"
+                job["attempts"] += 1
+                return dict(job)
+        return None
+
+    def complete(self, job_id, result):
+        self.jobs[job_id].update(status="done", result=result)
+        return True
+
+    def fail(self, job_id, error):
+        self.jobs[job_id].update(status="failed", error=error)
+        return True
+
+    def release(self, job_id):
+        self.jobs[job_id]["status"] = "queued"
+        return True
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return {k: v for k, v in job.items() if k != "audio"} if job else None
+
+
+@pytest.fixture
+def job_queue(monkeypatch):
+    queue = FakeJobQueue()
+    monkeypatch.setattr(convert, "job_queue", queue)
+    return queue
+
+
+def test_submit_job_returns_202_without_scoring(client, mock_dependencies, job_queue, audio_file):
+    _, mock_convert, mock_assess = mock_dependencies
+
+    files = {"audio": ("test.webm", audio_file, "video/webm")}
+    response = client.post("/jobs", files=files, data={"spell": "Lumos", "user": "u1"})
+
+    assert response.status_code == 202
+    body = response.json()
+    job = job_queue.jobs[ObjectId(body["job_id"])]
+    assert body["status"] == "queued"
+    assert job["audio"] == b"fake audio data"
+    assert job["content_type"] == "audio/webm"
+    assert job["user"] == "u1"
+    mock_convert.assert_not_called()
+    mock_assess.assert_not_called()
+
+
+def test_run_job_completes_job_and_stores_attempt(client, mock_dependencies, job_queue):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    mock_convert.return_value = np.arange(320, dtype=np.int16)
+    mock_assess.return_value = {"success": True, "accuracy_score": 91.0, "grade": "O"}
+    job_id = job_queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm", user="u1")
+
+    asyncio.run(convert.run_job(job_queue.claim()))
+
+    body = client.get(f"/jobs/{job_id}").json()
+    assert body["status"] == "done"
+    assert body["result"]["grade"] == "O"
+    assert "audio" not in body
+    save_kwargs = mock_store.save_audio.call_args.kwargs
+    assert save_kwargs["file_id"] == ObjectId(body["result"]["file_id"])
+    assert save_kwargs["user"] == "u1"
+    assert save_kwargs["grade"] == "O"
+
+
+def test_run_job_records_failures(mock_dependencies, job_queue):
+    _, mock_convert, _ = mock_dependencies
+    mock_convert.side_effect = RuntimeError("bad container")
+    job_id = job_queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm")
+
+    asyncio.run(convert.run_job(job_queue.claim()))
+
+    assert job_queue.jobs[job_id]["status"] == "failed"
+    assert "bad container" in job_queue.jobs[job_id]["error"]
+
+
+def test_run_job_fails_unusable_uploads_without_a_traceback(mock_dependencies, job_queue, capsys):
+    _, mock_convert, _ = mock_dependencies
+    mock_convert.side_effect = DecodeError("Could not decode the audio")
+    job_id = job_queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm")
+
+    asyncio.run(convert.run_job(job_queue.claim()))
+
+    assert job_queue.jobs[job_id]["status"] == "failed"
+    assert job_queue.jobs[job_id]["error"] == "Could not decode the audio"
+    assert "Traceback" not in capsys.readouterr().err
+
+
+def test_run_job_gives_up_after_max_attempts(mock_dependencies, job_queue):
+    _, _, mock_assess = mock_dependencies
+    job_id = job_queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm")
+    job_queue.jobs[job_id]["attempts"] = job_queue.max_attempts
+
+    asyncio.run(convert.run_job(job_queue.claim()))
+
+    assert job_queue.jobs[job_id]["status"] == "failed"
+    mock_assess.assert_not_called()
+
+
+def test_get_job_long_poll_times_out_while_queued(client, job_queue, monkeypatch):
+    monkeypatch.setattr(convert, "JOB_POLL_SECONDS", 0.01)
+    job_id = job_queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm")
+
+    response = client.get(f"/jobs/{job_id}", params={"wait": 0.05})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    assert convert.job_waiters._events == {}
+    assert convert.job_waiters._waiting == {}
+
+
+def test_get_job_unknown_or_unconfigured(client, job_queue, monkeypatch):
+    assert client.get(f"/jobs/{ObjectId()}").status_code == 404
+    assert client.get("/jobs/not-an-id").status_code == 404
+    monkeypatch.setattr(convert, "job_queue", None)
+    assert client.get(f"/jobs/{ObjectId()}").status_code == 503
+
+
+def stored_clip(monkeypatch, data, content_type="audio/webm"):
+    from .test_audio_store import FakeGridOut
+
+    grid_out = FakeGridOut(data, chunk_size=4)
+    grid_out.content_type = content_type
+    store = Mock()
+    store.open_audio.return_value = grid_out
+    store.iter_audio = convert.AudioStore.iter_audio
+    monkeypatch.setattr(convert, "audio_store", store)
+    return store
+
+
+def test_get_audio_streams_whole_clip(client, monkeypatch):
+    stored_clip(monkeypatch, b"0123456789")
+
+    response = client.get(f"/audio/{ObjectId()}")
+
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == "10"
+    assert response.headers["content-type"] == "audio/webm"
+
+
+def test_get_audio_serves_byte_ranges(client, monkeypatch):
+    stored_clip(monkeypatch, b"0123456789")
+
+    response = client.get(f"/audio/{ObjectId()}", headers={"Range": "bytes=2-6"})
+    assert response.status_code == 206
+    assert response.content == b"23456"
+    assert response.headers["content-range"] == "bytes 2-6/10"
+
+    response = client.get(f"/audio/{ObjectId()}", headers={"Range": "bytes=50-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */10"
+
+
+def test_get_audio_suffix_range_of_an_empty_clip(client, monkeypatch):
+    stored_clip(monkeypatch, b"")
+
+    response = client.get(f"/audio/{ObjectId()}", headers={"Range": "bytes=-500"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+
+
+def test_get_audio_missing(client, monkeypatch):
+    store = stored_clip(monkeypatch, b"")
+    store.open_audio.side_effect = convert.NoFile("gone")
+
+    assert client.get(f"/audio/{ObjectId()}").status_code == 404
+    assert client.get("/audio/nope").status_code == 404
+
+
+def test_healthz_is_always_ok(client):
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+
+def test_readyz_waits_for_scorer_and_mongo(client, monkeypatch):
+    monkeypatch.setattr(convert, "readiness", {"scorer": False, "mongo": False})
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    convert.readiness.update(scorer=True, mongo=True)
+    assert client.get("/readyz").status_code == 200
+
+    # Without storage configured only the scorer matters
+    convert.readiness["mongo"] = None
+    assert client.get("/readyz").status_code == 200
+
+
+def test_lifespan_connects_and_warms_in_background(monkeypatch):
+    monkeypatch.delenv("MONGO_URI", raising=False)
+    monkeypatch.setattr(convert, "audio_store", None)
+    monkeypatch.setattr(convert, "job_queue", None)
+    monkeypatch.setattr(convert, "readiness", {"scorer": False, "mongo": None})
+    warm = Mock()
+    monkeypatch.setattr(convert.scorer, "warm_up", warm)
+
+    with TestClient(convert.app) as client:
+        assert client.get("/healthz").status_code == 200
+        for _ in range(100):
+            if client.get("/readyz").status_code == 200:
+                break
+            time.sleep(0.01)
+        assert client.get("/readyz").json()["scorer"] is True
+
+    warm.assert_called_once()
+    assert convert.audio_store is None
+
+
+def test_store_attempt_without_storage_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(convert, "audio_store", None)
+    asyncio.run(
+        convert.store_attempt(
+            b"x", file_id=ObjectId(), spell="Lumos", filename="a.webm",
+            content_type="audio/webm", result={},
+        )
+    )
+
+
+def test_stats_names_the_replica(client):
+    assert client.get("/stats").json()["replica"]
+
+
+class RecordingStream:
+    """Incremental scoring stream that records what it was fed."""
+
+    incremental = True
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = threading.Event()
+        self.started_before_close = None
+
+    def write(self, pcm):
+        self.chunks.append(np.array(pcm))
+
+    def close(self):
+        self.closed.set()
+
+    def result(self):
+        self.started_before_close = not self.closed.is_set()
+        self.closed.wait(5)
+        return {"success": True, "accuracy_score": 88.0, "grade": "O", "grade_label": "Outstanding"}
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    stream = RecordingStream()
+    monkeypatch.setattr(convert.scorer, "open_stream", Mock(return_value=stream))
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer(no_speech_seconds=1.5))
+    monkeypatch.setattr(convert, "prescorer", PreScorer(enabled=False))
+    monkeypatch.setattr(convert, "audio_store", None)
+    monkeypatch.setattr(convert, "result_cache", ResultCache())
+    return stream
+
+
+def send_chunks(ws, pcm, chunk=1600):
+    for i in range(0, len(pcm), chunk):
+        ws.send_bytes(pcm[i:i + chunk].tobytes())
+
+
+def test_stream_is_scored_as_soon_as_speech_ends(client, streaming):
+    clip = speech(seconds=0.8, pause=1.0)
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos", "sample_rate": 16000})
+        send_chunks(ws, clip)
+        # No "stop": the trailing silence is enough to end the utterance
+        assert ws.receive_json() == {"event": "speech_start"}
+        assert ws.receive_json() == {"event": "speech_end"}
+        result = ws.receive_json()
+
+    assert result["event"] == "result"
+    assert result["grade"] == "O"
+    assert result["cached"] is False
+    convert.scorer.open_stream.assert_called_once_with("Lumos")
+    # The scorer was already listening before the utterance ended
+    assert streaming.started_before_close is True
+    # Only the speech and a short pad either side reached it
+    sent = np.concatenate(streaming.chunks)
+    assert len(sent) / 16000 == pytest.approx(1.1, abs=0.06)
+    # The answer came 0.6 s after the speech, before the client finished sending
+    received = result["trim"]["input_seconds"]
+    assert received == pytest.approx(1.0 + 0.8 + 0.6, abs=0.1) and received < len(clip) / 16000
+    assert result["trim"]["bytes_saved"] == 2 * (round(received * 16000) - len(sent))
+
+
+def test_repeated_stream_reuses_the_cached_score(client, streaming):
+    # A scorer that only works once speech has ended: a cache hit skips it
+    streaming.incremental = False
+    clip = speech(seconds=0.8, pause=1.0)
+    results = []
+    for _ in range(2):
+        with client.websocket_connect("/ws/assess") as ws:
+            ws.send_json({"spell": "Lumos"})
+            send_chunks(ws, clip)
+            results.append([ws.receive_json() for _ in range(3)][-1])
+
+    assert [r["cached"] for r in results] == [False, True]
+    assert results[1]["accuracy_score"] == results[0]["accuracy_score"]
+    assert convert.result_cache.memory_hits == 1
+
+
+def test_incremental_stream_fills_the_cache_without_looking_it_up(client, streaming):
+    clip = speech(seconds=0.8, pause=1.0)
+    for _ in range(2):
+        with client.websocket_connect("/ws/assess") as ws:
+            ws.send_json({"spell": "Lumos"})
+            send_chunks(ws, clip)
+            result = [ws.receive_json() for _ in range(3)][-1]
+
+    assert result["cached"] is False
+    assert convert.result_cache.memory_hits == 0
+    assert convert.result_cache.stats()["entries"] == 1
+
+
+def test_stream_stop_ends_the_utterance(client, streaming):
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos"})
+        send_chunks(ws, speech(seconds=0.5, pause=0.2)[:12000])
+        ws.send_json({"event": "stop"})
+        events = [ws.receive_json()["event"] for _ in range(3)]
+
+    assert events == ["speech_start", "speech_end", "result"]
+    assert streaming.closed.is_set()
+
+
+def test_stream_without_speech_is_rejected(client, streaming):
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos"})
+        send_chunks(ws, np.zeros(32000, dtype=np.int16))
+        message = ws.receive_json()
+
+    assert message == {"event": "error", "error": "No speech detected in the recording"}
+    convert.scorer.open_stream.assert_not_called()
+    assert client.get("/stats").json()["vad"]["rejected_no_speech"] == 1
+
+
+def test_stream_rejects_a_bad_opening_message(client, streaming):
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos", "sample_rate": 48000})
+        message = ws.receive_json()
+
+    assert message["event"] == "error"
+    assert "sample_rate" in message["error"]
+
+
+def test_stream_graded_locally_after_the_scorer_opened_saves_no_call(client, streaming, monkeypatch):
+    prescorer = PreScorer(min_speech_seconds=5.0)
+    monkeypatch.setattr(convert, "prescorer", prescorer)
+
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos"})
+        send_chunks(ws, speech(seconds=0.8, pause=1.0))
+        result = [ws.receive_json() for _ in range(3)][-1]
+
+    assert result["prescored"] == "no_speech"
+    convert.scorer.open_stream.assert_called_once_with("Lumos")
+    stats = prescorer.stats()
+    assert stats["rejected"]["no_speech"] == 1
+    assert stats["rejected_after_open"] == 1
+    assert stats["calls_avoided"] == 0
+
+
+def test_stream_through_the_local_scorer(client, monkeypatch):
+    from ..scorers import LocalScorer
+
+    local = LocalScorer(latency="fixed:0")
+    monkeypatch.setattr(convert, "scorer", local)
+    monkeypatch.setattr(convert, "trimmer", VoiceTrimmer())
+    monkeypatch.setattr(convert, "prescorer", PreScorer(enabled=False))
+    monkeypatch.setattr(convert, "audio_store", None)
+    clip = speech(seconds=0.8, pause=1.0)
+
+    with client.websocket_connect("/ws/assess") as ws:
+        ws.send_json({"spell": "Lumos"})
+        send_chunks(ws, clip, chunk=1000)
+        events = [ws.receive_json() for _ in range(3)]
+
+    streamed = events[-1]
+    assert streamed["event"] == "result"
+    assert streamed["success"] is True
+    assert local.stats()["calls"] == 1
+
+
+def test_assess_batch_scores_each_clip_in_order(client, mock_dependencies):
+    mock_store, mock_convert, mock_assess = mock_dependencies
+    mock_convert.side_effect = lambda data: np.frombuffer(data, dtype=np.int16)
+    mock_assess.side_effect = lambda spell, pcm: {
+        "success": True, "accuracy_score": float(len(pcm)), "grade": "O", "reference_text": spell
+    }
+
+    files = [
+        ("audio", ("a.webm", BytesIO(b"\x01\x00" * 10), "audio/webm")),
+        ("audio", ("b.webm", BytesIO(b"\x01\x00" * 20), "audio/webm")),
+    ]
+    response = client.post("/assess/batch", files=files, data={"spell": ["Lumos", "Nox"]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["scored"] == 2
+    assert [(r["reference_text"], r["accuracy_score"]) for r in body["results"]] == [
+        ("Lumos", 10.0), ("Nox", 20.0)
+    ]
+    assert mock_store.save_audio.call_count == 2
+
+
+def test_assess_batch_reports_a_failed_clip_without_failing_the_rest(client, mock_dependencies):
+    _, mock_convert, mock_assess = mock_dependencies
+
+    def decode(data):
+        if data == b"bad":
+            raise RuntimeError("bad container")
+        return np.ones(160, dtype=np.int16)
+
+    mock_convert.side_effect = decode
+    mock_assess.return_value = {"success": True, "accuracy_score": 80.0, "grade": "O"}
+
+    files = [
+        ("audio", ("a.webm", BytesIO(b"good"), "audio/webm")),
+        ("audio", ("b.webm", BytesIO(b"bad"), "audio/webm")),
+    ]
+    response = client.post("/assess/batch", files=files, data={"spell": "Lumos"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["success"] is True
+    assert results[1] == {"success": False, "error": "bad container"}
+
+
+def test_assess_batch_validates_spells_and_size(client, mock_dependencies, monkeypatch):
+    files = [("audio", (f"{i}.webm", BytesIO(b"x"), "audio/webm")) for i in range(3)]
+    response = client.post("/assess/batch", files=files, data={"spell": ["Lumos", "Nox"]})
+    assert response.status_code == 422
+
+    monkeypatch.setattr(convert, "BATCH_MAX_CLIPS", 2)
+    files = [("audio", (f"{i}.webm", BytesIO(b"x"), "audio/webm")) for i in range(3)]
+    response = client.post("/assess/batch", files=files, data={"spell": "Lumos"})
+    assert response.status_code == 413
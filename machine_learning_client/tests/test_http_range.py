@@ -0,0 +1,34 @@
+import pytest
+
+from ..http_range import RangeNotSatisfiable, parse_range
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=500-5000", (500, 999)),
+        ("bytes=0-1,5-6", None),  # multi-range: send the whole thing
+        ("items=0-1", None),
+        ("bytes=abc", None),
+        ("bytes=9-3", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+@pytest.mark.parametrize("header", ["bytes=-100", "bytes=0-", "bytes=0-0"])
+def test_any_range_of_an_empty_resource_is_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 0)
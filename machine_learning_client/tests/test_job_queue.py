@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from ..job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWaiters, serialize_job
+
+
+def make_queue(**kwargs):
+    col = MagicMock()
+    col.update_one.return_value.modified_count = 1
+    return JobQueue(col, **kwargs), col
+
+
+def test_enqueue_stores_audio_and_indexes_once():
+    queue, col = make_queue()
+    first = queue.enqueue(b"webm", spell="Lumos", filename="a.webm", content_type="audio/webm", user="u1")
+    queue.enqueue(b"webm", spell="Nox", filename="b.webm", content_type="audio/webm")
+
+    doc = col.insert_one.call_args_list[0].args[0]
+    assert doc["_id"] == first
+    assert doc["status"] == QUEUED
+    assert bytes(doc["audio"]) == b"webm"
+    assert doc["user"] == "u1"
+    assert "user" not in col.insert_one.call_args_list[1].args[0]
+    assert col.create_index.call_count == 3
+    col.create_index.assert_any_call("expire_at", expireAfterSeconds=0)
+
+
+def test_claim_takes_queued_or_expired_lease_oldest_first():
+    queue, col = make_queue(lease_seconds=60)
+    before = datetime.now(tz=timezone.utc)
+    queue.claim()
+
+    query, update = col.find_one_and_update.call_args.args
+    kwargs = col.find_one_and_update.call_args.kwargs
+    assert {"status": QUEUED} in query["$or"]
+    expired = next(clause for clause in query["$or"] if clause["status"] == RUNNING)
+    assert expired["lease_until"]["$lt"] >= before
+    assert update["$set"]["status"] == RUNNING
+    assert update["$set"]["worker"] == queue.worker_id
+    assert update["$set"]["lease_until"] - update["$set"]["started_at"] == timedelta(seconds=60)
+    assert update["$inc"] == {"attempts": 1}
+    assert kwargs["sort"] == [("created_at", 1)]
+    assert kwargs["return_document"] == ReturnDocument.AFTER
+
+
+def test_finish_is_guarded_by_lease_and_drops_audio():
+    queue, col = make_queue(keep_seconds=10)
+    job_id = ObjectId()
+
+    assert queue.complete(job_id, {"grade": "O"}) is True
+    query, update = col.update_one.call_args.args
+    assert query == {"_id": job_id, "status": RUNNING, "worker": queue.worker_id}
+    assert update["$set"]["status"] == DONE
+    assert update["$set"]["result"] == {"grade": "O"}
+    assert update["$set"]["expire_at"] - update["$set"]["finished_at"] == timedelta(seconds=10)
+    assert "audio" in update["$unset"]
+
+    col.update_one.return_value.modified_count = 0  # lease was lost to another worker
+    assert queue.fail(job_id, "boom") is False
+    assert col.update_one.call_args.args[1]["$set"]["status"] == FAILED
+
+
+def test_release_requeues_without_using_an_attempt():
+    queue, col = make_queue()
+    queue.release(ObjectId())
+
+    update = col.update_one.call_args.args[1]
+    assert update["$set"] == {"status": QUEUED}
+    assert update["$inc"] == {"attempts": -1}
+
+
+def test_serialize_job_hides_audio_and_formats_dates():
+    job_id = ObjectId()
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    out = serialize_job({"_id": job_id, "status": DONE, "created_at": now, "result": {"grade": "O"}})
+
+    assert out == {
+        "job_id": str(job_id),
+        "status": DONE,
+        "created_at": now.isoformat(),
+        "result": {"grade": "O"},
+    }
+
+
+def test_waiters_wake_on_notify():
+    waiters = JobWaiters()
+
+    async def main():
+        waiters.acquire("j1")
+        event = waiters.event("j1")
+        asyncio.get_running_loop().call_later(0.01, waiters.notify, "j1")
+        await asyncio.wait_for(event.wait(), timeout=1)
+        waiters.release("j1")
+        return event.is_set()
+
+    assert asyncio.run(main()) is True
+    waiters.notify("unknown")  # nothing waiting is fine
+    assert waiters._events == {} and waiters._waiting == {}
+
+
+def test_waiters_keep_a_shared_event_until_the_last_one_leaves():
+    waiters = JobWaiters()
+    waiters.acquire("j1")
+    waiters.acquire("j1")
+    event = waiters.event("j1")
+
+    waiters.release("j1")
+    assert waiters.event("j1") is event
+
+    waiters.release("j1")
+    assert waiters._events == {} and waiters._waiting == {}
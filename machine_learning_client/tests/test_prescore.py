@@ -0,0 +1,155 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from ..prescore import MAX_LOCAL_SCORE, PreScorer, TemplateStore, speech_span
+from .test_acoustic import padded, tones
+
+GOOD = {"success": True, "accuracy_score": 92.0, "grade": "O"}
+
+
+def word(*freqs, seconds=0.15, seed=0):
+    return padded(tones(*freqs, seconds=seconds), seed=seed)
+
+
+LUMOS = (300, 900, 1500, 700)
+
+
+def trained(**kwargs):
+    prescorer = PreScorer(**kwargs)
+    for seed, seconds in enumerate((0.14, 0.15, 0.17)):
+        prescorer.learn("Lumos", word(*LUMOS, seconds=seconds, seed=seed), GOOD)
+    return prescorer
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for TemplateStore."""
+
+    def __init__(self):
+        self.docs = []
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+    def find(self, query, _projection=None):
+        cursor = MagicMock()
+        matches = [d for d in self.docs if d["spell"] == query["spell"]]
+        matches.sort(key=lambda d: d["created_at"], reverse=True)
+        cursor.sort.return_value.limit.side_effect = lambda n: matches[:n]
+        return cursor
+
+
+def test_speech_span_trims_the_pauses():
+    pcm = word(*LUMOS)
+    span = speech_span(pcm)
+    assert len(pcm) - len(span) == pytest.approx(2 * 0.3 * 16000, abs=800)
+    assert len(speech_span(np.zeros(8000, dtype=np.int16))) == 0
+
+
+def test_silence_is_graded_t_without_templates():
+    prescorer = PreScorer()
+    result = prescorer.check("Lumos", np.zeros(16000, dtype=np.int16))
+
+    assert result["success"] is True
+    assert result["grade"] == "T"
+    assert result["accuracy_score"] == 0.0
+    assert result["prescored"] == "no_speech"
+    assert result["reference_text"] == "Lumos"
+
+
+def test_speech_is_forwarded_until_the_spell_has_templates():
+    prescorer = PreScorer()
+    assert prescorer.check("Lumos", word(2500, 200)) is None
+    assert prescorer.stats()["forwarded"] == 1
+
+
+def test_plausible_attempts_are_forwarded():
+    prescorer = trained()
+    assert prescorer.check("Lumos", word(*LUMOS, seconds=0.16, seed=9)) is None
+    # Templates are per spell, case-insensitively
+    assert prescorer.check(" lumos", word(*LUMOS, seconds=0.13, seed=8)) is None
+
+
+def test_truncated_attempt_is_graded_locally():
+    result = trained().check("Lumos", word(300, seconds=0.15))
+    assert result["prescored"] == "too_short"
+    assert 0 < result["accuracy_score"] < MAX_LOCAL_SCORE
+    assert result["grade"] == "T"
+
+
+def test_wrong_words_are_graded_locally():
+    prescorer = trained()
+    result = prescorer.check("Lumos", word(2500, 200, 1200, 400))
+
+    assert result["prescored"] == "mismatch"
+    assert result["accuracy_score"] <= MAX_LOCAL_SCORE
+    stats = prescorer.stats()
+    assert stats["rejected"]["mismatch"] == 1
+    assert stats["calls_avoided"] == 1
+    assert stats["avoided_rate"] == 1.0
+
+
+def test_only_high_scores_become_templates():
+    prescorer = PreScorer(learn_min_score=80)
+    assert not prescorer.should_learn({"success": True, "accuracy_score": 79.0})
+    assert not prescorer.should_learn({"success": False})
+    assert not prescorer.should_learn({"success": True, "accuracy_score": 0, "prescored": "mismatch"})
+    assert prescorer.should_learn(GOOD)
+
+    prescorer.learn("Lumos", word(*LUMOS), {"success": True, "accuracy_score": 40.0})
+    assert prescorer.templates.get("Lumos") == []
+    prescorer.learn("Lumos", word(*LUMOS), GOOD)
+    assert len(prescorer.templates.get("Lumos")) == 1
+
+
+def test_disabled_prescorer_forwards_everything():
+    prescorer = PreScorer(enabled=False)
+    assert prescorer.check("Lumos", np.zeros(16000, dtype=np.int16)) is None
+    assert not prescorer.should_learn(GOOD)
+    assert prescorer.stats()["checked"] == 0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("PRESCORE_ENABLED", "0")
+    monkeypatch.setenv("PRESCORE_REJECT_FACTOR", "2.5")
+    monkeypatch.setenv("PRESCORE_TEMPLATES_PER_SPELL", "7")
+    prescorer = PreScorer.from_env()
+
+    assert prescorer.enabled is False
+    assert prescorer.reject_factor == 2.5
+    assert prescorer.templates.max_per_spell == 7
+
+
+def test_template_store_keeps_the_newest_per_spell():
+    store = TemplateStore(max_per_spell=2)
+    for value in range(3):
+        store.add("Lumos", np.full((4, 12), value))
+
+    assert [t[0, 0] for t in store.get("Lumos")] == [2, 1]
+    assert store.counts() == {"lumos": 2}
+
+
+def test_templates_are_shared_through_mongo():
+    col = FakeCollection()
+    TemplateStore(col).add("Lumos", np.arange(24, dtype=np.float32).reshape(2, 12))
+    assert col.docs[0]["spell"] == "lumos"
+    assert col.docs[0]["frames"] == 2
+
+    # Another replica reads them back, and re-reads once its copy is stale
+    other = TemplateStore(col, refresh_seconds=60)
+    (loaded,) = other.get("LUMOS", now=0)
+    np.testing.assert_array_equal(loaded, np.arange(24).reshape(2, 12))
+    TemplateStore(col).add("Lumos", np.zeros((3, 12), dtype=np.float32))
+    assert len(other.get("Lumos", now=30)) == 1
+    assert len(other.get("Lumos", now=61)) == 2
+
+
+def test_template_store_survives_mongo_errors():
+    col = MagicMock()
+    col.find.side_effect = RuntimeError("mongo down")
+    col.insert_one.side_effect = RuntimeError("mongo down")
+    store = TemplateStore(col)
+
+    store.add("Lumos", np.zeros((3, 12), dtype=np.float32))
+    assert len(store.get("Lumos", now=1e9)) == 1
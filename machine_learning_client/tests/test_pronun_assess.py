@@ -4,12 +4,31 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 import tempfile
 from unittest.mock import Mock, patch
+import numpy as np
 import pytest
 
 os.environ.setdefault("SPEECH_KEY", "test_key")
 os.environ.setdefault("SPEECH_REGION", "test_region")
 
-from ..pronun_assess import pronunciation_assessment, grade_from_score, convert_to_wav
+from .. import pronun_assess
+from ..speech_pool import RecognizerPool
+from ..pronun_assess import (
+    pronunciation_assessment,
+    grade_from_score,
+    convert_to_wav,
+    decode_to_pcm,
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pool(monkeypatch):
+    """No warm recognizers between tests, so each test sees its own mocks."""
+    monkeypatch.setattr(
+        pronun_assess,
+        "recognizer_pool",
+        RecognizerPool(pronun_assess._build_pooled_recognizer, size=0),
+    )
+    monkeypatch.setattr(pronun_assess, "_speech_configs", {})
 
 
 @pytest.mark.parametrize(
@@ -83,6 +102,73 @@ def test_pronunciation_assessment_success(mock_audio_config, mock_speech_config,
     assert result["grade"] == "O"
 
 
+@patch("machine_learning_client.pronun_assess.decode_pcm")
+def test_decode_to_pcm(mock_decode_pcm):
+    mock_decode_pcm.return_value = np.array([1, 2], dtype=np.int16)
+
+    pcm = decode_to_pcm(b"webm bytes")
+
+    assert pcm.tolist() == [1, 2]
+    mock_decode_pcm.assert_called_once_with(b"webm bytes", 16000)
+
+
+@patch("machine_learning_client.pronun_assess.speechsdk")
+@patch("machine_learning_client.pronun_assess.SpeechConfig")
+@patch("machine_learning_client.pronun_assess.AudioConfig")
+def test_pronunciation_assessment_from_pcm(mock_audio_config, mock_speech_config, mock_speechsdk):
+    mock_result = Mock()
+    mock_result.reason = mock_speechsdk.ResultReason.RecognizedSpeech
+    mock_result.text = "Lumos"
+    mock_assessment = Mock()
+    mock_assessment.accuracy_score = 75.0
+
+    mock_recognizer = Mock()
+    mock_recognizer.recognize_once.return_value = mock_result
+    mock_speechsdk.SpeechRecognizer.return_value = mock_recognizer
+    mock_speechsdk.PronunciationAssessmentResult.return_value = mock_assessment
+    push_stream = mock_speechsdk.audio.PushAudioInputStream.return_value
+
+    result = pronunciation_assessment("Lumos", b"\x00\x00" * 10)
+
+    assert result["success"] is True
+    push_stream.write.assert_called_once_with(b"\x00\x00" * 10)
+    push_stream.close.assert_called_once()
+    mock_audio_config.assert_called_once_with(stream=push_stream)
+
+    connection = mock_speechsdk.Connection.from_recognizer.return_value
+    connection.open.assert_called_once_with(False)
+
+    push_stream.reset_mock()
+    pronunciation_assessment("Lumos", np.array([1, -1], dtype=np.int16))
+    push_stream.write.assert_called_once_with(np.array([1, -1], dtype=np.int16).tobytes())
+    # SpeechConfig is built once and reused
+    mock_speech_config.assert_called_once()
+
+
+@patch("machine_learning_client.pronun_assess.speechsdk")
+@patch("machine_learning_client.pronun_assess.SpeechConfig")
+@patch("machine_learning_client.pronun_assess.AudioConfig")
+def test_pronunciation_assessment_reuses_warm_recognizer(
+    mock_audio_config, mock_speech_config, mock_speechsdk, monkeypatch
+):
+    pool = RecognizerPool(pronun_assess._build_pooled_recognizer, size=1, background_refill=False)
+    monkeypatch.setattr(pronun_assess, "recognizer_pool", pool)
+    pool.warm("fake_region", "en-US")
+    monkeypatch.setattr(pronun_assess, "speech_region", "fake_region")
+
+    mock_result = Mock()
+    mock_result.reason = mock_speechsdk.ResultReason.RecognizedSpeech
+    mock_result.text = "Lumos"
+    mock_speechsdk.PronunciationAssessmentResult.return_value.accuracy_score = 90.0
+    mock_speechsdk.SpeechRecognizer.return_value.recognize_once.return_value = mock_result
+
+    pronunciation_assessment("Lumos", b"\x00\x00")
+    pronunciation_assessment("Lumos", b"\x00\x00")
+
+    assert pool.stats()["hits"] == 2
+    assert pool.stats()["misses"] == 0
+
+
 @patch("machine_learning_client.pronun_assess.speechsdk")
 @patch("machine_learning_client.pronun_assess.SpeechConfig")
 @patch("machine_learning_client.pronun_assess.AudioConfig")
@@ -157,3 +243,29 @@ def test_pronunciation_assessment_different_grades(
     assert result["grade"] == expected_grade
     assert result["grade_label"] == expected_label
     assert result["accuracy_score"] == score
+
+
+def test_speech_sdk_is_imported_lazily(monkeypatch):
+    import subprocess
+
+    code = (
+        "import sys; import machine_learning_client.pronun_assess; "
+        "print('azure.cognitiveservices.speech' in sys.modules, 'pydub' in sys.modules)"
+    )
+    env = dict(os.environ, SPEECH_KEY="k", SPEECH_REGION="r")
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parents[2],
+        env=env,
+    ).stdout.split()
+    assert out == ["False", "False"]
+
+    monkeypatch.setattr(pronun_assess, "speechsdk", None)
+    monkeypatch.setattr(pronun_assess, "SpeechConfig", None)
+    monkeypatch.setattr(pronun_assess, "AudioConfig", None)
+    sdk = pronun_assess.load_speech_sdk()
+    assert pronun_assess.speechsdk is sdk
+    assert pronun_assess.AudioConfig is sdk.audio.AudioConfig
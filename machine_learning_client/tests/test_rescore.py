@@ -0,0 +1,327 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from ..rescore import LeaseLostError, RescoreCheckpoint, Rescorer, format_report, rescore_update
+from ..vad import VoiceTrimmer
+
+
+def tone(seconds=1.0, freq=220):
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (np.sin(2 * np.pi * freq * t) * 8000).astype(np.int16)
+
+
+class FakeStore:
+    """In-memory stand-in for the AudioStore methods re-scoring uses."""
+
+    def __init__(self):
+        self.attempts = []
+        self.audio = {}
+        self.writes = []
+        self.stats = {}
+
+    def add(self, spell="Lumos", score=50.0, grade="E", pcm=None, user=None):
+        attempt = {"_id": ObjectId(), "spell": spell, "score": score, "grade": grade}
+        if user is not None:
+            attempt["user"] = user
+        if pcm is not None:
+            attempt["audio_file_id"] = ObjectId()
+            self.audio[attempt["audio_file_id"]] = pcm
+        self.attempts.append(attempt)
+        return attempt
+
+    def _matches(self, attempt, query):
+        for key, value in query.items():
+            if value == {"$exists": True}:
+                if key not in attempt:
+                    return False
+            elif value == {"$ne": None}:
+                if attempt.get(key) is None:
+                    return False
+            elif attempt.get(key) != value:
+                return False
+        return True
+
+    def last_attempt_id(self, query):
+        ids = [a["_id"] for a in self.attempts if self._matches(a, query)]
+        return max(ids) if ids else None
+
+    def scan_attempts(self, query, *, after=None, until=None, projection=None):
+        for attempt in sorted(self.attempts, key=lambda a: a["_id"]):
+            if after is not None and attempt["_id"] <= after:
+                continue
+            if until is not None and attempt["_id"] > until:
+                continue
+            if self._matches(attempt, query):
+                yield dict(attempt)
+
+    def open_audio(self, file_id):
+        return self.audio[file_id]
+
+    def iter_audio(self, grid_out):
+        yield grid_out.tobytes()
+
+    def update_attempts(self, updates):
+        self.writes.append(updates)
+        by_id = {a["_id"]: a for a in self.attempts}
+        for attempt_id, update in updates:
+            attempt = by_id[attempt_id]
+            if isinstance(update, list):
+                attempt.setdefault("previous", {"score": attempt.get("score"), "grade": attempt.get("grade")})
+                attempt.update(update[1]["$set"])
+                attempt.pop("rescore_error", None)
+            else:
+                attempt.update(update["$set"])
+        return len(updates)
+
+    def mark_stats_stale(self, pairs):
+        for pair in pairs:
+            self.stats.setdefault(pair, {})["stale"] = True
+        return len(pairs)
+
+    def stale_stats(self):
+        return (pair for pair, doc in self.stats.items() if doc.get("stale"))
+
+    def rebuild_stats(self, user, spell):
+        mine = [a for a in self.attempts if (a.get("user"), a["spell"]) == (user, spell)]
+        self.stats[(user, spell)] = {
+            "attempts": len(mine),
+            "grades": dict(Counter(a["grade"] for a in mine if a.get("grade"))),
+        }
+        return len(mine)
+
+
+class FakeCheckpoints:
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = dict(doc, _id=query["_id"])
+
+    def update_one(self, query, update):
+        self.docs[query["_id"]].update(update["$set"])
+
+
+class ScoreByLength:
+    """Scores a clip by its length, so results are predictable."""
+
+    def __init__(self):
+        self.calls = []
+
+    def score(self, reference_text, pcm):
+        self.calls.append((reference_text, len(pcm)))
+        score = min(100.0, len(pcm) / 160.0)
+        return {"success": True, "accuracy_score": score, "recognized_text": reference_text,
+                "grade": "O" if score >= 70 else "T"}
+
+
+def decode(data):
+    return np.frombuffer(data, dtype=np.int16)
+
+
+def test_regrade_only_writes_attempts_whose_grade_changed():
+    store = FakeStore()
+    same = store.add(score=85.0, grade="O")
+    moved = store.add(score=35.0, grade="E")
+    store.add(score=None, grade=None)
+
+    report = Rescorer(store).run("regrade", run="r1")
+
+    assert report["scanned"] == 2
+    assert report["changed"] == 1
+    assert report["written"] == 1
+    assert moved["grade"] == "A"
+    assert moved["previous"] == {"score": 35.0, "grade": "E"}
+    assert "previous" not in same
+    assert report["grades_before"] == {"O": 1, "E": 1}
+    assert report["grades_after"] == {"O": 1, "A": 1}
+
+
+def test_regrade_rebuilds_the_stats_the_dashboard_reads():
+    store = FakeStore()
+    store.add(score=85.0, grade="O", user="harry")
+    store.add(score=35.0, grade="E", user="harry")
+    store.add(score=35.0, grade="E", user="ron", spell="Nox")
+    store.add(score=35.0, grade="E")  # anonymous: no stats
+    for pair in [("harry", "Lumos"), ("ron", "Nox")]:
+        store.rebuild_stats(*pair)
+    assert store.stats[("harry", "Lumos")]["grades"] == {"O": 1, "E": 1}
+
+    report = Rescorer(store, batch_size=2).run("regrade")
+
+    assert report["stats_rebuilt"] == 2
+    assert store.stats[("harry", "Lumos")] == {"attempts": 2, "grades": {"O": 1, "A": 1}}
+    assert store.stats[("ron", "Nox")] == {"attempts": 1, "grades": {"A": 1}}
+    assert "stats rebuilt" in format_report(report)
+
+
+def test_stats_left_stale_by_an_interrupted_run_are_rebuilt_by_the_next():
+    store = FakeStore()
+    store.add(score=35.0, grade="E", user="harry")
+    store.mark_stats_stale([("harry", "Lumos")])
+    store.attempts[0]["grade"] = "A"  # written before the run stopped
+
+    report = Rescorer(store).run("regrade")
+
+    assert report["changed"] == 0
+    assert report["stats_rebuilt"] == 1
+    assert store.stats[("harry", "Lumos")]["grades"] == {"A": 1}
+
+
+def test_rescore_decodes_scores_and_bulk_writes_per_batch():
+    store = FakeStore()
+    for seconds in (1.0, 0.2, 0.5):
+        store.add(pcm=tone(seconds))
+    store.add()  # audio already expired: skipped
+    scorer = ScoreByLength()
+
+    report = Rescorer(store, scorer, decode=decode, batch_size=2, concurrency=2).run("rescore")
+
+    assert report["scanned"] == 3
+    assert report["rescored"] == 3
+    assert len(store.writes) == 2
+    assert [a.get("grade") for a in store.attempts] == ["O", "T", "T", "E"]
+    assert store.attempts[0]["score"] == 100.0
+    assert store.attempts[0]["transcript"] == "Lumos"
+    assert store.attempts[0]["previous"] == {"score": 50.0, "grade": "E"}
+    assert report["audio_seconds"] == pytest.approx(1.7)
+    assert report["attempts_per_second"] > 0
+    assert report["score_p50_ms"] is not None
+
+
+def test_rescore_on_a_process_pool():
+    store = FakeStore()
+    store.add(pcm=tone(0.5))
+
+    report = Rescorer(store, ScoreByLength(), decode=decode, workers=1).run("rescore")
+
+    assert report["rescored"] == 1
+
+
+def test_rescore_records_failures_without_touching_scores():
+    store = FakeStore()
+    store.add(pcm=tone(1.0))
+    silent = store.add(pcm=np.zeros(16000, dtype=np.int16))
+    broken = store.add(pcm=tone(2.0))
+
+    class Flaky(ScoreByLength):
+        # Clips are trimmed concurrently, so pick the broken one by length
+        # rather than by the order its score call arrives in
+        def score(self, reference_text, pcm):
+            if len(pcm) > 1.5 * 16000:
+                return {"success": False, "error": "Azure timed out"}
+            return super().score(reference_text, pcm)
+
+    rescorer = Rescorer(store, Flaky(), trimmer=VoiceTrimmer(), decode=decode, concurrency=1)
+    report = rescorer.run("rescore")
+
+    assert (report["rescored"], report["failed"], report["no_speech"]) == (1, 1, 1)
+    assert silent["score"] == 50.0 and "No speech" in silent["rescore_error"]
+    assert broken["score"] == 50.0 and broken["rescore_error"] == "Azure timed out"
+
+
+def test_rescore_resumes_from_checkpoint():
+    store = FakeStore()
+    for _ in range(5):
+        store.add(pcm=tone(0.5))
+    checkpoints = FakeCheckpoints()
+    scorer = ScoreByLength()
+    rescorer = Rescorer(store, scorer, decode=decode, batch_size=2)
+
+    first = rescorer.run("rescore", run="r1", checkpoint=RescoreCheckpoint(checkpoints, "r1"), limit=2)
+    saved = checkpoints.docs["r1"]
+    assert first["scanned"] == 2
+    assert saved["last_id"] == store.attempts[1]["_id"]
+    assert saved["finished_at"] is None
+
+    # Attempts recorded after the run started are not part of it
+    store.add(pcm=tone(0.5))
+    second = rescorer.run("rescore", run="r1", checkpoint=RescoreCheckpoint(checkpoints, "r1"))
+
+    assert second["resumed"] is True
+    assert second["scanned"] == 3
+    assert len(scorer.calls) == 5
+    assert "rescore_run" not in store.attempts[-1]
+    assert checkpoints.docs["r1"]["totals"]["scanned"] == 5
+    assert checkpoints.docs["r1"]["finished_at"] is not None
+
+
+def test_run_stops_once_its_lease_is_taken_over():
+    store = FakeStore()
+    for _ in range(4):
+        store.add(pcm=tone(0.5))
+    checkpoints = FakeCheckpoints()
+
+    class Lease:
+        renewals = 0
+
+        def acquire(self):
+            self.renewals += 1
+            return self.renewals < 2
+
+    lease = Lease()
+    rescorer = Rescorer(store, ScoreByLength(), decode=decode, batch_size=1, concurrency=1, lease=lease)
+    with pytest.raises(LeaseLostError):
+        rescorer.run("rescore", run="r1", checkpoint=RescoreCheckpoint(checkpoints, "r1"))
+
+    assert lease.renewals == 2
+    assert len(store.writes) == 2
+    assert checkpoints.docs["r1"]["last_id"] == store.attempts[1]["_id"]
+    assert checkpoints.docs["r1"]["finished_at"] is None
+
+
+def test_rescore_trims_off_the_event_loop():
+    store = FakeStore()
+    store.add(pcm=tone(1.0))
+    trimmed_on = []
+
+    class Trimmer(VoiceTrimmer):
+        def trim(self, spell, pcm):
+            trimmed_on.append(threading.current_thread())
+            return super().trim(spell, pcm)
+
+    Rescorer(store, ScoreByLength(), trimmer=Trimmer(), decode=decode).run("rescore")
+
+    assert trimmed_on and threading.main_thread() not in trimmed_on
+
+
+def test_resuming_with_a_different_scope_is_refused():
+    store = FakeStore()
+    store.add(pcm=tone(0.5))
+    checkpoints = FakeCheckpoints()
+    rescorer = Rescorer(store, ScoreByLength(), decode=decode)
+    rescorer.run("rescore", run="r1", checkpoint=RescoreCheckpoint(checkpoints, "r1"))
+
+    with pytest.raises(ValueError, match="pick another run name"):
+        rescorer.run("rescore", run="r1", spell="Nox", checkpoint=RescoreCheckpoint(checkpoints, "r1"))
+
+
+def test_dry_run_writes_nothing():
+    store = FakeStore()
+    store.add(pcm=tone(1.0), user="harry")
+    checkpoints = FakeCheckpoints()
+
+    report = Rescorer(store, ScoreByLength(), decode=decode).run(
+        "rescore", checkpoint=RescoreCheckpoint(checkpoints, "r1"), dry_run=True
+    )
+
+    assert report["rescored"] == 1 and report["written"] == 0
+    assert store.writes == [] and checkpoints.docs == {} and store.stats == {}
+    assert format_report(report).startswith("[dry run] rescore run")
+
+
+def test_rescore_update_keeps_first_previous_score():
+    pipeline = rescore_update({"accuracy_score": 72.0, "grade": "O"}, "r1")
+
+    assert pipeline[0] == {
+        "$set": {"previous": {"$ifNull": ["$previous", {"score": "$score", "grade": "$grade"}]}}
+    }
+    assert pipeline[1]["$set"]["score"] == 72.0
+    assert pipeline[1]["$set"]["rescore_run"] == "r1"
+    assert pipeline[2] == {"$unset": ["rescore_error"]}
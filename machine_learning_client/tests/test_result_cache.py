@@ -0,0 +1,100 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from ..result_cache import ResultCache, cache_key
+
+OK = {"success": True, "accuracy_score": 72.0, "grade": "O"}
+
+
+def test_cache_key_depends_on_audio_and_spell():
+    pcm = np.arange(100, dtype=np.int16)
+
+    assert cache_key(pcm, "Lumos") == cache_key(pcm.copy(), "Lumos")
+    assert cache_key(pcm, "Lumos") == cache_key(pcm, " lumos ")
+    assert cache_key(pcm, "Lumos") != cache_key(pcm, "Nox")
+    assert cache_key(pcm, "Lumos") != cache_key(pcm[:-1], "Lumos")
+    assert cache_key(pcm, "Lumos") == cache_key(pcm.tobytes(), "Lumos")
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = ResultCache(max_entries=2)
+    cache.put_local("a", OK)
+    cache.put_local("b", OK)
+    cache.get_local("a")  # a is now most recent
+    cache.put_local("c", OK)
+
+    assert cache.get_local("b") is None
+    assert cache.get_local("a") == OK
+    assert cache.get_local("c") == OK
+    assert cache.stats()["entries"] == 2
+
+
+def test_returned_results_are_copies():
+    cache = ResultCache()
+    cache.put_local("a", OK)
+    cache.get_local("a")["file_id"] = "mutated"
+
+    assert "file_id" not in cache.get_local("a")
+
+
+def test_unsuccessful_results_are_not_cached():
+    col = MagicMock()
+    cache = ResultCache(col)
+    cache.put_local("a", {"success": False})
+    cache.put_persistent("a", {"success": False})
+
+    assert cache.get_local("a") is None
+    col.replace_one.assert_not_called()
+
+
+def test_persistent_tier_creates_ttl_index_and_upserts():
+    col = MagicMock()
+    cache = ResultCache(col, ttl_seconds=3600)
+
+    cache.put_persistent("k", OK)
+    cache.put_persistent("k", OK)
+
+    col.create_index.assert_called_once_with("created_at", expireAfterSeconds=3600)
+    args, kwargs = col.replace_one.call_args
+    assert args[0] == {"_id": "k"}
+    assert args[1]["result"] == OK
+    assert kwargs == {"upsert": True}
+
+
+def test_persistent_hit_is_promoted_to_memory():
+    col = MagicMock()
+    col.find_one.return_value = {"_id": "k", "result": OK}
+    cache = ResultCache(col)
+
+    assert cache.get_local("k") is None
+    assert cache.get_persistent("k") == OK
+    assert cache.get_local("k") == OK
+    stats = cache.stats()
+    assert stats["persistent_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 0
+    assert stats["hit_rate"] == 1.0
+
+
+def test_persistent_miss_and_write_errors():
+    col = MagicMock()
+    col.find_one.return_value = None
+    col.replace_one.side_effect = RuntimeError("mongo down")
+    cache = ResultCache(col)
+
+    assert cache.get_persistent("k") is None
+    cache.put_persistent("k", OK)  # logged, not raised
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_SIZE", "5")
+    monkeypatch.setenv("RESULT_CACHE_TTL", "60")
+
+    cache = ResultCache.from_env()
+
+    assert cache.max_entries == 5
+    assert cache.ttl_seconds == 60
+    assert not cache.has_persistent_tier
@@ -0,0 +1,166 @@
+import os
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("SPEECH_KEY", "test_key")
+os.environ.setdefault("SPEECH_REGION", "test_region")
+
+from .. import convert, pronun_assess
+from ..result_cache import ResultCache
+from ..scorers import AzureScorer, BufferedStream, LocalScorer, Scorer, parse_latency, scorer_from_env
+
+
+def tone(seconds=1.0, amplitude=8000, freq=220.0):
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def make_local(**kwargs):
+    slept = []
+    scorer = LocalScorer(sleep=slept.append, **kwargs)
+    return scorer, slept
+
+
+def test_parse_latency_specs():
+    assert parse_latency("fixed:250")(0.9) == 0.25
+    assert parse_latency("uniform:100,300")(0.5) == pytest.approx(0.2)
+    assert parse_latency("normal:100,1000")(0.001) == 0.0
+    lognormal = parse_latency("lognormal:400,0.5")
+    assert lognormal(0.5) == pytest.approx(0.4)
+    assert lognormal(0.99) > 0.4 > lognormal(0.01)
+    for bad in ("fixed", "gamma:1,2", "uniform:1", "fixed:x"):
+        with pytest.raises(ValueError):
+            parse_latency(bad)
+
+
+def test_local_scorer_is_deterministic_and_azure_shaped():
+    scorer, slept = make_local(latency="uniform:100,500")
+    first = scorer.score("Lumos", tone())
+    assert scorer.score("Lumos", tone()) == first
+    assert slept[0] == slept[1] and 0.1 <= slept[0] <= 0.5
+    assert first["success"] is True
+    assert 0 <= first["accuracy_score"] <= 100
+    assert first["grade"] == pronun_assess.grade_from_score(first["accuracy_score"])["grade"]
+    assert {"recognized_text", "reference_text", "grade_label"} <= first.keys()
+    # Another spell (or clip) gets its own score
+    others = {scorer.score(f"Spell {i}", tone())["accuracy_score"] for i in range(20)}
+    assert len(others) > 10
+
+
+def test_local_scorer_score_distribution_centres_on_mean():
+    scorer, _ = make_local(mean_score=60)
+    scores = [scorer.score(f"Spell {i}", tone())["accuracy_score"] for i in range(400)]
+    assert 55 < np.mean(scores) < 65
+    assert min(scores) < 30 and max(scores) > 85
+
+
+def test_local_scorer_simulates_silence_and_failures():
+    scorer, _ = make_local(failure_rate=0.3, no_match_rate=0.1)
+    assert scorer.score("Lumos", np.zeros(16000, dtype=np.int16))["success"] is False
+
+    results = [scorer.score(f"Spell {i}", tone()) for i in range(1000)]
+    failed = sum(1 for r in results if r.get("error", "").startswith("Recognition canceled"))
+    no_match = sum(1 for r in results if r.get("error", "").startswith("No speech"))
+    assert 250 < failed < 350
+    assert 60 < no_match < 140
+    stats = scorer.stats()
+    assert stats["backend"] == "local"
+    assert stats["calls"] == 1001
+    assert stats["failures"] == failed
+
+
+def test_local_stream_scores_like_the_whole_clip():
+    scorer, slept = make_local(latency="uniform:100,500")
+    clip = tone(seconds=1.3)
+    stream = scorer.open_stream("Lumos")
+    for i in range(0, len(clip), 1000):
+        stream.write(clip[i:i + 1000])
+    stream.close()
+
+    assert not stream.incremental
+    assert stream.result() == scorer.score("Lumos", clip)
+    assert slept[0] == slept[1]
+    silent = scorer.open_stream("Lumos")
+    silent.write(np.zeros(8000, dtype=np.int16))
+    assert silent.result()["success"] is False
+
+
+def test_default_stream_buffers_until_closed():
+    class Fixed(Scorer):
+        def score(self, reference_text, pcm):
+            return {"text": reference_text, "samples": len(pcm)}
+
+    stream = Fixed().open_stream("Lumos")
+    assert isinstance(stream, BufferedStream)
+    stream.write(tone(seconds=0.5))
+    stream.write(tone(seconds=0.25))
+    stream.close()
+    assert stream.result() == {"text": "Lumos", "samples": 12000}
+
+
+def test_azure_stream_feeds_the_push_stream(monkeypatch):
+    acquired = Mock()
+    monkeypatch.setattr(pronun_assess, "load_speech_sdk", Mock())
+    monkeypatch.setattr(pronun_assess, "speechsdk", Mock())
+    monkeypatch.setattr(pronun_assess, "recognizer_pool", Mock(acquire=Mock(return_value=acquired)))
+    monkeypatch.setattr(pronun_assess, "_assessment_result", lambda text, result: {"text": text})
+
+    stream = AzureScorer().open_stream("Lumos")
+    stream.write(np.array([1, -1], dtype=np.int16))
+    stream.close()
+
+    assert stream.incremental
+    acquired.push_stream.write.assert_called_once_with(b"\x01\x00\xff\xff")
+    acquired.push_stream.close.assert_called_once()
+    assert stream.result() == {"text": "Lumos"}
+    pronun_assess.recognizer_pool.release.assert_called_once_with(acquired)
+
+
+def test_scorer_from_env(monkeypatch):
+    monkeypatch.setenv("SCORER_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_SCORER_LATENCY", "fixed:5")
+    monkeypatch.setenv("LOCAL_SCORER_FAILURE_RATE", "0.25")
+    scorer = scorer_from_env()
+    assert isinstance(scorer, LocalScorer)
+    assert scorer.failure_rate == 0.25
+    assert isinstance(scorer_from_env("azure"), AzureScorer)
+    with pytest.raises(ValueError):
+        scorer_from_env("whisper")
+
+
+def test_scorer_from_env_falls_back_to_local_without_credentials(monkeypatch, capsys):
+    monkeypatch.delenv("SCORER_BACKEND", raising=False)
+    monkeypatch.setattr(pronun_assess, "api_key", None)
+    assert isinstance(scorer_from_env(), LocalScorer)
+    assert "using the local scorer" in capsys.readouterr().out
+    with pytest.raises(RuntimeError):
+        scorer_from_env("azure")
+
+
+def test_azure_scorer_needs_credentials(monkeypatch):
+    monkeypatch.setattr(pronun_assess, "api_key", None)
+    with pytest.raises(RuntimeError):
+        AzureScorer()
+
+
+def test_full_path_offline_with_local_scorer(monkeypatch):
+    pytest.importorskip("av")
+    from .test_audio_decode import _encode
+
+    monkeypatch.setattr(convert, "scorer", LocalScorer(latency="fixed:1"))
+    monkeypatch.setattr(convert, "audio_store", None)
+    monkeypatch.setattr(convert, "result_cache", ResultCache())
+    clip = _encode("webm", "libopus", seconds=1.0)
+
+    response = TestClient(convert.app).post(
+        "/assess", files={"audio": ("a.webm", clip, "audio/webm")}, data={"spell": "Lumos"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["grade"] in "OEAT"
+    assert body["cached"] is False
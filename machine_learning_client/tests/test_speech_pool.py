@@ -0,0 +1,110 @@
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from ..speech_pool import PooledRecognizer, RecognizerPool
+
+
+@pytest.fixture
+def factory():
+    def build(region, language):
+        return PooledRecognizer((region, language), Mock(), Mock(), connection=Mock())
+
+    return Mock(side_effect=build)
+
+
+def test_first_acquire_is_a_miss_then_hits_after_refill(factory):
+    pool = RecognizerPool(factory, size=1, background_refill=False)
+
+    first = pool.acquire("eastus", "en-US")
+    pool.release(first)
+    second = pool.acquire("eastus", "en-US")
+
+    assert second is not first
+    stats = pool.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.5
+    first.connection.close.assert_called_once()
+
+
+def test_pool_is_bounded_per_key(factory):
+    pool = RecognizerPool(factory, size=2, background_refill=False)
+    pool.warm("eastus", "en-US")
+    pool.warm("eastus", "en-US")
+    pool.warm("westus", "en-GB")
+
+    assert pool.stats()["idle"] == {"eastus/en-US": 2, "westus/en-GB": 2}
+    assert factory.call_count == 4
+
+
+def test_unhealthy_and_stale_recognizers_are_evicted(factory):
+    pool = RecognizerPool(factory, size=2, max_idle=30, background_refill=False)
+    pool.warm("eastus", "en-US")
+    disconnected, expired = list(pool._idle[("eastus", "en-US")])
+    disconnected.mark_unhealthy()
+    expired.idle_since = time.monotonic() - 60
+
+    slot = pool.acquire("eastus", "en-US")
+
+    assert slot not in (disconnected, expired)
+    assert pool.stats()["evictions"] == 2
+    assert pool.stats()["misses"] == 1
+    disconnected.connection.close.assert_called_once()
+
+
+def test_size_zero_disables_pooling(factory):
+    pool = RecognizerPool(factory, size=0)
+    pool.release(pool.acquire("eastus", "en-US"))
+    pool.acquire("eastus", "en-US")
+
+    assert factory.call_count == 2
+    assert pool.stats()["idle"] == {"eastus/en-US": 0}
+
+
+def test_factory_failures_are_counted_not_raised(factory):
+    pool = RecognizerPool(factory, size=1, background_refill=False)
+    factory.side_effect = RuntimeError("handshake failed")
+
+    pool.warm("eastus", "en-US")
+
+    assert pool.stats()["failures"] == 1
+
+
+def test_close_drops_idle_recognizers(factory):
+    pool = RecognizerPool(factory, size=1, background_refill=False)
+    pool.warm("eastus", "en-US")
+    (slot,) = pool._idle[("eastus", "en-US")]
+
+    pool.close()
+
+    slot.connection.close.assert_called_once()
+    assert pool.stats()["idle"] == {}
+
+
+def test_max_idle_counts_from_when_the_slot_went_idle(factory):
+    pool = RecognizerPool(factory, size=1, max_idle=30, background_refill=False)
+    pool.warm("eastus", "en-US")
+    (slot,) = pool._idle[("eastus", "en-US")]
+    # Built long ago but only just pooled: still fresh
+    slot.created_at = time.monotonic() - 600
+
+    assert pool.acquire("eastus", "en-US") is slot
+    assert pool.stats()["evictions"] == 0
+
+
+def test_sweep_replaces_stale_idle_recognizers(factory):
+    pool = RecognizerPool(factory, size=2, max_idle=30, background_refill=False)
+    pool.warm("eastus", "en-US")
+    kept, expired = list(pool._idle[("eastus", "en-US")])
+    expired.idle_since = time.monotonic() - 60
+
+    assert pool.sweep() == 1
+
+    idle = list(pool._idle[("eastus", "en-US")])
+    assert len(idle) == 2 and kept in idle and expired not in idle
+    expired.connection.close.assert_called_once()
+    # Nothing was acquired, so the next request is still a hit
+    pool.acquire("eastus", "en-US")
+    assert pool.stats()["misses"] == 0
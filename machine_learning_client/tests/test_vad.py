@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from ..vad import NoSpeechError, VoiceTrimmer, max_utterance_seconds
+from .test_acoustic import padded, tones
+
+
+def test_max_utterance_grows_with_the_spell_and_is_bounded():
+    assert max_utterance_seconds("Nox") == pytest.approx(1.75)
+    assert max_utterance_seconds("Expecto Patronum") == pytest.approx(1.0 + 0.25 * 15)
+    assert max_utterance_seconds("x" * 200) == 15.0
+
+
+def test_trim_keeps_the_speech_plus_padding_as_a_view():
+    pcm = padded(tones(300, 900, seconds=0.25), seconds=1.0)
+    kept, report = VoiceTrimmer(pad_seconds=0.1).trim("Lumos", pcm)
+
+    assert len(kept) / 16000 == pytest.approx(0.7, abs=0.05)
+    assert np.shares_memory(kept, pcm)
+    assert report["input_seconds"] == 2.5
+    assert report["scored_seconds"] == round(len(kept) / 16000, 3)
+    assert report["seconds_saved"] == pytest.approx(1.8, abs=0.05)
+    assert report["bytes_saved"] == pcm.nbytes - kept.nbytes
+    assert report["capped"] is False
+
+
+def test_padding_never_runs_past_the_clip():
+    pcm = tones(300, seconds=0.5)
+    kept, report = VoiceTrimmer(pad_seconds=0.5).trim("Lumos", pcm)
+    assert len(kept) == len(pcm)
+    assert report["seconds_saved"] == 0.0
+
+
+def test_long_speech_is_capped():
+    pcm = padded(tones(300, 500, seconds=3.0))
+    trimmer = VoiceTrimmer(pad_seconds=0)
+    kept, report = trimmer.trim("Nox", pcm)
+
+    assert len(kept) == int(1.75 * 16000)
+    assert report["capped"] is True
+    assert trimmer.stats()["capped"] == 1
+
+
+@pytest.mark.parametrize(
+    "pcm",
+    [
+        np.zeros(0, dtype=np.int16),
+        np.zeros(16000, dtype=np.int16),
+        np.random.default_rng(0).normal(0, 100, 16000).astype(np.int16),
+    ],
+)
+def test_clips_without_speech_are_rejected(pcm):
+    trimmer = VoiceTrimmer()
+    with pytest.raises(NoSpeechError, match="No speech detected"):
+        trimmer.trim("Lumos", pcm)
+    assert trimmer.stats()["rejected_no_speech"] == 1
+
+
+def test_disabled_trimmer_passes_clips_through():
+    pcm = np.zeros(16000, dtype=np.int16)
+    kept, report = VoiceTrimmer(enabled=False).trim("Lumos", pcm)
+    assert kept is pcm
+    assert report is None
+
+
+def test_stats_total_the_savings():
+    trimmer = VoiceTrimmer(pad_seconds=0)
+    for _ in range(2):
+        trimmer.trim("Lumos", padded(tones(300, seconds=0.5), seconds=0.5))
+
+    stats = trimmer.stats()
+    assert stats["trimmed"] == 2
+    assert stats["seconds_saved"] == pytest.approx(2.0, abs=0.1)
+    assert stats["bytes_saved"] == pytest.approx(2 * 16000 * stats["seconds_saved"], abs=32)
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("VAD_ENABLED", "false")
+    monkeypatch.setenv("VAD_SECONDS_PER_LETTER", "0.5")
+    trimmer = VoiceTrimmer.from_env()
+    assert trimmer.enabled is False
+    assert trimmer.limit_for("Nox") == 2.5
+
+
+def stream(endpointer, pcm, chunk=1600):
+    """Feed `pcm` in chunks; return what was passed on and the sample count when speech ended."""
+    out, ended_at = [], None
+    for i in range(0, len(pcm), chunk):
+        out.append(endpointer.feed(pcm[i:i + chunk]))
+        if endpointer.ended and ended_at is None:
+            ended_at = i + chunk
+    return np.concatenate(out), ended_at
+
+
+def test_endpointer_passes_on_only_the_speech():
+    pcm = padded(tones(300, 900, seconds=0.3), seconds=1.5)
+    endpointer = VoiceTrimmer(pad_seconds=0.1, end_silence_seconds=0.5).endpointer("Lumos")
+    sent, ended_at = stream(endpointer, pcm)
+
+    assert endpointer.started and endpointer.ended
+    # Speech ended 0.5 s after it stopped, well before the recording did
+    assert ended_at / 16000 == pytest.approx(1.5 + 0.6 + 0.5, abs=0.1)
+    assert len(sent) / 16000 == pytest.approx(0.6 + 2 * 0.1, abs=0.06)
+    report = endpointer.report()
+    assert report["input_seconds"] == 3.6
+    assert report["bytes_saved"] == pcm.nbytes - sent.nbytes
+
+
+def test_endpointer_keeps_pauses_inside_the_speech():
+    word = tones(300, seconds=0.3)
+    pcm = padded(np.concatenate([word, np.zeros(4800, dtype=np.int16), word]), seconds=1.0)
+    endpointer = VoiceTrimmer(pad_seconds=0, end_silence_seconds=0.5).endpointer("Lumos")
+    sent, _ = stream(endpointer, pcm)
+
+    assert len(sent) / 16000 == pytest.approx(0.9, abs=0.05)
+
+
+def test_endpointer_caps_long_speech():
+    endpointer = VoiceTrimmer(pad_seconds=0).endpointer("Nox")
+    sent, ended_at = stream(endpointer, padded(tones(300, 500, seconds=2.0)))
+
+    assert len(sent) == int(1.75 * 16000)
+    assert endpointer.report()["capped"] is True
+    assert ended_at is not None
+
+
+def test_endpointer_finish_flushes_the_pad():
+    endpointer = VoiceTrimmer(pad_seconds=0.1).endpointer("Lumos")
+    sent, _ = stream(endpointer, padded(tones(300, seconds=0.5), seconds=0.3)[:-2400])
+    assert not endpointer.ended
+
+    tail = endpointer.finish()
+    assert endpointer.ended
+    assert len(tail) <= 1600
+    assert len(endpointer.feed(tones(300))) == 0
+
+
+def test_endpointer_gives_up_without_speech():
+    endpointer = VoiceTrimmer(no_speech_seconds=1.0).endpointer("Lumos")
+    endpointer.feed(np.zeros(8000, dtype=np.int16))
+    with pytest.raises(NoSpeechError):
+        endpointer.feed(np.zeros(8000, dtype=np.int16))
+    with pytest.raises(NoSpeechError):
+        VoiceTrimmer().endpointer("Lumos").finish()
+
+
+def test_endpointer_hears_speech_from_the_first_frame():
+    endpointer = VoiceTrimmer(pad_seconds=0).endpointer("Lumos")
+    sent, _ = stream(endpointer, np.concatenate([tones(300, seconds=0.5), np.zeros(16000, dtype=np.int16)]))
+    assert len(sent) / 16000 == pytest.approx(0.5, abs=0.03)
@@ -0,0 +1,286 @@
+"""
+Voice-activity trimming for decoded uploads.
+
+MediaRecorder clips usually start and end with a second or more of
+silence, and Azure bills every second it is sent. Before scoring, the
+decoded PCM is cut down to the speech plus a short margin either side.
+A clip with no speech is rejected with NoSpeechError rather than scored.
+Speech running past what the spell could plausibly need is capped.
+
+Streamed attempts get the same treatment as they arrive: SpeechEndpointer
+passes on only the speech and says when it has ended, so scoring can
+finish as soon as the user stops talking.
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .acoustic import FRAME_LENGTH, HOP_LENGTH, VOICED_FLOOR_DBFS, VOICED_RANGE_DB, voiced_bounds
+from .audio_decode import PCM_SAMPLE_RATE, pcm_duration
+
+
+class NoSpeechError(ValueError):
+    """The recording holds no speech to score."""
+
+
+def max_utterance_seconds(
+    spell: str, base: float = 1.0, per_letter: float = 0.25, ceiling: float = 15.0
+) -> float:
+    """
+    The longest speech worth scoring for a spell: `base` seconds plus
+    `per_letter` for each letter, which is generous for slow, careful
+    speech, and never more than `ceiling`.
+    """
+    letters = sum(1 for c in spell if c.isalpha())
+    return min(ceiling, base + per_letter * letters)
+
+
+def _report(received: int, kept: int, capped: bool, sample_rate: int) -> Dict[str, object]:
+    return {
+        "input_seconds": round(received / sample_rate, 3),
+        "scored_seconds": round(kept / sample_rate, 3),
+        "seconds_saved": round((received - kept) / sample_rate, 3),
+        "bytes_saved": (received - kept) * np.dtype(np.int16).itemsize,
+        "capped": capped,
+    }
+
+
+class VoiceTrimmer:
+    """Trim silence off decoded clips, reject empty ones and cap long ones."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        pad_seconds: float = 0.15,
+        base_seconds: float = 1.0,
+        seconds_per_letter: float = 0.25,
+        max_seconds: float = 15.0,
+        end_silence_seconds: float = 0.6,
+        no_speech_seconds: float = 5.0,
+        sample_rate: int = PCM_SAMPLE_RATE,
+    ):
+        self.enabled = enabled
+        self.pad_seconds = pad_seconds
+        self.base_seconds = base_seconds
+        self.seconds_per_letter = seconds_per_letter
+        self.max_seconds = max_seconds
+        self.end_silence_seconds = end_silence_seconds
+        self.no_speech_seconds = no_speech_seconds
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self.trimmed = 0
+        self.rejected = 0
+        self.capped = 0
+        self.seconds_saved = 0.0
+        self.bytes_saved = 0
+
+    @classmethod
+    def from_env(cls):
+        """Trimmer tuned by VAD_* variables; VAD_ENABLED=0 sends clips through untouched."""
+        return cls(
+            enabled=os.getenv("VAD_ENABLED", "1") not in ("0", "false", "no"),
+            pad_seconds=float(os.getenv("VAD_PAD_SECONDS", "0.15")),
+            base_seconds=float(os.getenv("VAD_BASE_SECONDS", "1.0")),
+            seconds_per_letter=float(os.getenv("VAD_SECONDS_PER_LETTER", "0.25")),
+            max_seconds=float(os.getenv("VAD_MAX_SECONDS", "15")),
+            end_silence_seconds=float(os.getenv("VAD_END_SILENCE_SECONDS", "0.6")),
+            no_speech_seconds=float(os.getenv("VAD_NO_SPEECH_SECONDS", "5")),
+        )
+
+    def limit_for(self, spell: str) -> float:
+        """Maximum seconds of speech scored for `spell`."""
+        return max_utterance_seconds(
+            spell, self.base_seconds, self.seconds_per_letter, self.max_seconds
+        )
+
+    def trim(self, spell: str, pcm: np.ndarray) -> Tuple[np.ndarray, Optional[Dict[str, object]]]:
+        """
+        (pcm to score, report). The result is a view into `pcm`, so nothing
+        is copied. The report gives the seconds and PCM bytes cut; it is
+        None when trimming is disabled. Raises NoSpeechError for a clip
+        with no speech in it.
+        """
+        if not self.enabled:
+            return pcm, None
+        first, end, _ = voiced_bounds(pcm) if len(pcm) else (0, 0, 0)
+        if end == 0:
+            self.reject()
+            raise NoSpeechError("No speech detected in the recording")
+
+        pad = int(self.pad_seconds * self.sample_rate)
+        start = max(0, first * HOP_LENGTH - pad)
+        stop = min(len(pcm), (end - 1) * HOP_LENGTH + FRAME_LENGTH + pad)
+        limit = int(self.limit_for(spell) * self.sample_rate)
+        capped = stop - start > limit
+        if capped:
+            stop = start + limit
+        kept = pcm[start:stop]
+        report = _report(len(pcm), len(kept), capped, self.sample_rate)
+        self.record(report)
+        return kept, report
+
+    def record(self, report: Dict[str, object]):
+        """Add one clip's report to the totals in stats()."""
+        with self._lock:
+            self.trimmed += 1
+            self.capped += bool(report["capped"])
+            self.seconds_saved += report["seconds_saved"]
+            self.bytes_saved += report["bytes_saved"]
+
+    def reject(self):
+        """Count a clip turned away for having no speech."""
+        with self._lock:
+            self.rejected += 1
+
+    def endpointer(self, spell: str) -> "SpeechEndpointer":
+        """An endpointer for a streamed attempt at `spell`, with this trimmer's settings."""
+        return SpeechEndpointer(
+            self.limit_for(spell),
+            pad_seconds=self.pad_seconds,
+            end_silence_seconds=self.end_silence_seconds,
+            no_speech_seconds=self.no_speech_seconds,
+            sample_rate=self.sample_rate,
+        )
+
+    def stats(self) -> Dict[str, object]:
+        """Totals across requests: audio not sent to the scorer, and clips rejected or capped."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "trimmed": self.trimmed,
+                "rejected_no_speech": self.rejected,
+                "capped": self.capped,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+# Streaming: a frame is speech when it is this far above the noise floor...
+SPEECH_MARGIN_DB = 10.0
+# ...or simply this loud, so speech from the very first frame still counts
+LOUD_DBFS = -30.0
+# How fast (dB per frame) the noise estimate may rise; it drops at once
+NOISE_RISE_DB = 0.02
+
+
+class SpeechEndpointer:
+    """
+    Follows live audio in 10 ms frames and finds where its speech starts
+    and ends. `feed` returns the audio to pass on to the scorer: nothing
+    until speech starts, then the speech itself. A pause inside the
+    speech is held back until more speech follows it. Once
+    `end_silence_seconds` of silence follows the speech (or the speech
+    reaches `max_seconds`), `ended` is set and only `pad_seconds` of that
+    silence is passed on.
+    """
+
+    def __init__(
+        self,
+        max_seconds: float,
+        *,
+        pad_seconds: float = 0.15,
+        end_silence_seconds: float = 0.6,
+        no_speech_seconds: float = 5.0,
+        start_frames: int = 3,
+        sample_rate: int = PCM_SAMPLE_RATE,
+    ):
+        self.sample_rate = sample_rate
+        self.max_samples = int(max_seconds * sample_rate)
+        self.pad_frames = max(0, int(pad_seconds * sample_rate / HOP_LENGTH))
+        self.end_frames = max(1, int(end_silence_seconds * sample_rate / HOP_LENGTH))
+        self.no_speech_samples = int(no_speech_seconds * sample_rate)
+        self.start_frames = start_frames
+        self.started = False
+        self.ended = False
+        self.capped = False
+        self.received = 0
+        self.kept = 0
+        self._partial = np.zeros(0, dtype=np.int16)
+        self._noise: Optional[float] = None
+        self._peak = -np.inf
+        self._run = 0
+        self._preroll: Deque[np.ndarray] = deque(maxlen=self.pad_frames + start_frames)
+        self._held: List[np.ndarray] = []
+
+    def _is_speech(self, frame: np.ndarray) -> bool:
+        samples = frame.astype(np.float64) / 32768.0
+        energy = 10.0 * np.log10(max(float(np.mean(samples * samples)), 1e-12))
+        if self._noise is None or energy < self._noise:
+            self._noise = energy
+        else:
+            self._noise += NOISE_RISE_DB
+        self._peak = max(self._peak, energy)
+        if energy < max(VOICED_FLOOR_DBFS, self._peak - VOICED_RANGE_DB):
+            return False
+        return energy >= self._noise + SPEECH_MARGIN_DB or energy >= LOUD_DBFS
+
+    def _emit(self, frames: List[np.ndarray], out: List[np.ndarray]):
+        for frame in frames:
+            room = self.max_samples - self.kept
+            if room <= 0:
+                self.capped = self.ended = True
+                return
+            frame = frame[:room]
+            out.append(frame)
+            self.kept += len(frame)
+
+    def feed(self, pcm: np.ndarray) -> np.ndarray:
+        """
+        Take the next chunk of 16 kHz mono int16 PCM; return what to pass
+        on. Raises NoSpeechError if no speech has started within
+        `no_speech_seconds`.
+        """
+        pcm = np.asarray(pcm, dtype=np.int16)
+        self.received += len(pcm)
+        out: List[np.ndarray] = []
+        if self.ended:
+            return np.zeros(0, dtype=np.int16)
+        samples = np.concatenate([self._partial, pcm]) if len(self._partial) else pcm
+        whole = len(samples) - len(samples) % HOP_LENGTH
+        self._partial = samples[whole:]
+        for frame in samples[:whole].reshape(-1, HOP_LENGTH):
+            if self.ended:
+                break
+            speech = self._is_speech(frame)
+            if not self.started:
+                self._preroll.append(frame)
+                self._run = self._run + 1 if speech else 0
+                if self._run >= self.start_frames:
+                    self.started = True
+                    self._emit(list(self._preroll), out)
+            elif speech:
+                self._emit(self._held + [frame], out)
+                self._held = []
+            else:
+                self._held.append(frame)
+                if len(self._held) >= self.end_frames:
+                    self._finish(out)
+        if not self.started and self.received >= self.no_speech_samples:
+            raise NoSpeechError("No speech detected in the recording")
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int16)
+
+    def _finish(self, out: List[np.ndarray]):
+        self._emit(self._held[: self.pad_frames], out)
+        self._held = []
+        self.ended = True
+
+    def finish(self) -> np.ndarray:
+        """
+        The input is over (the user pressed stop): return the trailing pad
+        to pass on. Raises NoSpeechError if speech never started.
+        """
+        if not self.started:
+            raise NoSpeechError("No speech detected in the recording")
+        out: List[np.ndarray] = []
+        if not self.ended:
+            self._finish(out)
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int16)
+
+    def report(self) -> Dict[str, object]:
+        """Seconds and bytes received but not passed on, like VoiceTrimmer.trim's report."""
+        return _report(self.received, self.kept, self.capped, self.sample_rate)
@@ -1,55 +1,227 @@
+"""
+Idempotent seeder for the spell catalogue and fixture users.
+
+Safe to run on every deploy:
+- Documents are streamed from JSON arrays or NDJSON, so file size doesn't
+  matter.
+- They are upserted in unordered bulk batches keyed on `spell` / `email`.
+- Unchanged documents are left untouched.
+- Running web apps are only told to reload the catalogue when something
+  actually changed.
+- Existing users keep their password; new ones get it hashed.
+
+    python seed.py [--spells spells.json] [--users users.json] [--batch-size 1000]
+"""
+
+import argparse
 import json
 import os
+import random
+import sys
 import time
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
+from itertools import islice
 
-# Load connection settings with safe defaults for Docker
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "holingo")
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
-print(f"🔌 Connecting to MongoDB at: {MONGO_URI}")
+# passwords.py is copied next to this file in the seed image; locally it
+# is imported from the web app it belongs to. web_app/flaskTests.py checks
+# that the image copies that file and that seeded hashes verify there.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "web_app"))
+from passwords import ScryptParams, hash_password, is_hashed  # noqa: E402
 
-# Retry logic for MongoDB startup delay
-client = None
-for i in range(10):
-    try:
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
-        client.server_info()  # Force a connection
-        print("🍃 MongoDB connection established!")
-        break
-    except ServerSelectionTimeoutError:
-        print(f"⏳ Mongo not ready, retrying... ({i+1}/10)")
-        time.sleep(2)
-
-if not client:
+HERE = os.path.dirname(os.path.abspath(__file__))
+READ_CHUNK = 1 << 16
+
+
+def connect(uri, attempts=8, base_delay=0.25, max_delay=8.0):
+    """MongoClient that has answered a ping, retrying with exponential backoff."""
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    for attempt in range(attempts):
+        try:
+            client.admin.command("ping")
+            print("🍃 MongoDB connection established!")
+            return client
+        except PyMongoError as exc:
+            if attempt == attempts - 1:
+                raise RuntimeError(f"❌ Could not connect to MongoDB: {exc}") from exc
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            print(f"⏳ Mongo not ready, retrying in {delay:.1f}s... ({attempt + 1}/{attempts})")
+            time.sleep(delay)
     raise RuntimeError("❌ Could not connect to MongoDB")
 
-db = client[DB_NAME]
-spells_col = db["spells"]
-users_col = db["users"]
-
-# Load JSON data
-with open("spells.json", "r", encoding="utf-8") as f:
-    spells = json.load(f)
-
-with open("users.json", "r", encoding="utf-8") as f:
-    users = json.load(f)
-
-if isinstance(spells, list) and spells:
-    if spells_col.count_documents({}) == 0:
-        spells_col.insert_many(spells)
-        print(f"✨ Seeded {len(spells)} spells into '{DB_NAME}.spells'!")
-    else:
-        print("✔ Spells collection already contains data — skipping seeding.")
-else:
-    print("⚠ spells.json does not appear to contain a list of spell docs.")
-
-if isinstance(users, list) and users:
-    if users_col.count_documents({}) == 0:
-        users_col.insert_many(users)
-        print(f"✨ Seeded {len(users)} users into '{DB_NAME}.users'!")
-    else:
-        print("✔ Users collection already contains data — skipping seeding.")
-else:
-    print("⚠ users.json does not appear to contain a list of user docs.")
\ No newline at end of file
+
+def _iter_json_array(f):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf) and not eof:
+            chunk = f.read(READ_CHUNK)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        if not started:
+            if pos >= len(buf) or buf[pos] != "[":
+                raise ValueError("expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element continues in the next chunk
+            chunk = f.read(READ_CHUNK)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+        pos = end
+
+
+def iter_documents(path):
+    """Documents from a JSON array file or an NDJSON (.ndjson/.jsonl) file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+
+def batched(iterable, size):
+    """Lists of up to `size` items."""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ensure_indexes(db):
+    """Indexes the web app's lookups rely on (the ML service creates its own)."""
+    db["spells"].create_index([("spell", ASCENDING)], unique=True)
+    db["spells"].create_index([("type", ASCENDING)])
+    db["spells"].create_index([("difficulty", ASCENDING)])
+    db["users"].create_index([("email", ASCENDING)], unique=True)
+
+
+def _bulk(col, ops):
+    try:
+        return col.bulk_write(ops, ordered=False).bulk_api_result
+    except BulkWriteError as exc:
+        # Report bad documents but keep the rest of the batch
+        for error in exc.details.get("writeErrors", [])[:5]:
+            print(f"⚠ {col.name}: {error.get('errmsg')}")
+        return exc.details
+
+
+def seed_spells(col, docs, batch_size):
+    """Upsert spells by name; returns (upserted, modified, skipped)."""
+    upserted = modified = skipped = 0
+    for batch in batched(docs, batch_size):
+        ops = []
+        for doc in batch:
+            if not isinstance(doc, dict) or not doc.get("spell"):
+                skipped += 1
+                continue
+            doc.pop("_id", None)
+            ops.append(UpdateOne({"spell": doc["spell"]}, {"$set": doc}, upsert=True))
+        if ops:
+            result = _bulk(col, ops)
+            upserted += result.get("nUpserted", 0)
+            modified += result.get("nModified", 0)
+    return upserted, modified, skipped
+
+
+def seed_users(col, docs, batch_size, params):
+    """
+    Upsert users by email. Profile fields follow the fixture; the password
+    is only set (hashed) when the user is created, so existing users keep
+    theirs and no hashing is spent on them.
+    """
+    upserted = modified = skipped = 0
+    for batch in batched(docs, batch_size):
+        valid = [d for d in batch if isinstance(d, dict) and d.get("email")]
+        skipped += len(batch) - len(valid)
+        batch = valid
+        emails = [d["email"] for d in batch]
+        existing = {d["email"] for d in col.find({"email": {"$in": emails}}, {"email": 1})}
+        ops = []
+        for doc in batch:
+            password = doc.pop("password", None)
+            doc.pop("_id", None)
+            update = {"$set": doc}
+            if doc["email"] not in existing and password:
+                if not is_hashed(password):
+                    password = hash_password(password, params)
+                update["$setOnInsert"] = {"password": password}
+            ops.append(UpdateOne({"email": doc["email"]}, update, upsert=True))
+        if ops:
+            result = _bulk(col, ops)
+            upserted += result.get("nUpserted", 0)
+            modified += result.get("nModified", 0)
+    return upserted, modified, skipped
+
+
+def bump_catalog_version(db):
+    """Tell running web apps to reload their in-memory spell catalogue."""
+    db["catalog_meta"].update_one(
+        {"_id": "spells"},
+        {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        upsert=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed spells and users.")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "holingo"))
+    parser.add_argument("--spells", default=os.path.join(HERE, "spells.json"))
+    parser.add_argument("--users", default=os.path.join(HERE, "users.json"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    print(f"🔌 Connecting to MongoDB at: {args.uri}")
+    db = connect(args.uri)[args.db]
+    ensure_indexes(db)
+
+    if args.spells and os.path.exists(args.spells):
+        start = time.perf_counter()
+        upserted, modified, skipped = seed_spells(
+            db["spells"], iter_documents(args.spells), args.batch_size
+        )
+        if upserted or modified:
+            bump_catalog_version(db)
+        print(
+            f"✨ Spells: {upserted} added, {modified} updated, {skipped} skipped "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    if args.users and os.path.exists(args.users):
+        start = time.perf_counter()
+        upserted, modified, skipped = seed_users(
+            db["users"], iter_documents(args.users), args.batch_size, ScryptParams.from_env()
+        )
+        print(
+            f"✨ Users: {upserted} added, {modified} updated, {skipped} skipped "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,84 @@
 """Flask web application that allows user to check Harry Potter spell pronunciation."""
 
+import base64
+import binascii
+import json
+import math
 import os
 from bson import ObjectId
-from flask import Flask, redirect, render_template, abort, request, jsonify, url_for, flash
-import requests
+from flask import (
+    Flask, Response, redirect, render_template, abort, request, jsonify, url_for, flash
+)
 from pymongo import MongoClient
 from flask_login import LoginManager, login_user, logout_user, current_user, login_required
 from models import User
+from catalog import SpellCatalog
+from http_cache import BodyCache, PrecompressedBody, cached_response
+from ml_client import MLServiceClient, MLServiceError
+from passwords import PasswordHasher, PasswordHasherBusy
+from progress import load_progress
+from user_cache import UserCache
+from ws_proxy import register_ws_proxy
 from dotenv import load_dotenv
 load_dotenv()
 
 login_manager = LoginManager()
 
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL")
+SPELL_FIELDS = ("spell", "pronunciation", "description", "type", "difficulty")
+MAX_PAGE_SIZE = 500
+# Longest a job status request may hold a worker thread
+MAX_JOB_WAIT = 25.0
+SSE_HEARTBEAT = 15.0
+AUDIO_CHUNK_BYTES = 64 * 1024
+# Upstream headers worth passing on when proxying a clip
+AUDIO_HEADERS = ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges")
+RECENT_ATTEMPTS = 10
+
+
+def encode_cursor(spell_name):
+    """Opaque pagination cursor for the spell a page ended on."""
+    return base64.urlsafe_b64encode(spell_name.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Spell name from a cursor made by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_spell_query(args):
+    """Validate limit, cursor and fields parameters of /api/spells."""
+    limit = args.get("limit")
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        limit = int(limit)
+    cursor = args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+    fields = None
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in SPELL_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return limit, after, fields
+
+def ml_error_response(e):
+    """JSON error response for an MLServiceError, keeping its status and Retry-After."""
+    resp = jsonify({"success": False, "error": str(e)})
+    resp.status_code = e.status_code
+    if e.retry_after:
+        resp.headers["Retry-After"] = str(math.ceil(e.retry_after))
+    return resp
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 def create_app():
     app = Flask(__name__)
@@ -23,11 +89,25 @@ def create_app():
     client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
     app.db = client[os.getenv("DB_NAME", "default_db")]
     app.spells_col = app.db["spells"]
+    # spells are served from memory; see catalog.py
+    app.catalog = SpellCatalog.from_db(app.db)
+    app.spells_body_cache = BodyCache()
+    app.ml_client = MLServiceClient.from_env()
+    app.user_cache = UserCache.from_env()
+    app.passwords = PasswordHasher.from_env()
+    # Streamed assessments (/ws/assess); the page falls back to uploads without it
+    app.streaming = register_ws_proxy(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        db_user = app.db.users.find_one({"_id": ObjectId(user_id)})
-        return User(db_user) if db_user else None
+        if not ObjectId.is_valid(user_id):
+            return None
+
+        def load():
+            db_user = app.db.users.find_one({"_id": ObjectId(user_id)}, User.FIELDS)
+            return User(db_user) if db_user else None
+
+        return app.user_cache.get(user_id, load)
 
     @app.route("/audio")
     @login_required
@@ -37,7 +117,7 @@ def create_app():
 
         current_spell = None
         if spell_name:
-            current_spell = app.spells_col.find_one({"spell": spell_name}, {"_id": 0})
+            current_spell = app.catalog.get(spell_name)
 
         return render_template("index.html", spell=current_spell)
 
@@ -49,23 +129,7 @@ def create_app():
         # by type/ difficulty
         t = request.args.get("t")
         diff = request.args.get("p")
-        spells = []
-        filter_r = {}
-
-        if query:
-            filter_r = {
-            "$or": [
-                {"spell": {"$regex": query, "$options": "i"}},
-                {"description": {"$regex": query, "$options": "i"}}
-            ]
-        }
-            
-        if t and t != "":
-            filter_r["type"] = t
-        if diff and diff != "":
-            filter_r["difficulty"] = diff
-
-        spells = list(app.spells_col.find(filter_r, {"_id": 0}))
+        spells = app.catalog.filter(query=query, spell_type=t, difficulty=diff)
 
         return render_template(
             "spells.html",
@@ -79,7 +143,7 @@ def create_app():
     @app.route("/spells/<spell_name>")
     def spell_view(spell_name):
         """Render detail view for a single spell."""
-        spell = app.spells_col.find_one({"spell": spell_name}, {"_id": 0})
+        spell = app.catalog.get(spell_name)
         if not spell:
             abort(404)
         return render_template("spellpage.html", spell=spell)
@@ -87,9 +151,42 @@ def create_app():
 
     @app.route("/api/spells", methods=["GET"])
     def get_spells():
-        """Return all spells as JSON."""
-        spells = list(app.spells_col.find({}, {"_id": 0}))
-        return jsonify(spells)
+        """
+        Return spells as a JSON list. Optional `limit` + `cursor` paginate
+        (the next cursor is in the Link header) and `fields` projects.
+        Bodies are built and compressed once per catalogue version, and
+        ETag / Last-Modified let clients revalidate with a 304.
+        """
+        try:
+            limit, after, fields = parse_spell_query(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        snap = app.catalog.snapshot()
+
+        def build():
+            try:
+                items, next_after = app.catalog.page(after=after, limit=limit, snap=snap)
+            except KeyError:
+                return None
+            if fields:
+                items = [{f: s[f] for f in fields if f in s} for s in items]
+            headers = {}
+            if next_after is not None:
+                next_url = url_for(
+                    "get_spells",
+                    limit=limit,
+                    cursor=encode_cursor(next_after),
+                    fields=",".join(fields) if fields else None,
+                )
+                headers["Link"] = f'<{next_url}>; rel="next"'
+            body = json.dumps(items, separators=(",", ":")).encode("utf-8")
+            return PrecompressedBody(body, last_modified=snap.modified_at, headers=headers)
+
+        body = app.spells_body_cache.get_or_build((snap.version, limit, after, fields), build)
+        if body is None:
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
+        return cached_response(body, request)
 
 
     @app.route("/api/audio", methods=["POST"])
@@ -103,28 +200,104 @@ def create_app():
             audio_file = request.files["audio"]
             spell_name = request.form.get("spell") or "Unknown"
 
-            files = {
-                "audio": (audio_file.filename, audio_file.stream, audio_file.mimetype or "audio/webm")
-            }
-            data = {"spell": spell_name}
-
-            ml_resp = requests.post(
-                ML_SERVICE_URL + "/assess",
-                files=files,
-                data=data,
-                timeout=60,
-            )
-
             try:
-                ml_result = ml_resp.json()
-            except ValueError:
-                return jsonify({"success": False, "error": "Invalid response from ML service"}), 500
+                ml_result = app.ml_client.assess(
+                    spell_name,
+                    audio_file.filename,
+                    audio_file.read(),
+                    audio_file.mimetype or "audio/webm",
+                    user=current_user.id,
+                )
+            except MLServiceError as e:
+                return ml_error_response(e)
 
             ml_result["spell"] = spell_name
             return jsonify(ml_result), 200
 
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
+
+    @app.route("/api/audio/jobs", methods=["POST"])
+    @login_required
+    def submit_audio_job():
+        """Queue an upload for assessment and answer at once with its job id."""
+        if "audio" not in request.files:
+            return jsonify({"success": False, "error": "No audio file provided"}), 400
+
+        audio_file = request.files["audio"]
+        spell_name = request.form.get("spell") or "Unknown"
+        try:
+            job = app.ml_client.submit_job(
+                spell_name,
+                audio_file.filename,
+                audio_file.read(),
+                audio_file.mimetype or "audio/webm",
+                user=current_user.id,
+            )
+        except MLServiceError as e:
+            return ml_error_response(e)
+
+        resp = jsonify({"success": True, "job_id": job["job_id"], "status": job["status"],
+                        "spell": spell_name})
+        resp.status_code = 202
+        resp.headers["Location"] = url_for("get_job", job_id=job["job_id"])
+        return resp
+
+    def fetch_job(job_id, wait=0.0):
+        """The job if it belongs to the current user; aborts with 404 otherwise."""
+        job = app.ml_client.get_job(job_id, wait=wait)
+        if job.get("user") != current_user.id:
+            abort(404)
+        job.pop("user", None)
+        return job
+
+    @app.route("/api/jobs/<job_id>")
+    @login_required
+    def get_job(job_id):
+        """Job status; `?wait=N` long-polls up to N seconds for it to finish."""
+        try:
+            wait = min(max(float(request.args.get("wait", 0)), 0.0), MAX_JOB_WAIT)
+        except ValueError:
+            return jsonify({"success": False, "error": "wait must be a number"}), 400
+        try:
+            return jsonify(fetch_job(job_id, wait))
+        except MLServiceError as e:
+            return ml_error_response(e)
+
+    @app.route("/api/jobs/<job_id>/events")
+    @login_required
+    def job_events(job_id):
+        """Server-Sent Events stream: status updates, then one `result` event."""
+        try:
+            job = fetch_job(job_id)
+        except MLServiceError as e:
+            return ml_error_response(e)
+        user_id = current_user.id
+
+        def stream(job):
+            status = None
+            while True:
+                if job["status"] in ("done", "failed"):
+                    yield sse_event("result", job)
+                    return
+                if job["status"] != status:
+                    status = job["status"]
+                    yield sse_event("status", {"job_id": job_id, "status": status})
+                else:
+                    yield ": heartbeat\n\n"
+                try:
+                    job = app.ml_client.get_job(job_id, wait=SSE_HEARTBEAT)
+                except MLServiceError as e:
+                    yield sse_event("error", {"error": str(e)})
+                    return
+                if job.pop("user", None) != user_id:
+                    return
+
+        return Response(
+            stream(job),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
         
     @app.route('/login', methods=['GET', 'POST'])
     def login():
@@ -142,8 +315,27 @@ def create_app():
                 flash("Email not registered.")
                 return redirect(url_for("login"))
             
-            if db_email["password"] == password:
+            try:
+                matches, needs_rehash = app.passwords.verify(db_email.get("password"), password)
+            except PasswordHasherBusy as e:
+                flash(str(e))
+                resp = app.make_response((render_template("login.html"), 503))
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp
+            if matches and needs_rehash:
+                # Legacy plaintext or an older cost: upgrade while we have the password
+                try:
+                    app.db.users.update_one(
+                        {"_id": db_email["_id"], "password": db_email["password"]},
+                        {"$set": {"password": app.passwords.hash(password)}},
+                    )
+                except PasswordHasherBusy:
+                    # Optional; the next sign-in will try again
+                    pass
+
+            if matches:
                 user = User(db_email)
+                app.user_cache.put(user.id, user)
                 login_user(user)              
                 return redirect(url_for("profile"))
             else:
@@ -155,6 +347,7 @@ def create_app():
     @app.route("/logout")
     @login_required
     def logout():
+        app.user_cache.invalidate(current_user.id)
         logout_user()
         return redirect(url_for("spells_view"))
 
@@ -174,15 +367,24 @@ def create_app():
                 flash("Email already registered!")
                 return redirect(url_for("register"))
         
+            try:
+                password_hash = app.passwords.hash(password)
+            except PasswordHasherBusy as e:
+                flash(str(e))
+                resp = app.make_response((render_template("register.html"), 503))
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp
+
             new_user = ({
                 "username": username,
                 "email": email,
-                "password": password,
+                "password": password_hash,
             })
             doc = app.db.users.insert_one(new_user)
 
-            user_doc = app.db.users.find_one({"_id": doc.inserted_id})
-            user = User(user_doc)
+            new_user["_id"] = doc.inserted_id
+            user = User(new_user)
+            app.user_cache.put(user.id, user)
             login_user(user)
 
             return redirect(url_for("profile"))
@@ -191,11 +393,70 @@ def create_app():
     @app.route("/profile")
     @login_required
     def profile():
-        userdata = app.db.users.find_one({"_id": ObjectId(current_user.id)})
-        return render_template("profile.html", user = userdata)
+        # Precomputed per-spell rollups: cost doesn't grow with attempt count
+        progress = load_progress(app.db, current_user.id)
+        attempts = app.db.pronunciation_attempts.find(
+            {"user": current_user.id},
+            {"spell": 1, "score": 1, "grade": 1, "recorded_at": 1, "audio_file_id": 1},
+        ).sort([("recorded_at", -1), ("_id", -1)]).limit(RECENT_ATTEMPTS)
+        return render_template(
+            "profile.html", user = current_user, progress = progress, attempts = list(attempts)
+        )
+
+    @app.route("/api/attempts/<file_id>/audio")
+    @login_required
+    def attempt_audio(file_id):
+        """Replay one of the user's recordings, streamed and seekable."""
+        if not ObjectId.is_valid(file_id):
+            abort(404)
+        owned = app.db.pronunciation_attempts.find_one(
+            {"audio_file_id": ObjectId(file_id), "user": current_user.id}, {"_id": 1}
+        )
+        if not owned:
+            abort(404)
+        try:
+            upstream = app.ml_client.stream_audio(file_id, request.headers.get("Range"))
+        except MLServiceError as e:
+            if e.status_code == 404:
+                abort(404)
+            return ml_error_response(e)
+
+        def body():
+            try:
+                yield from upstream.iter_content(AUDIO_CHUNK_BYTES)
+            finally:
+                upstream.close()
+
+        resp = Response(body(), status=upstream.status_code)
+        for name in AUDIO_HEADERS:
+            if name in upstream.headers:
+                resp.headers[name] = upstream.headers[name]
+        resp.headers["Cache-Control"] = "private, max-age=3600"
+        return resp
+
+    @app.route("/api/progress")
+    @login_required
+    def get_progress():
+        """The current user's progress dashboard as JSON."""
+        progress = load_progress(app.db, current_user.id)
+        for row in progress["spells"]:
+            if row["last_at"] is not None:
+                row["last_at"] = row["last_at"].isoformat()
+        return jsonify(progress)
         
     return app
 
+def preload_catalog(app):
+    """Load the spell catalogue ahead of the first request, if Mongo is up."""
+    try:
+        app.catalog.load()
+    except Exception as e:
+        # Mongo may still be starting; the catalogue loads on first request instead
+        print(f"Spell catalogue not preloaded: {e}")
+
+
 if __name__ == "__main__":
+    # Development server only; production runs gunicorn (see gunicorn.conf.py)
     app = create_app()
+    preload_catalog(app)
     app.run(host="0.0.0.0", port=5001, debug=True)
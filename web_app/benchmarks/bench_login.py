@@ -0,0 +1,101 @@
+"""
+Login latency under concurrent load at a given scrypt cost.
+
+POSTs /login through Flask's test client from C threads against a
+mocked users collection. The numbers cover hashing plus request handling
+and leave out Mongo and network time. The report gives p50/p95/p99 and
+throughput per scrypt cost and pool size, plus how many logins were
+rejected with 503 because the hash pool was saturated.
+
+    python benchmarks/bench_login.py --n 16384 32768 --workers 1 2 4 --concurrency 8 --requests 200
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # pylint: disable=wrong-import-position
+
+from app import create_app  # pylint: disable=wrong-import-position
+from passwords import PasswordHasher, ScryptParams, hash_password  # pylint: disable=wrong-import-position
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run(app, concurrency, total):
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    per_thread = total // concurrency
+
+    def worker():
+        client = app.test_client()
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            resp = client.post("/login", data={"email": "harry@hogwarts.edu", "password": "harrypotter"})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(resp.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "rps": len(latencies) / wall,
+        "rejected": sum(1 for s in statuses if s == 503),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, nargs="+", default=[2**14])
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queue", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["SECRET_KEY"] = "bench"
+    app.db = MagicMock()
+
+    print(f"cpus={os.cpu_count()} concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'n':>7} {'workers':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} {'503s':>5}")
+    for n in args.n:
+        params = ScryptParams(n=n, r=args.r)
+        app.db.users.find_one.return_value = {
+            "_id": ObjectId(),
+            "username": "Harry",
+            "email": "harry@hogwarts.edu",
+            "password": hash_password("harrypotter", params),
+        }
+        for workers in args.workers:
+            app.passwords = PasswordHasher(params, workers=workers, max_queue=args.queue)
+            result = run(app, args.concurrency, args.requests)
+            app.passwords.shutdown()
+            print(
+                f"{n:>7} {workers:>7} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                f"{result['p99']:>8.1f} {result['rps']:>7.1f} {result['rejected']:>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
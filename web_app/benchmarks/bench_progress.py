@@ -0,0 +1,128 @@
+"""
+Profile render time against history length: precomputed rollups versus
+aggregating the raw attempts on every request.
+
+Synthetic attempts are folded into per-spell stats documents the same
+way the ML service's `stats_pipeline` update does. The dashboard is
+then rendered from those documents and, for comparison, from a
+single-pass Python aggregation over every attempt. That aggregation is
+a lower bound on what a `$group` over `pronunciation_attempts` costs,
+because it skips the reads and BSON decoding.
+
+    python benchmarks/bench_progress.py --sizes 1000 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template  # pylint: disable=wrong-import-position
+
+from app import create_app  # pylint: disable=wrong-import-position
+from progress import day_number, summarize  # pylint: disable=wrong-import-position
+
+SPELLS = ["Lumos", "Nox", "Alohomora", "Accio", "Expelliarmus", "Wingardium Leviosa",
+          "Expecto Patronum", "Stupefy", "Reparo", "Riddikulus"]
+EMA_ALPHA = 0.3
+RECENT_SCORES = 10
+
+
+def grade_of(score):
+    """Mirror of pronun_assess.grade_from_score."""
+    if score >= 70:
+        return "O"
+    if score >= 40:
+        return "E"
+    if score >= 20:
+        return "A"
+    return "T"
+
+
+def synth_attempts(count, seed=7):
+    """`count` attempts over the last few years, oldest first."""
+    rng = random.Random(seed)
+    start = datetime.now(tz=timezone.utc) - timedelta(days=3 * 365)
+    step = timedelta(days=3 * 365) / max(count, 1)
+    for i in range(count):
+        score = min(100.0, max(0.0, rng.gauss(60, 20)))
+        yield rng.choice(SPELLS), round(score, 1), start + step * i
+
+
+def fold(doc, score, recorded_at):
+    """Apply one attempt to a stats document, as stats_pipeline does in Mongo."""
+    day = day_number(recorded_at)
+    grade = grade_of(score)
+    last_day = doc.get("last_day", -1)
+    if last_day >= day:
+        streak = doc.get("streak", 1)
+    elif last_day == day - 1:
+        streak = doc.get("streak", 0) + 1
+    else:
+        streak = 1
+    doc["attempts"] = doc.get("attempts", 0) + 1
+    doc["scored"] = doc.get("scored", 0) + 1
+    doc["total"] = doc.get("total", 0.0) + score
+    doc["best"] = max(doc.get("best", score), score)
+    ema = doc.get("ema")
+    doc["ema"] = score if ema is None else EMA_ALPHA * score + (1 - EMA_ALPHA) * ema
+    doc["recent"] = (doc.get("recent", []) + [score])[-RECENT_SCORES:]
+    grades = doc.setdefault("grades", {})
+    grades[grade] = grades.get(grade, 0) + 1
+    doc["streak"] = streak
+    doc["best_streak"] = max(doc.get("best_streak", 0), streak)
+    doc["last_day"] = max(last_day, day)
+    doc["last_at"] = max(doc.get("last_at", recorded_at), recorded_at)
+
+
+def rollup(attempts):
+    """Stats documents for a whole history."""
+    docs = {}
+    for spell, score, recorded_at in attempts:
+        fold(docs.setdefault(spell, {"spell": spell}), score, recorded_at)
+    return [docs[name] for name in sorted(docs)]
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()  # MongoClient connects lazily; nothing here touches it
+    user = {"username": "Harry", "email": "harry@example.com"}
+
+    print(f"{'attempts':>10}  {'rollup render ms':>16}  {'on-the-fly ms':>14}")
+    for size in args.sizes:
+        attempts = list(synth_attempts(size))
+        stats = rollup(attempts)
+
+        def from_rollups(stats=stats):
+            with app.test_request_context("/profile"):
+                render_template("profile.html", user=user, progress=summarize(stats))
+
+        def on_the_fly(attempts=attempts):
+            # Same dashboard, recomputed from every attempt
+            with app.test_request_context("/profile"):
+                render_template("profile.html", user=user, progress=summarize(rollup(attempts)))
+
+        fast = timed(from_rollups, args.repeat)
+        slow = timed(on_the_fly, max(1, args.repeat if size <= 100000 else 1))
+        print(f"{size:>10}  {fast:>16.2f}  {slow:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare the old unanchored, case-insensitive regex scan with the
+in-process search index as the catalogue grows.
+
+The regex path is emulated in Python (one `re.search` per document and
+field), which is what Mongo's `$regex` without an anchored index does
+server-side; network and BSON costs are left out, so the real gap is wider.
+
+    python benchmarks/bench_search.py --sizes 100 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SpellSearchIndex  # pylint: disable=wrong-import-position
+
+SEED_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "seed", "spells.json")
+SYLLABLES = ["ka", "lo", "mi", "ra", "tus", "vi", "os", "pe", "dra", "ni", "um", "co", "fi", "do"]
+WORDS = ["summons", "unlocks", "light", "shield", "target", "object", "door", "pain", "water"]
+VOCAB_SIZE = 5000
+QUERIES = ["lumos", "expel", "wingardium levosa", "unlock door", "kadralo", "zzzz"]
+
+
+def synthetic_catalogue(size, rng):
+    """The real spells plus generated ones up to `size` documents."""
+    with open(SEED_FILE, encoding="utf-8") as f:
+        spells = json.load(f)
+    vocab = WORDS + [
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(VOCAB_SIZE)
+    ]
+    while len(spells) < size:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        spells.append(
+            {
+                "spell": f"{name} {len(spells)}",
+                "pronunciation": "-".join(rng.choice(SYLLABLES).upper() for _ in range(3)),
+                "description": " ".join(rng.choice(vocab) for _ in range(8)),
+                "type": rng.choice(["Charm", "Curse", "Healing", "Defense"]),
+                "difficulty": rng.choice(["Beginner", "Intermediate", "Advanced"]),
+            }
+        )
+    return spells[:size]
+
+
+def regex_scan(spells, query):
+    """What `{"$regex": query, "$options": "i"}` on spell/description does."""
+    pattern = re.compile(query, re.IGNORECASE)
+    return [
+        s
+        for s in spells
+        if pattern.search(s.get("spell", "")) or pattern.search(s.get("description", ""))
+    ]
+
+
+def per_query_ms(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            func(query)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(QUERIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'spells':>8}{'build ms':>10}{'regex ms/q':>12}{'index ms/q':>12}{'speedup':>9}")
+    for size in args.sizes:
+        spells = synthetic_catalogue(size, rng)
+        start = time.perf_counter()
+        index = SpellSearchIndex(spells)
+        build_ms = (time.perf_counter() - start) * 1000
+        regex_ms = per_query_ms(lambda q, s=spells: regex_scan(s, q), args.repeat)
+        index_ms = per_query_ms(index.search, args.repeat)
+        print(
+            f"{size:>8}{build_ms:>10.1f}{regex_ms:>12.3f}{index_ms:>12.3f}"
+            f"{regex_ms / index_ms:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
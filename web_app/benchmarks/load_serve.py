@@ -0,0 +1,196 @@
+"""
+Upload throughput of the web app under gunicorn at different worker and
+thread counts.
+
+For each configuration this starts `gunicorn -c gunicorn.conf.py` on a
+test app, logs C clients in, and has them POST /api/audio for a fixed
+duration. The test app uses a mocked users collection. The ML service
+is a local stub that answers each /assess after --ml-latency seconds,
+standing in for the Azure round trip. The report gives requests/s,
+p50/p95 latency, errors, and how long a SIGTERM took to drain.
+
+    python benchmarks/load_serve.py --configs 1x1 1x8 2x8 4x8 --clients 32 --ml-latency 0.5
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_APP = os.path.dirname(HERE)
+USER_ID = "65f000000000000000000001"
+EMAIL = "load@hogwarts.edu"
+PASSWORD = "mischief managed"
+
+
+def bench_app():
+    """gunicorn app factory: the real app over a mocked users collection."""
+    sys.path.insert(0, WEB_APP)
+    from bson import ObjectId  # pylint: disable=import-outside-toplevel
+    from app import create_app  # pylint: disable=import-outside-toplevel
+
+    app = create_app()
+    app.db = MagicMock()
+    app.db.users.find_one.return_value = {
+        "_id": ObjectId(USER_ID),
+        "username": "Load",
+        "email": EMAIL,
+        "password": app.passwords.hash(PASSWORD),
+    }
+    return app
+
+
+class StubML(BaseHTTPRequestHandler):
+    """Answers /assess after a fixed delay, like a slow scoring backend."""
+
+    latency = 0.5
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps({"success": True, "accuracy_score": 80.0, "grade": "O"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, threads, port, ml_url):
+    env = dict(
+        os.environ,
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(threads),
+        PORT=str(port),
+        ML_SERVICE_URL=ml_url,
+        ML_POOL_SIZE=str(max(10, threads)),
+        SECRET_KEY="load-test",
+    )
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable, "-m", "gunicorn",
+            "-c", "gunicorn.conf.py",
+            "--access-logfile", "/dev/null",
+            "--pythonpath", HERE,
+            "load_serve:bench_app()",
+        ],
+        cwd=WEB_APP,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base}/login", timeout=5).status_code == 200:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def run_clients(base, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_gate = threading.Barrier(clients + 1)
+
+    def client():
+        session = requests.Session()
+        session.post(f"{base}/login", data={"email": EMAIL, "password": PASSWORD},
+                     allow_redirects=False, timeout=30)
+        start_gate.wait()
+        stop = time.monotonic() + duration
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            try:
+                resp = session.post(
+                    f"{base}/api/audio",
+                    files={"audio": ("clip.webm", b"\x1a\x45\xdf\xa3" * 256, "audio/webm")},
+                    data={"spell": "Lumos"},
+                    timeout=30,
+                )
+                ok = resp.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    # Requests in flight at the deadline still finish, so divide by the real wall time
+    wall = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0
+
+    return {"rps": len(latencies) / wall, "p50": pct(0.5), "p95": pct(0.95), "errors": errors[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--configs", nargs="+", default=["1x1", "1x8", "2x8", "4x8"],
+                        help="WORKERSxTHREADS")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--ml-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    StubML.latency = args.ml_latency
+    ml = ThreadingHTTPServer(("127.0.0.1", free_port()), StubML)
+    ml.daemon_threads = True
+    threading.Thread(target=ml.serve_forever, daemon=True).start()
+    ml_url = f"http://127.0.0.1:{ml.server_address[1]}"
+
+    print(f"cpus={os.cpu_count()} clients={args.clients} duration={args.duration:.0f}s "
+          f"ml_latency={args.ml_latency * 1000:.0f}ms")
+    print(f"{'workers':>7} {'threads':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'errors':>6} {'drain s':>7}")
+    for config in args.configs:
+        workers, threads = (int(x) for x in config.split("x"))
+        proc, base = start_gunicorn(workers, threads, free_port(), ml_url)
+        try:
+            result = run_clients(base, args.clients, args.duration)
+        finally:
+            stopped = time.perf_counter()
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+            drain = time.perf_counter() - stopped
+        print(f"{workers:>7} {threads:>7} {result['rps']:>7.1f} {result['p50']:>8.0f} "
+              f"{result['p95']:>8.0f} {result['errors']:>6} {drain:>7.1f}")
+    ml.shutdown()
+
+
+if __name__ == "__main__":
+    main()
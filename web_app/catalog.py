@@ -0,0 +1,153 @@
+"""In-process copy of the spell catalogue with precomputed lookup indexes."""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from search import SpellSearchIndex
+
+META_ID = "spells"
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalogue at one version."""
+
+    def __init__(self, spells, version, modified_at=None):
+        self.version = version
+        self.modified_at = modified_at or datetime.now(tz=timezone.utc)
+        self.spells = spells
+        self.position = {}
+        self.by_name = {}
+        self.by_type = {}
+        self.by_difficulty = {}
+        for idx, spell in enumerate(spells):
+            self.position[spell.get("spell")] = idx
+            self.by_name[spell.get("spell")] = spell
+            self.by_type.setdefault(spell.get("type"), []).append(spell)
+            self.by_difficulty.setdefault(spell.get("difficulty"), []).append(spell)
+        self.search = SpellSearchIndex(spells)
+
+
+class SpellCatalog:
+    """
+    Serve spell listing, filtering and detail lookups from memory.
+
+    The catalogue is loaded on first use (or explicitly with `load()`)
+    and reloaded when the version stamp that `seed.py` bumps in
+    `catalog_meta` changes. The stamp is checked at most once every
+    `refresh_interval` seconds, so most requests do no Mongo I/O at all.
+    """
+
+    def __init__(self, spells_col, meta_col=None, refresh_interval=30.0):
+        self._spells_col = spells_col
+        self._meta_col = meta_col
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, db):
+        """Build a catalogue over `db.spells`, refreshing per CATALOG_REFRESH_SECONDS."""
+        return cls(
+            db["spells"],
+            db["catalog_meta"],
+            refresh_interval=float(os.getenv("CATALOG_REFRESH_SECONDS", "30")),
+        )
+
+    def _read_meta(self):
+        """
+        Version stamp and modification time written by the seeder;
+        falls back to the document count when there is no stamp.
+        """
+        if self._meta_col is not None:
+            meta = self._meta_col.find_one({"_id": META_ID}, {"version": 1, "updated_at": 1})
+            if meta and "version" in meta:
+                return ("stamp", meta["version"]), meta.get("updated_at")
+        return ("count", self._spells_col.estimated_document_count()), None
+
+    def _read_version(self):
+        return self._read_meta()[0]
+
+    def load(self):
+        """Read the whole catalogue and rebuild every index."""
+        version, modified_at = self._read_meta()
+        spells = list(self._spells_col.find({}, {"_id": 0}))
+        self._snapshot = CatalogSnapshot(spells, version, modified_at)
+        self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def snapshot(self):
+        """Current snapshot, loading or refreshing it first if it is due."""
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is None:
+                return self.load()
+            if time.monotonic() - self._checked_at >= self.refresh_interval:
+                self._checked_at = time.monotonic()
+                if self._read_version() != snap.version:
+                    return self.load()
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload on the next access."""
+        self._snapshot = None
+
+    @property
+    def version(self):
+        """Version stamp of the loaded catalogue."""
+        return self.snapshot().version
+
+    def all(self):
+        """Every spell, in catalogue order."""
+        return self.snapshot().spells
+
+    def page(self, after=None, limit=None, snap=None):
+        """
+        Spells following the one named `after`, at most `limit` of them,
+        plus the name to continue from (None on the last page).
+        """
+        snap = snap or self.snapshot()
+        start = 0
+        if after is not None:
+            if after not in snap.position:
+                raise KeyError(after)
+            start = snap.position[after] + 1
+        end = len(snap.spells) if limit is None else min(len(snap.spells), start + limit)
+        items = snap.spells[start:end]
+        next_after = items[-1].get("spell") if items and end < len(snap.spells) else None
+        return items, next_after
+
+    def get(self, name):
+        """A single spell by exact name, or None."""
+        return self.snapshot().by_name.get(name)
+
+    def filter(self, query=None, spell_type=None, difficulty=None):
+        """
+        Spells matching an optional text query, type and difficulty.
+        With a query, results come back in search-rank order.
+        """
+        snap = self.snapshot()
+        if query:
+            return [
+                s
+                for s in snap.search.search(query)
+                if (not spell_type or s.get("type") == spell_type)
+                and (not difficulty or s.get("difficulty") == difficulty)
+            ]
+
+        if spell_type and difficulty:
+            spells = [
+                s for s in snap.by_type.get(spell_type, []) if s.get("difficulty") == difficulty
+            ]
+        elif spell_type:
+            spells = snap.by_type.get(spell_type, [])
+        elif difficulty:
+            spells = snap.by_difficulty.get(difficulty, [])
+        else:
+            spells = snap.spells
+        return spells
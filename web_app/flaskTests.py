@@ -4,9 +4,30 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import pytest
+from datetime import datetime, timezone
+from io import BytesIO
 from unittest.mock import patch, MagicMock
 from bson import ObjectId
 from app import create_app, User
+from catalog import SpellCatalog
+from search import SpellSearchIndex, within_distance
+from progress import day_number, summarize
+from user_cache import UserCache
+from passwords import (
+    PasswordHasher, PasswordHasherBusy, ScryptParams, hash_password, is_hashed, verify_password
+)
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from ml_client import CircuitBreaker, CircuitOpenError, MLServiceClient, MLServiceError
+import ws_proxy
+
+def make_catalog(spells, version=1):
+    """A catalogue over a mocked spells collection."""
+    spells_col = MagicMock()
+    spells_col.find.return_value = spells
+    meta_col = MagicMock()
+    meta_col.find_one.return_value = {"_id": "spells", "version": version}
+    return SpellCatalog(spells_col, meta_col)
 
 @pytest.fixture
 def client():
@@ -93,22 +114,19 @@ def test_profile_route(client):
 
 def test_spell_view_found(client):
     spell_data = {"spell": "Expelliarmus", "description": "Disarming spell"}
-    with patch.object(client.application, 'spells_col', new=MagicMock()) as mock_col:
-        mock_col.find_one.return_value = spell_data
+    with patch.object(client.application, 'catalog', new=make_catalog([spell_data])):
         response = client.get('/spells/Expelliarmus')
         assert response.status_code == 200
         assert b"Expelliarmus" in response.data
 
 def test_spell_view_not_found(client):
-    with patch.object(client.application, 'spells_col', new=MagicMock()) as mock_col:
-        mock_col.find_one.return_value = None
+    with patch.object(client.application, 'catalog', new=make_catalog([])):
         response = client.get('/spells/UnknownSpell')
         assert response.status_code == 404
 
 def test_api_spells(client):
     spells_list = [{"spell": "Expelliarmus"}, {"spell": "Lumos"}]
-    with patch.object(client.application, 'spells_col', new=MagicMock()) as mock_col:
-        mock_col.find.return_value = spells_list
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
         response = client.get('/api/spells')
         assert response.status_code == 200
         assert b"Expelliarmus" in response.data
@@ -121,12 +139,58 @@ def test_profile_requires_login(client):
     assert b"Please log in" in response.data
 
 def test_spells_view_filters(client):
-    spells_list = [{"spell": "Alohomora"}, {"spell": "Expelliarmus"}]
-    with patch.object(client.application, 'spells_col', new=MagicMock()) as mock_col:
-        mock_col.find.return_value = spells_list
-        response = client.get('/?q=Alohomora&t=magic&p=easy')
+    spells_list = [
+        {"spell": "Alohomora", "description": "Unlocks doors", "type": "Charm", "difficulty": "Beginner"},
+        {"spell": "Expelliarmus", "description": "Disarms", "type": "Charm", "difficulty": "Beginner"},
+        {"spell": "Crucio", "description": "Pain", "type": "Curse", "difficulty": "Advanced"},
+    ]
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
+        response = client.get('/?q=alohomora&t=Charm&p=Beginner')
         assert response.status_code == 200
-        assert b"Alohomora" in response.data
+        assert b"Unlocks doors" in response.data
+        assert b"Disarms" not in response.data
+
+        response = client.get('/?t=Curse')
+        assert b"Crucio" in response.data
+        assert b"Alohomora" not in response.data
+
+        # query matches descriptions too, case-insensitively
+        response = client.get('/?q=DISARM')
+        assert b"Expelliarmus" in response.data
+
+def test_spell_pages_do_not_query_mongo_per_request(client):
+    catalog = make_catalog([{"spell": "Lumos", "description": "Light", "type": "Charm"}])
+    with patch.object(client.application, 'catalog', new=catalog):
+        client.get('/')
+        client.get('/spells/Lumos')
+        client.get('/api/spells')
+        client.get('/?t=Charm')
+    # one full load, no further reads inside the refresh interval
+    catalog._spells_col.find.assert_called_once()
+    catalog._meta_col.find_one.assert_called_once()
+
+def test_catalog_reloads_when_version_stamp_changes():
+    catalog = make_catalog([{"spell": "Lumos"}], version=1)
+    catalog.refresh_interval = 0
+    assert catalog.get("Nox") is None
+
+    catalog._spells_col.find.return_value = [{"spell": "Lumos"}, {"spell": "Nox"}]
+    assert catalog.get("Nox") is None  # same stamp, no reload
+
+    catalog._meta_col.find_one.return_value = {"_id": "spells", "version": 2}
+    assert catalog.get("Nox") == {"spell": "Nox"}
+    assert catalog._spells_col.find.call_count == 2
+
+def test_catalog_falls_back_to_document_count():
+    spells_col = MagicMock()
+    spells_col.find.return_value = [{"spell": "Lumos", "difficulty": "Beginner"}]
+    spells_col.estimated_document_count.return_value = 1
+    catalog = SpellCatalog(spells_col, refresh_interval=0)
+    assert catalog.version == ("count", 1)
+    assert catalog.filter(difficulty="Beginner") == [{"spell": "Lumos", "difficulty": "Beginner"}]
+    catalog.invalidate()
+    catalog.all()
+    assert spells_col.find.call_count == 2
 
 def test_register_login_get_pages(client):
     response = client.get('/register')
@@ -148,3 +212,688 @@ def test_login_post_missing_fields(client):
     assert b"Please fill in both fields!" in response.data
 
 
+
+
+SEARCH_SPELLS = [
+    {"spell": "Lumos", "pronunciation": "LOO-mos", "description": "Lights the wand tip."},
+    {"spell": "Nox", "pronunciation": "noks", "description": "Counter-charm to Lumos."},
+    {"spell": "Expelliarmus", "pronunciation": "ex-PELL-ee-AR-mus", "description": "Disarms an opponent."},
+    {"spell": "Wingardium Leviosa", "pronunciation": "win-GAR-dee-um lev-ee-OH-sa", "description": "Makes objects fly."},
+]
+
+def test_search_ranks_name_matches_first():
+    index = SpellSearchIndex(SEARCH_SPELLS)
+    assert [s["spell"] for s in index.search("lumos")] == ["Lumos", "Nox"]
+
+def test_search_prefix_and_typos():
+    index = SpellSearchIndex(SEARCH_SPELLS)
+    assert index.search("expel")[0]["spell"] == "Expelliarmus"
+    assert index.search("expeliarmus")[0]["spell"] == "Expelliarmus"
+    assert index.search("wingardium levosa")[0]["spell"] == "Wingardium Leviosa"
+    assert index.search("LOO-mos")[0]["spell"] == "Lumos"
+    assert index.search("xyzzy") == []
+
+def test_search_requires_every_term():
+    index = SpellSearchIndex(SEARCH_SPELLS)
+    assert [s["spell"] for s in index.search("counter lumos")] == ["Nox"]
+    assert index.search("lumos disarms") == []
+
+def test_search_treats_regex_metacharacters_as_text():
+    index = SpellSearchIndex(SEARCH_SPELLS * 50)
+    assert index.search("(a+)+$") == []
+    assert index.search(".*") == []
+    assert index.search("") == []
+
+def test_within_distance():
+    assert within_distance("levosa", "leviosa", 1)
+    assert within_distance("lumso", "lumos", 1)  # transposition
+    assert not within_distance("nox", "lumos", 2)
+
+def test_spells_view_uses_ranked_search(client):
+    with patch.object(client.application, 'catalog', new=make_catalog(SEARCH_SPELLS)):
+        response = client.get('/?q=lumos')
+    body = response.data.decode()
+    assert body.index("Lights the wand tip") < body.index("Counter-charm")
+
+
+def test_api_spells_etag_and_304(client):
+    spells_list = [{"spell": "Lumos"}, {"spell": "Nox"}]
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
+        first = client.get('/api/spells')
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+        assert first.headers["Last-Modified"]
+        assert "Accept-Encoding" in first.headers["Vary"]
+
+        again = client.get('/api/spells', headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.data == b""
+
+        since = client.get('/api/spells', headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert since.status_code == 304
+
+        stale = client.get('/api/spells', headers={"If-None-Match": '"something-else"'})
+        assert stale.status_code == 200
+
+def test_api_spells_gzip_is_precompressed_once(client):
+    import gzip
+    import json as _json
+    spells_list = [{"spell": f"Spell {i}", "description": "x" * 40} for i in range(20)]
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
+        with patch("http_cache.gzip.compress", wraps=gzip.compress) as compress:
+            for _ in range(3):
+                response = client.get('/api/spells', headers={"Accept-Encoding": "gzip"})
+            assert compress.call_count == 1
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"].endswith('-gzip"')
+    assert len(_json.loads(gzip.decompress(response.data))) == 20
+
+def test_api_spells_identity_when_gzip_refused(client):
+    spells_list = [{"spell": f"Spell {i}", "description": "x" * 40} for i in range(20)]
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
+        response = client.get('/api/spells', headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json[0]["spell"] == "Spell 0"
+
+def test_api_spells_cursor_pagination_and_projection(client):
+    spells_list = [{"spell": name, "type": "Charm", "description": "d"} for name in ("A", "B", "C")]
+    with patch.object(client.application, 'catalog', new=make_catalog(spells_list)):
+        page1 = client.get('/api/spells?limit=2&fields=spell,type')
+        assert page1.json == [{"spell": "A", "type": "Charm"}, {"spell": "B", "type": "Charm"}]
+        next_url = page1.headers["Link"].split(";")[0].strip("<>")
+
+        page2 = client.get(next_url)
+        assert page2.json == [{"spell": "C", "type": "Charm"}]
+        assert "Link" not in page2.headers
+
+def test_api_spells_rejects_bad_parameters(client):
+    with patch.object(client.application, 'catalog', new=make_catalog([{"spell": "A"}])):
+        assert client.get('/api/spells?limit=0').status_code == 400
+        assert client.get('/api/spells?limit=abc').status_code == 400
+        assert client.get('/api/spells?fields=password').status_code == 400
+        assert client.get('/api/spells?cursor=%%%').status_code == 400
+        assert client.get('/api/spells?limit=1&cursor=bm9wZQ').status_code == 400
+
+def test_choose_encoding():
+    from http_cache import choose_encoding
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("*") in ("br", "gzip")
+    assert choose_encoding("identity") == "identity"
+    assert choose_encoding(None) == "identity"
+
+
+def login_session(client):
+    mock_id = ObjectId()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(mock_id)
+    return mock_id
+
+def fake_response(status, body=None, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    resp.reason = "reason"
+    if body is None:
+        resp.json.side_effect = ValueError("no json")
+    else:
+        resp.json.return_value = body
+    return resp
+
+def make_ml_client(*responses, **kwargs):
+    session = MagicMock()
+    session.request.side_effect = list(responses)
+    kwargs.setdefault("backoff_base", 0)
+    kwargs.setdefault("backoff_max", 0)
+    return MLServiceClient("http://ml:8000", session=session, **kwargs), session
+
+def test_upload_audio_uses_ml_client(client):
+    user_doc = {"_id": ObjectId(), "username": "Harry", "email": "harry@gmail.com"}
+    ml_client, session = make_ml_client(fake_response(200, {"success": True, "grade": "O"}))
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db, \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        mock_db.users.find_one.return_value = user_doc
+        login_session(client)
+        data = {"spell": "Lumos", "audio": (BytesIO(b"webm"), "rec.webm", "audio/webm")}
+        response = client.post('/api/audio', data=data, content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert response.json == {"success": True, "grade": "O", "spell": "Lumos"}
+    method, url = session.request.call_args[0]
+    assert (method, url) == ("POST", "http://ml:8000/assess")
+    assert session.request.call_args.kwargs["files"]["audio"][1] == b"webm"
+    assert session.request.call_args.kwargs["data"] == {"spell": "Lumos", "user": str(user_doc["_id"])}
+
+def test_upload_audio_fails_fast_when_circuit_open(client):
+    user_doc = {"_id": ObjectId(), "username": "Harry", "email": "harry@gmail.com"}
+    ml_client, session = make_ml_client()
+    ml_client.breaker = MagicMock()
+    ml_client.breaker.before_call.side_effect = CircuitOpenError(retry_after=7)
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db, \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        mock_db.users.find_one.return_value = user_doc
+        login_session(client)
+        data = {"spell": "Lumos", "audio": (BytesIO(b"webm"), "rec.webm", "audio/webm")}
+        response = client.post('/api/audio', data=data, content_type="multipart/form-data")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    session.request.assert_not_called()
+
+def refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/assess", reason))
+
+def test_ml_client_retries_connection_errors_then_succeeds():
+    ml_client, session = make_ml_client(
+        refused(),
+        fake_response(503, {"success": False}, {"Retry-After": "0"}),
+        fake_response(200, {"success": True}),
+    )
+    assert ml_client.assess("Lumos", "a.webm", b"x") == {"success": True}
+    assert session.request.call_count == 3
+    assert ml_client.breaker.state == "closed"
+
+def test_ml_client_gives_up_after_max_retries():
+    ml_client, session = make_ml_client(*[fake_response(502, {})] * 3, max_retries=2)
+    with pytest.raises(MLServiceError) as excinfo:
+        ml_client.get_job("job1")
+    assert excinfo.value.status_code == 502
+    assert session.request.call_count == 3
+
+@pytest.mark.parametrize("outcome", [
+    fake_response(502, {"detail": "bad gateway"}),
+    fake_response(504, {"detail": "gateway timeout"}),
+    requests.exceptions.ConnectionError("Connection reset by peer"),
+])
+def test_ml_client_does_not_resend_posts_that_may_have_been_processed(outcome):
+    ml_client, session = make_ml_client(outcome, fake_response(200, {"success": True}))
+    with pytest.raises(MLServiceError) as excinfo:
+        ml_client.submit_job("Lumos", "a.webm", b"x")
+    assert excinfo.value.status_code == 502
+    assert session.request.call_count == 1
+
+def test_ml_client_resends_posts_that_never_connected():
+    ml_client, session = make_ml_client(
+        requests.exceptions.ConnectTimeout("connect timed out"),
+        refused(),
+        fake_response(200, {"job_id": "j1", "status": "queued"}),
+    )
+    assert ml_client.submit_job("Lumos", "a.webm", b"x")["job_id"] == "j1"
+    assert session.request.call_count == 3
+
+def test_ml_client_does_not_retry_read_timeouts():
+    ml_client, session = make_ml_client(requests.exceptions.ReadTimeout("slow"))
+    with pytest.raises(MLServiceError) as excinfo:
+        ml_client.assess("Lumos", "a.webm", b"x")
+    assert excinfo.value.status_code == 504
+    assert session.request.call_count == 1
+
+def test_ml_client_releases_the_half_open_trial_on_unexpected_errors():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 10.0
+    ml_client, session = make_ml_client(
+        requests.exceptions.ChunkedEncodingError("truncated"),
+        fake_response(200, {"status": "done"}),
+        breaker=breaker,
+    )
+    with pytest.raises(MLServiceError) as excinfo:
+        ml_client.get_job("job1")
+    assert excinfo.value.status_code == 502
+    assert breaker.state == "open"
+
+    now[0] = 20.0
+    assert ml_client.get_job("job1") == {"status": "done"}
+    assert breaker.state == "closed"
+    assert session.request.call_count == 2
+
+def test_ml_client_reports_invalid_json_and_server_errors():
+    ml_client, _ = make_ml_client(fake_response(200))
+    with pytest.raises(MLServiceError, match="Invalid response"):
+        ml_client.assess("Lumos", "a.webm", b"x")
+    ml_client, _ = make_ml_client(fake_response(500, {"detail": "boom"}))
+    with pytest.raises(MLServiceError, match="boom"):
+        ml_client.assess("Lumos", "a.webm", b"x")
+
+def test_upload_audio_passes_on_rejected_recordings(client):
+    user_doc = {"_id": ObjectId(), "username": "Harry", "email": "harry@gmail.com"}
+    ml_client, session = make_ml_client(
+        fake_response(422, {"detail": "No speech detected in the recording"})
+    )
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db, \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        mock_db.users.find_one.return_value = user_doc
+        login_session(client)
+        data = {"spell": "Lumos", "audio": (BytesIO(b"webm"), "rec.webm", "audio/webm")}
+        response = client.post('/api/audio', data=data, content_type="multipart/form-data")
+    assert response.status_code == 422
+    assert response.json == {"success": False, "error": "No speech detected in the recording"}
+    assert session.request.call_count == 1
+    assert ml_client.breaker.state == "closed"
+
+def test_circuit_breaker_opens_and_half_opens():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 10
+
+    now[0] = 10.0
+    assert breaker.state == "half-open"
+    breaker.before_call()  # the single trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] = 20.0
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_ml_client_uses_pooled_session():
+    ml_client = MLServiceClient("http://ml:8000/", pool_size=4)
+    adapter = ml_client.session.get_adapter("http://ml:8000/assess")
+    assert adapter._pool_maxsize == 4
+    assert ml_client.base_url == "http://ml:8000"
+
+def logged_in(client, user_id):
+    db = MagicMock()
+    db.users.find_one.return_value = {"_id": user_id, "username": "Harry", "email": "h@x.com"}
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    return db
+
+def test_submit_audio_job_returns_202_with_location(client):
+    user_id = ObjectId()
+    ml_client = MagicMock()
+    ml_client.submit_job.return_value = {"job_id": "abc123", "status": "queued"}
+    with patch.object(client.application, 'db', new=logged_in(client, user_id)), \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        data = {"spell": "Lumos", "audio": (BytesIO(b"webm"), "rec.webm", "audio/webm")}
+        response = client.post('/api/audio/jobs', data=data, content_type="multipart/form-data")
+    assert response.status_code == 202
+    assert response.json["job_id"] == "abc123"
+    assert response.headers["Location"].endswith("/api/jobs/abc123")
+    assert ml_client.submit_job.call_args.kwargs["user"] == str(user_id)
+
+def test_get_job_long_polls_and_hides_other_users_jobs(client):
+    user_id = ObjectId()
+    ml_client = MagicMock()
+    ml_client.get_job.return_value = {"job_id": "j1", "status": "done", "user": str(user_id),
+                                      "result": {"grade": "O"}}
+    with patch.object(client.application, 'db', new=logged_in(client, user_id)), \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        response = client.get('/api/jobs/j1?wait=999')
+        assert response.status_code == 200
+        assert response.json == {"job_id": "j1", "status": "done", "result": {"grade": "O"}}
+        ml_client.get_job.assert_called_with("j1", wait=25.0)
+
+        ml_client.get_job.return_value = {"job_id": "j1", "status": "done", "user": "someone-else"}
+        assert client.get('/api/jobs/j1').status_code == 404
+        assert client.get('/api/jobs/j1?wait=soon').status_code == 400
+
+def test_job_events_stream_status_then_result(client):
+    user_id = ObjectId()
+    ml_client = MagicMock()
+    ml_client.get_job.side_effect = [
+        {"job_id": "j1", "status": "queued", "user": str(user_id)},
+        {"job_id": "j1", "status": "running", "user": str(user_id)},
+        {"job_id": "j1", "status": "done", "user": str(user_id), "result": {"grade": "E"}},
+    ]
+    with patch.object(client.application, 'db', new=logged_in(client, user_id)), \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        response = client.get('/api/jobs/j1/events')
+        body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event:")]
+    assert events == ["status", "status", "result"]
+    assert '"grade": "E"' in body
+    assert "user" not in body
+
+def test_ml_client_get_job_maps_404():
+    ml_client, session = make_ml_client(fake_response(404, {"detail": "Job not found"}))
+    with pytest.raises(MLServiceError) as excinfo:
+        ml_client.get_job("nope", wait=5)
+    assert excinfo.value.status_code == 404
+    assert session.request.call_args.kwargs["params"] == {"wait": 5}
+
+def stats_doc(spell, **fields):
+    doc = {"spell": spell, "attempts": 0, "scored": 0, "total": 0.0, "grades": {}}
+    doc.update(fields)
+    return doc
+
+def test_summarize_progress_from_rollups():
+    now = datetime(2024, 3, 10, 12, tzinfo=timezone.utc)
+    today = day_number(now)
+    docs = [
+        stats_doc("Lumos", attempts=5, scored=4, total=300.0, best=92.0, ema=80.0,
+                  grades={"O": 3, "E": 1}, streak=3, best_streak=4, last_day=today - 1),
+        stats_doc("Nox", attempts=2, scored=2, total=50.0, best=30.0, ema=25.0,
+                  grades={"A": 1, "T": 1}, streak=2, best_streak=2, last_day=today - 3),
+    ]
+    progress = summarize(docs, now)
+
+    lumos, nox = progress["spells"]
+    assert lumos["average"] == 75.0
+    assert lumos["grades"] == {"O": 3, "E": 1, "A": 0, "T": 0}
+    assert lumos["streak"] == 3  # practised yesterday: still alive
+    assert nox["streak"] == 0  # lapsed
+    assert nox["best_streak"] == 2
+    assert progress["attempts"] == 7
+    assert progress["best"] == 92.0
+    assert progress["grades"] == {"O": 3, "E": 1, "A": 1, "T": 1}
+    assert progress["grade_share"]["O"] == 0.5
+    assert progress["streak"] == 3 and progress["best_streak"] == 4
+
+def test_summarize_empty_history():
+    progress = summarize([])
+    assert progress["best"] is None
+    assert progress["streak"] == 0
+    assert progress["grade_share"] == {"O": 0.0, "E": 0.0, "A": 0.0, "T": 0.0}
+
+def test_profile_shows_progress_dashboard(client):
+    user_id = ObjectId()
+    db = logged_in(client, user_id)
+    db.users.find_one.return_value = {"_id": user_id, "username": "Harry", "email": "h@x.com"}
+    stats = db.__getitem__.return_value
+    stats.find.return_value.sort.return_value = [
+        stats_doc("Lumos", attempts=120000, scored=120000, total=9e6, best=97.5, ema=81.2,
+                  grades={"O": 100000, "E": 20000}, streak=1, best_streak=9,
+                  last_day=day_number(datetime.now(tz=timezone.utc)),
+                  last_at=datetime(2024, 1, 1, tzinfo=timezone.utc)),
+    ]
+    with patch.object(client.application, 'db', new=db):
+        page = client.get('/profile')
+        api = client.get('/api/progress')
+    assert b"97.5" in page.data and b"81.2" in page.data
+    assert b"100000 / 20000 / 0 / 0" in page.data
+    db.__getitem__.assert_any_call("attempt_stats")
+    assert stats.find.call_args.args[0] == {"user": str(user_id)}
+    assert api.json["attempts"] == 120000
+    assert api.json["spells"][0]["last_at"].startswith("2024-01-01")
+
+def test_attempt_audio_proxies_ranges_for_owner(client):
+    user_id = ObjectId()
+    file_id = ObjectId()
+    db = logged_in(client, user_id)
+    db.pronunciation_attempts.find_one.return_value = {"_id": ObjectId()}
+    upstream = MagicMock()
+    upstream.status_code = 206
+    upstream.headers = {"Content-Type": "audio/webm", "Content-Range": "bytes 0-3/10",
+                        "Content-Length": "4", "Accept-Ranges": "bytes", "Server": "uvicorn"}
+    upstream.iter_content.return_value = iter([b"01", b"23"])
+    ml_client = MagicMock()
+    ml_client.stream_audio.return_value = upstream
+    with patch.object(client.application, 'db', new=db), \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        response = client.get(f'/api/attempts/{file_id}/audio', headers={"Range": "bytes=0-3"})
+        assert response.status_code == 206
+        assert response.data == b"0123"
+    assert response.headers["Content-Range"] == "bytes 0-3/10"
+    assert "uvicorn" not in response.headers.get("Server", "")
+    ml_client.stream_audio.assert_called_once_with(str(file_id), "bytes=0-3")
+    assert db.pronunciation_attempts.find_one.call_args.args[0] == {
+        "audio_file_id": file_id, "user": str(user_id)}
+    upstream.close.assert_called_once()
+
+def test_attempt_audio_hides_other_users_clips(client):
+    db = logged_in(client, ObjectId())
+    db.pronunciation_attempts.find_one.return_value = None
+    ml_client = MagicMock()
+    with patch.object(client.application, 'db', new=db), \
+            patch.object(client.application, 'ml_client', new=ml_client):
+        assert client.get(f'/api/attempts/{ObjectId()}/audio').status_code == 404
+        assert client.get('/api/attempts/not-an-id/audio').status_code == 404
+    ml_client.stream_audio.assert_not_called()
+
+def test_ml_client_stream_audio_passes_range():
+    ml_client, session = make_ml_client(fake_response(206, {}))
+    resp = ml_client.stream_audio("abc", "bytes=5-")
+    assert resp.status_code == 206
+    kwargs = session.request.call_args.kwargs
+    assert kwargs["headers"] == {"Range": "bytes=5-"} and kwargs["stream"] is True
+
+def test_user_model_is_compact_and_has_no_password():
+    user = User({"_id": ObjectId(), "username": "Harry", "email": "h@x.com", "password": "secret"})
+    assert not hasattr(user, "password")
+    assert not hasattr(user, "__dict__")
+    with pytest.raises(AttributeError):
+        user.password = "secret"
+    assert user.is_authenticated and not user.is_anonymous
+    assert user.get_id() == user.id
+    assert user == User({"_id": ObjectId(user.id)})
+
+def test_authenticated_requests_reuse_cached_user(client):
+    user_id = ObjectId()
+    db = logged_in(client, user_id)
+    db.users.find_one.return_value = {"_id": user_id, "username": "Harry", "email": "h@x.com"}
+    with patch.object(client.application, 'db', new=db):
+        for _ in range(3):
+            assert client.get('/profile').status_code == 200
+    db.users.find_one.assert_called_once_with({"_id": user_id}, User.FIELDS)
+    assert client.application.user_cache.stats()["hits"] == 2
+
+def test_logout_invalidates_cached_user(client):
+    user_id = ObjectId()
+    db = logged_in(client, user_id)
+    with patch.object(client.application, 'db', new=db):
+        client.get('/profile')
+        client.get('/logout')
+    assert client.application.user_cache.stats()["entries"] == 0
+
+def test_user_cache_expires_entries():
+    now = [0.0]
+    cache = UserCache(ttl=10, clock=lambda: now[0])
+    load = MagicMock(side_effect=["first", "second"])
+    assert cache.get("u1", load) == "first"
+    assert cache.get("u1", load) == "first"
+    now[0] = 11
+    assert cache.get("u1", load) == "second"
+    cache.invalidate("u1")
+    assert cache.get("u2", lambda: None) is None
+    assert cache.stats()["entries"] == 0
+
+FAST = ScryptParams(n=2**4, r=8, p=1)
+
+def test_password_hash_round_trip():
+    stored = hash_password("secret", FAST)
+    assert is_hashed(stored) and "secret" not in stored
+    assert stored != hash_password("secret", FAST)  # salted
+    assert verify_password(stored, "secret", FAST) == (True, False)
+    assert verify_password(stored, "wrong", FAST) == (False, False)
+    # A cost change flags the old hash for upgrade
+    assert verify_password(stored, "secret", ScryptParams(n=2**5)) == (True, True)
+
+def test_legacy_plaintext_and_garbage_passwords():
+    assert verify_password("secret", "secret", FAST) == (True, True)
+    assert verify_password("secret", "Secret", FAST) == (False, True)
+    assert verify_password("scrypt$bad", "secret", FAST) == (False, False)
+    assert verify_password(None, "secret", FAST) == (False, False)
+    with pytest.raises(ValueError):
+        ScryptParams(n=1000)
+
+def test_login_upgrades_plaintext_password(client):
+    user_id = ObjectId()
+    user_doc = {"_id": user_id, "username": "Harry", "email": "harry@gmail.com", "password": "secret"}
+    client.application.passwords = PasswordHasher(FAST)
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = user_doc
+        response = client.post('/login', data={"email": "harry@gmail.com", "password": "secret"})
+    assert response.status_code == 302
+    query, update = mock_db.users.update_one.call_args.args
+    assert query == {"_id": user_id, "password": "secret"}
+    new_hash = update["$set"]["password"]
+    assert verify_password(new_hash, "secret", FAST) == (True, False)
+
+def test_login_with_current_hash_does_not_rewrite(client):
+    user_doc = {"_id": ObjectId(), "email": "harry@gmail.com", "password": hash_password("secret", FAST)}
+    client.application.passwords = PasswordHasher(FAST)
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = user_doc
+        response = client.post('/login', data={"email": "harry@gmail.com", "password": "secret"})
+    assert response.status_code == 302
+    mock_db.users.update_one.assert_not_called()
+
+def test_register_stores_hash_not_password(client):
+    client.application.passwords = PasswordHasher(FAST)
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = None
+        mock_db.users.insert_one.return_value.inserted_id = ObjectId()
+        client.post('/register', data={"username": "Ron", "email": "ron@x.com", "password": "scabbers"})
+    stored = mock_db.users.insert_one.call_args.args[0]["password"]
+    assert verify_password(stored, "scabbers", FAST) == (True, False)
+
+def test_login_when_hasher_saturated_returns_503(client):
+    hasher = MagicMock()
+    hasher.verify.side_effect = PasswordHasherBusy(retry_after=2)
+    client.application.passwords = hasher
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = {"_id": ObjectId(), "password": "x"}
+        response = client.post('/login', data={"email": "harry@gmail.com", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+def test_login_succeeds_when_only_the_rehash_is_busy(client):
+    hasher = MagicMock()
+    hasher.verify.return_value = (True, True)
+    hasher.hash.side_effect = PasswordHasherBusy(retry_after=2)
+    client.application.passwords = hasher
+    with patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = {"_id": ObjectId(), "email": "harry@gmail.com",
+                                               "username": "Harry", "password": "secret"}
+        response = client.post('/login', data={"email": "harry@gmail.com", "password": "secret"})
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/profile")
+    mock_db.users.update_one.assert_not_called()
+
+def test_password_hasher_rejects_past_queue_limit():
+    hasher = PasswordHasher(FAST, workers=1, max_queue=0)
+    hasher._pending = 1  # the only slot is taken
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("secret")
+    assert hasher.stats()["rejected"] == 1
+    hasher._pending = 0
+    assert hasher.verify(hasher.hash("secret"), "secret") == (True, False)
+    hasher.shutdown()
+
+def test_password_hasher_timeout_is_busy_not_an_error(client):
+    import threading
+    release = threading.Event()
+    hasher = PasswordHasher(FAST, workers=1, timeout=0.05)
+    client.application.passwords = hasher
+    with patch("passwords.verify_password", side_effect=lambda *a: release.wait(5) and (True, False)), \
+            patch.object(client.application, 'db', new=MagicMock()) as mock_db:
+        mock_db.users.find_one.return_value = {"_id": ObjectId(), "password": "x"}
+        response = client.post('/login', data={"email": "harry@gmail.com", "password": "secret"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # The derivation still running keeps its slot until it finishes
+        assert hasher.stats()["pending"] == 1
+        release.set()
+    hasher.shutdown()
+
+def load_seed_module():
+    import importlib.util
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "seed", "seed.py")
+    spec = importlib.util.spec_from_file_location("seed_script", path)
+    seed = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(seed)
+    return seed
+
+def test_seed_image_ships_this_password_module():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    with open(os.path.join(root, "seed", "Dockerfile"), encoding="utf-8") as f:
+        assert "COPY web_app/passwords.py ." in f.read().splitlines()
+    seed = load_seed_module()
+    assert os.path.samefile(sys.modules[seed.hash_password.__module__].__file__,
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "passwords.py"))
+
+def test_seeded_passwords_verify_in_the_web_app():
+    seed = load_seed_module()
+    col = MagicMock()
+    col.find.return_value = []
+    col.bulk_write.return_value.bulk_api_result = {"nUpserted": 1}
+    seed.seed_users(col, [{"email": "ron@x.com", "password": "scabbers"}], 10, FAST)
+    stored = col.bulk_write.call_args.args[0][0]._doc["$setOnInsert"]["password"]
+    assert is_hashed(stored)
+    assert verify_password(stored, "scabbers", FAST) == (True, False)
+
+def load_gunicorn_conf(monkeypatch, **env):
+    import importlib.util
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    return conf
+
+def test_gunicorn_conf_reads_env_and_builds_app_per_worker(monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch, WEB_WORKERS="3", WEB_THREADS="12", PORT="8080")
+    assert (conf.workers, conf.threads, conf.worker_connections) == (3, 12, 12)
+    assert conf.bind == "0.0.0.0:8080"
+    assert conf.worker_class == "gthread"
+    assert conf.preload_app is False
+
+def test_gunicorn_worker_exit_releases_pools(monkeypatch):
+    conf = load_gunicorn_conf(monkeypatch)
+    worker = MagicMock()
+    conf.worker_exit(None, worker)
+    worker.wsgi.passwords.shutdown.assert_called_once()
+    worker.wsgi.db.client.close.assert_called_once()
+
+class FakeSocket:
+    """Just enough of a simple-websocket connection for the relay."""
+
+    def __init__(self, incoming=(), close_when_empty=False):
+        self.incoming = list(incoming)
+        self.close_when_empty = close_when_empty
+        self.sent = []
+        self.closed = False
+
+    def receive(self, timeout=None):
+        if self.incoming:
+            return self.incoming.pop(0)
+        if self.close_when_empty:
+            raise ws_proxy.ConnectionClosed()
+        return None
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def close(self):
+        self.closed = True
+
+def test_ws_proxy_relays_audio_up_and_events_down():
+    import json
+    browser = FakeSocket([b"\x00\x01" * 800, b"\x02\x03" * 800], close_when_empty=True)
+    events = [json.dumps({"event": "speech_start"}), json.dumps({"event": "speech_end"}),
+              json.dumps({"event": "result", "grade": "O"})]
+    upstream = FakeSocket(events)
+
+    ws_proxy.relay(browser, upstream, {"spell": "Lumos", "user": "u1"})
+
+    assert json.loads(upstream.sent[0]) == {"spell": "Lumos", "user": "u1"}
+    assert upstream.sent[1:] == [b"\x00\x01" * 800, b"\x02\x03" * 800]
+    assert browser.sent == events
+    assert upstream.closed
+
+def test_ws_proxy_reports_a_dropped_upstream():
+    import json
+    browser = FakeSocket()
+    upstream = FakeSocket([json.dumps({"event": "speech_start"})], close_when_empty=True)
+
+    ws_proxy.relay(browser, upstream, {"spell": "Lumos"})
+
+    assert json.loads(browser.sent[-1]) == {"event": "error", "error": "ML service closed the stream"}
+
+def test_ml_client_ws_url():
+    assert MLServiceClient("http://ml-proxy:8000").ws_url("/ws/assess") == "ws://ml-proxy:8000/ws/assess"
+    assert MLServiceClient("https://ml.example").ws_url("/ws/assess") == "wss://ml.example/ws/assess"
+
+def test_ws_proxy_is_registered_only_with_flask_sock(client):
+    assert client.application.streaming is (ws_proxy.Sock is not None)
@@ -0,0 +1,50 @@
+"""
+gunicorn settings for the web app. Worker and thread counts, timeouts and
+the port can be set from the environment:
+
+    WEB_WORKERS, WEB_THREADS, WEB_WORKER_CONNECTIONS, WEB_TIMEOUT,
+    WEB_GRACEFUL_TIMEOUT, PORT
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+# Requests mostly wait on the ML service or Mongo, so each worker process
+# runs a pool of threads. Processes add CPU parallelism for templates,
+# JSON and compression.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_WORKERS", str(min(4, 2 * (os.cpu_count() or 1)))))
+threads = int(os.getenv("WEB_THREADS", "8"))
+# A gthread worker otherwise accepts every connection it can, and keep-alive
+# clients then stay pinned to it while other workers sit idle. Taking no
+# more connections than threads leaves the rest to the other workers.
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", str(threads)))
+
+# MongoClient is not fork-safe: never build the app in the master and
+# share it. Each worker imports wsgi.py and creates its own.
+preload_app = False
+
+# A worker that stops responding this long is restarted. gthread workers
+# keep notifying the master while requests run, so long uploads, job
+# long-polls and SSE streams don't trip it.
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+# On SIGTERM, in-flight requests get this long to finish
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def worker_exit(server, worker):  # pylint: disable=unused-argument
+    """Release the worker's pools and connections once it has drained."""
+    app = getattr(worker, "wsgi", None)
+    if app is None:
+        return
+    passwords = getattr(app, "passwords", None)
+    if passwords is not None:
+        passwords.shutdown()
+    db = getattr(app, "db", None)
+    if db is not None:
+        db.client.close()
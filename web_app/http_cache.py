@@ -0,0 +1,145 @@
+"""Precompressed, validator-aware response bodies for cacheable JSON endpoints."""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timezone
+
+from flask import Response
+
+try:
+    import brotli  # pylint: disable=import-error
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+
+class PrecompressedBody:
+    """
+    One serialized representation plus its encodings, computed once.
+    The strong ETag is derived from the uncompressed bytes; each encoding
+    gets its own suffix, as RFC 9110 requires for strong validators.
+    """
+
+    def __init__(self, body, last_modified=None, mimetype="application/json", headers=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.headers = headers or {}
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Body bytes in the given content-encoding, compressed at most once."""
+        data = self._encoded.get(encoding)
+        if data is not None:
+            return data
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == "br":
+                    self._encoded[encoding] = brotli.compress(self.body, quality=11)
+                else:
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            return self._encoded[encoding]
+
+    def etag_for(self, encoding):
+        """Quoted strong ETag of one encoding."""
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.etag}{suffix}"'
+
+
+class BodyCache:
+    """Small LRU of PrecompressedBody objects keyed by whatever shapes the body."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        """Return the cached body for `key`, calling `build()` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = build()
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+def choose_encoding(accept_encoding):
+    """Pick br, gzip or identity from an Accept-Encoding header, honouring q=0."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        pieces = [p.strip() for p in part.split(";")]
+        name = pieces[0].lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        offered[name] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def _matches(if_none_match, body):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.split("-")[0] == body.etag:
+            return True
+    return False
+
+
+def cached_response(body, request, cache_control="public, max-age=60, must-revalidate"):
+    """Serve `body` for `request`: 304 when validators match, else the best encoding."""
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if len(body.body) < MIN_COMPRESS_BYTES:
+        encoding = "identity"
+
+    not_modified = _matches(request.headers.get("If-None-Match"), body)
+    if not not_modified and "If-None-Match" not in request.headers and body.last_modified:
+        since = request.if_modified_since
+        if since is not None:
+            modified = body.last_modified.replace(microsecond=0)
+            if modified.tzinfo is None:
+                modified = modified.replace(tzinfo=timezone.utc)
+            not_modified = modified <= since
+
+    if not_modified:
+        resp = Response(status=304)
+    else:
+        resp = Response(body.encoded(encoding), mimetype=body.mimetype)
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+    resp.headers["ETag"] = body.etag_for(encoding)
+    if body.last_modified:
+        resp.last_modified = body.last_modified
+    resp.headers["Cache-Control"] = cache_control
+    for name, value in body.headers.items():
+        resp.headers[name] = value
+    resp.vary.add("Accept-Encoding")
+    return resp
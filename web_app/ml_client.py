@@ -0,0 +1,298 @@
+"""Pooled, retrying, circuit-broken HTTP client for the ML service."""
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Status codes that mean "not handled, safe to send again"
+RETRYABLE_STATUSES = {502, 503, 504}
+# A POST may have been acted on behind a 502/504 from the proxy; only our own
+# admission control (503) guarantees it was not
+UNPROCESSED_STATUSES = {503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class MLServiceError(RuntimeError):
+    """The ML service could not produce a usable answer."""
+
+    def __init__(self, message, status_code=502, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(MLServiceError):
+    """Calls are being short-circuited because the ML service keeps failing."""
+
+    def __init__(self, retry_after):
+        super().__init__("ML service unavailable, try again shortly", 503, retry_after)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds. Then one trial call is let
+    through; its outcome closes the circuit or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half-open'."""
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+            raise CircuitOpenError(retry_after=max(1, int(remaining + 0.999)))
+
+    def record_success(self):
+        """A call succeeded: close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """A call failed: count it and open the circuit past the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class MLServiceClient:
+    """
+    Talk to the ML service over a keep-alive connection pool.
+
+    Idempotent requests that failed on the way (connection error, or
+    502/503/504) are retried with full-jitter exponential backoff inside an
+    overall deadline. Other methods are retried only when the request
+    provably was not processed: the connection was never made, or the
+    service answered 503. Read timeouts are never retried since the service
+    may still be working on the request.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        base_url,
+        *,
+        pool_size=10,
+        connect_timeout=3.05,
+        read_timeout=60.0,
+        total_timeout=75.0,
+        max_retries=2,
+        backoff_base=0.25,
+        backoff_max=2.0,
+        breaker=None,
+        session=None,
+    ):
+        self.base_url = (base_url or "").rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    @classmethod
+    def from_env(cls):
+        """Client configured from ML_SERVICE_URL and ML_* tuning variables."""
+        return cls(
+            os.getenv("ML_SERVICE_URL"),
+            pool_size=int(os.getenv("ML_POOL_SIZE", "10")),
+            connect_timeout=float(os.getenv("ML_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("ML_READ_TIMEOUT", "60")),
+            total_timeout=float(os.getenv("ML_TOTAL_TIMEOUT", "75")),
+            max_retries=int(os.getenv("ML_MAX_RETRIES", "2")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("ML_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("ML_BREAKER_RESET", "30")),
+            ),
+        )
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def request(self, method, path, **kwargs):
+        """
+        Send a request through the breaker with retries; return the response.
+        Raises MLServiceError / CircuitOpenError when no usable response came back.
+        """
+        deadline = time.monotonic() + self.total_timeout
+        url = self.base_url + path
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retryable = RETRYABLE_STATUSES if idempotent else UNPROCESSED_STATUSES
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            retry_after = None
+            try:
+                remaining = deadline - time.monotonic()
+                resp = self.session.request(
+                    method,
+                    url,
+                    timeout=(self.connect_timeout, max(0.1, min(self.read_timeout, remaining))),
+                    **kwargs,
+                )
+            except requests.exceptions.ConnectionError as e:
+                self.breaker.record_failure()
+                error = MLServiceError(f"Could not reach ML service: {e}")
+                if not (idempotent or _never_sent(e)):
+                    # Reset mid-request: the service may have acted on it
+                    raise error from e
+            except requests.exceptions.Timeout as e:
+                self.breaker.record_failure()
+                raise MLServiceError(f"ML service timed out: {e}", 504) from e
+            except requests.exceptions.RequestException as e:
+                # Anything else (broken chunked body, bad URL...) still has to
+                # settle the call, or a half-open trial would never be released
+                self.breaker.record_failure()
+                raise MLServiceError(f"ML service request failed: {e}") from e
+            else:
+                if resp.status_code not in RETRYABLE_STATUSES and resp.status_code < 500:
+                    self.breaker.record_success()
+                    return resp
+                if resp.status_code == 503:
+                    # Our own admission control: overloaded, not broken
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                if resp.status_code not in retryable:
+                    return resp
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                # Hand a streamed connection back to the pool before retrying
+                resp.close()
+                error = MLServiceError(
+                    f"ML service returned {resp.status_code}",
+                    503 if resp.status_code == 503 else 502,
+                    retry_after,
+                )
+
+            delay = self._backoff(attempt, retry_after)
+            if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    def ws_url(self, path):
+        """WebSocket URL of an ml-client endpoint."""
+        scheme, _, rest = self.base_url.partition("://")
+        return f"{'wss' if scheme == 'https' else 'ws'}://{rest}{path}"
+
+    def assess(self, spell, filename, audio_bytes, mimetype="audio/webm", user=None):
+        """POST a recording to /assess and return the decoded JSON result."""
+        data = {"spell": spell}
+        if user:
+            data["user"] = user
+        resp = self.request(
+            "POST",
+            "/assess",
+            files={"audio": (filename, audio_bytes, mimetype)},
+            data=data,
+        )
+        return _json(resp)
+
+    def submit_job(self, spell, filename, audio_bytes, mimetype="audio/webm", user=None):
+        """Queue a recording for assessment; returns {"job_id", "status"} at once."""
+        data = {"spell": spell}
+        if user:
+            data["user"] = user
+        resp = self.request(
+            "POST",
+            "/jobs",
+            files={"audio": (filename, audio_bytes, mimetype)},
+            data=data,
+        )
+        return _json(resp)
+
+    def get_job(self, job_id, wait=0.0):
+        """A job's status and result, long-polling up to `wait` seconds."""
+        resp = self.request("GET", f"/jobs/{job_id}", params={"wait": wait})
+        if resp.status_code == 404:
+            raise MLServiceError("Job not found", 404)
+        return _json(resp)
+
+    def stream_audio(self, file_id, range_header=None):
+        """
+        Open a stored clip as a streamed response; the caller iterates
+        `iter_content` and closes it. A Range header is passed through.
+        """
+        headers = {"Range": range_header} if range_header else {}
+        resp = self.request("GET", f"/audio/{file_id}", headers=headers, stream=True)
+        if resp.status_code == 404:
+            resp.close()
+            raise MLServiceError("Audio not found", 404)
+        return resp
+
+
+def _json(resp):
+    try:
+        result = resp.json()
+    except ValueError as e:
+        raise MLServiceError("Invalid response from ML service", 500) from e
+    if resp.status_code >= 500:
+        detail = result.get("detail") or result.get("error") or resp.reason
+        raise MLServiceError(f"ML service error: {detail}", 502)
+    if resp.status_code >= 400:
+        # The upload itself was refused (e.g. no speech in it): pass the reason on
+        detail = result.get("detail") or result.get("error") or resp.reason
+        raise MLServiceError(str(detail), resp.status_code)
+    return result
+
+
+def _never_sent(error):
+    """Whether a ConnectionError happened before any of the request went out."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError; its reason says what went wrong
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -1,8 +1,34 @@
-from flask_login import UserMixin
+class User:
+    """
+    The logged-in user as Flask-Login sees it: just the fields pages need.
+    The stored document (password hash included) is never kept around.
+    """
+
+    __slots__ = ("id", "username", "email")
+
+    # Fields to project when loading a user for the session
+    FIELDS = {"username": 1, "email": 1}
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
 
-class User(UserMixin):
     def __init__(self, doc):
         self.id = str(doc.get("_id"))
         self.username = doc.get("username", "")
         self.email = doc.get("email", "")
-        self.password = doc.get("password", "")
\ No newline at end of file
+
+    def get_id(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.id == other.id
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.id)
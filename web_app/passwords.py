@@ -0,0 +1,200 @@
+"""
+Password hashing with scrypt, run on a small bounded pool.
+
+Hashes are stored as ``scrypt$<n>$<r>$<p>$<salt>$<key>`` (base64 salt
+and key), so the cost can be raised later. Older hashes, including the
+plaintext passwords stored before hashing existed, still verify and are
+flagged for re-hashing.
+
+This module only depends on the standard library, so the seed image
+can use it too.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class ScryptParams:
+    """scrypt cost: CPU/memory cost n (a power of two), block size r, parallelism p."""
+
+    __slots__ = ("n", "r", "p")
+
+    def __init__(self, n=2**14, r=8, p=1):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of two greater than 1")
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @classmethod
+    def from_env(cls):
+        """Cost from PASSWORD_SCRYPT_N / PASSWORD_SCRYPT_R / PASSWORD_SCRYPT_P."""
+        return cls(
+            n=int(os.getenv("PASSWORD_SCRYPT_N", str(2**14))),
+            r=int(os.getenv("PASSWORD_SCRYPT_R", "8")),
+            p=int(os.getenv("PASSWORD_SCRYPT_P", "1")),
+        )
+
+    @property
+    def maxmem(self):
+        """Memory limit that comfortably fits these parameters."""
+        return 256 * self.n * self.r * self.p + (1 << 20)
+
+    def __eq__(self, other):
+        return isinstance(other, ScryptParams) and (self.n, self.r, self.p) == (
+            other.n,
+            other.r,
+            other.p,
+        )
+
+    def __hash__(self):
+        return hash((self.n, self.r, self.p))
+
+    def __repr__(self):
+        return f"ScryptParams(n={self.n}, r={self.r}, p={self.p})"
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _derive(password, salt, params):
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=params.n,
+        r=params.r,
+        p=params.p,
+        maxmem=params.maxmem,
+        dklen=KEY_BYTES,
+    )
+
+
+def is_hashed(stored):
+    """Whether a stored password is already in our hash format."""
+    return isinstance(stored, str) and stored.startswith(PREFIX + "$")
+
+
+def hash_password(password, params=None):
+    """Hash `password` with a fresh salt."""
+    params = params or ScryptParams()
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, params)
+    return f"{PREFIX}${params.n}${params.r}${params.p}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(stored, password, params=None):
+    """
+    Check `password` against a stored value.
+    Returns (matches, needs_rehash). needs_rehash is True for legacy
+    plaintext values and for hashes made with other cost parameters.
+    """
+    params = params or ScryptParams()
+    if not stored or password is None:
+        return False, False
+    if not is_hashed(stored):
+        # Stored before hashing was introduced
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        stored_params = ScryptParams(int(n), int(r), int(p))
+        expected = _unb64(key)
+        actual = _derive(password, _unb64(salt), stored_params)
+    except (ValueError, TypeError):
+        return False, False
+    matches = hmac.compare_digest(expected, actual)
+    return matches, matches and stored_params != params
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Too many hash operations are already queued."""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Too many sign-in attempts right now, please try again shortly")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Run scrypt on a dedicated, bounded thread pool.
+
+    hashlib.scrypt releases the GIL, so request threads only wait on the
+    result. At most `workers` derivations run at once, which caps CPU and
+    memory (about 128 * n * r bytes each). Past `max_queue` waiting
+    requests, or after waiting `timeout` seconds for a result, callers
+    get PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, params=None, workers=2, max_queue=32, timeout=10.0):
+        self.params = params or ScryptParams()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Hasher tuned by PASSWORD_SCRYPT_* and PASSWORD_WORKERS / PASSWORD_QUEUE."""
+        return cls(
+            ScryptParams.from_env(),
+            workers=int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            max_queue=int(os.getenv("PASSWORD_QUEUE", "32")),
+        )
+
+    def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            future = self._pool.submit(func, *args)
+        except BaseException:
+            self._done()
+            raise
+        # A timed-out derivation still holds its slot until it really ends
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy() from e
+
+    def _done(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        """Hash with the configured cost."""
+        return self._run(hash_password, password, self.params)
+
+    def verify(self, stored, password):
+        """(matches, needs_rehash), see verify_password."""
+        return self._run(verify_password, stored, password, self.params)
+
+    def stats(self):
+        """Queue depth and rejections."""
+        with self._lock:
+            return {"pending": self._pending, "workers": self.workers, "rejected": self.rejected}
+
+    def shutdown(self):
+        """Stop the pool."""
+        self._pool.shutdown(wait=False)
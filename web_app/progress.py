@@ -0,0 +1,84 @@
+"""Per-user progress built from the rolling attempt_stats documents."""
+
+from datetime import datetime, timezone
+
+# The O/E/A/T buckets the ML service grades scores into
+GRADES = (
+    ("O", "Outstanding"),
+    ("E", "Exceeds Expectations"),
+    ("A", "Acceptable"),
+    ("T", "Troll"),
+)
+STATS_FIELDS = {
+    "_id": 0,
+    "spell": 1,
+    "attempts": 1,
+    "scored": 1,
+    "total": 1,
+    "best": 1,
+    "ema": 1,
+    "recent": 1,
+    "grades": 1,
+    "streak": 1,
+    "best_streak": 1,
+    "last_day": 1,
+    "last_at": 1,
+}
+
+
+def day_number(moment):
+    """Days since the epoch (UTC), as the ML service counts streak days."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) // 86400
+
+
+def spell_progress(doc, today):
+    """Dashboard row for one stats document."""
+    scored = doc.get("scored", 0)
+    grades = doc.get("grades") or {}
+    last_day = doc.get("last_day")
+    # A streak survives until a whole day passes without practice
+    alive = last_day is not None and today - last_day <= 1
+    return {
+        "spell": doc.get("spell"),
+        "attempts": doc.get("attempts", 0),
+        "best": doc.get("best"),
+        "average": doc.get("total", 0.0) / scored if scored else None,
+        "moving_average": doc.get("ema"),
+        "recent": doc.get("recent") or [],
+        "grades": {grade: grades.get(grade, 0) for grade, _ in GRADES},
+        "streak": doc.get("streak", 0) if alive else 0,
+        "best_streak": doc.get("best_streak", 0),
+        "last_at": doc.get("last_at"),
+    }
+
+
+def summarize(stats_docs, now=None):
+    """
+    Fold per-spell stats into the dashboard: one row per spell plus
+    totals. Work is proportional to the number of spells practised,
+    never to the number of attempts.
+    """
+    today = day_number(now or datetime.now(tz=timezone.utc))
+    spells = [spell_progress(doc, today) for doc in stats_docs]
+    grades = {grade: sum(s["grades"][grade] for s in spells) for grade, _ in GRADES}
+    graded = sum(grades.values())
+    best = [s["best"] for s in spells if s["best"] is not None]
+    return {
+        "spells": spells,
+        "attempts": sum(s["attempts"] for s in spells),
+        "spells_practised": len(spells),
+        "best": max(best) if best else None,
+        "grades": grades,
+        "grade_share": {g: (n / graded if graded else 0.0) for g, n in grades.items()},
+        "grade_labels": dict(GRADES),
+        "streak": max((s["streak"] for s in spells), default=0),
+        "best_streak": max((s["best_streak"] for s in spells), default=0),
+    }
+
+
+def load_progress(db, user_id, now=None):
+    """Read a user's stats documents (one indexed query) and summarize them."""
+    docs = db["attempt_stats"].find({"user": user_id}, STATS_FIELDS).sort("spell", 1)
+    return summarize(docs, now)
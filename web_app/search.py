@@ -0,0 +1,179 @@
+"""Ranked, prefix- and typo-tolerant search over the spell catalogue."""
+
+import bisect
+import re
+import unicodedata
+
+# How much a hit in each field counts towards a spell's rank
+FIELD_WEIGHTS = {"spell": 3.0, "pronunciation": 2.0, "description": 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+MIN_PREFIX = 2
+MAX_QUERY_TERMS = 8
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """Lower-case, strip accents, keep only letters and digits."""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """Split text into normalized word tokens."""
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(token):
+    """Padded character trigrams of a token."""
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def within_distance(a, b, limit):
+    """True when the Damerau-Levenshtein distance between a and b is <= limit."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev_prev is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        if min(cur) > limit:
+            return False
+        prev_prev, prev = prev, cur
+    return prev[-1] <= limit
+
+
+def _typo_budget(term):
+    if len(term) <= 3:
+        return 0
+    return 1 if len(term) <= 6 else 2
+
+
+class SpellSearchIndex:
+    """
+    Inverted index over spell names, pronunciations and descriptions.
+
+    Each query term matches tokens exactly, by prefix, or within a small
+    edit distance found through a trigram index. A spell must match every
+    term, and results are ranked by weighted field hits. Input is only
+    ever tokenized, never compiled into a pattern.
+    """
+
+    def __init__(self, spells):
+        self.spells = list(spells)
+        self._postings = {}  # token -> {doc index: weight}
+        self._trigrams = {}  # trigram -> set of tokens
+        self._names = []
+        for idx, spell in enumerate(self.spells):
+            self._names.append(normalize(spell.get("spell")))
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in self._field_tokens(field, spell.get(field)):
+                    postings = self._postings.setdefault(token, {})
+                    postings[idx] = max(postings.get(idx, 0.0), weight)
+        for token in self._postings:
+            for gram in trigrams(token):
+                self._trigrams.setdefault(gram, set()).add(token)
+        self._sorted_tokens = sorted(self._postings)
+        # Alphabetical position of each spell, used to break score ties
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._name_rank = [0] * len(order)
+        for position, idx in enumerate(order):
+            self._name_rank[idx] = position
+
+    @staticmethod
+    def _field_tokens(field, value):
+        tokens = tokenize(value)
+        if field == "pronunciation":
+            # "ah-LOH-ho-MOR-ah" is also searchable as "ahlohhomorah"
+            tokens += ["".join(tokenize(word)) for word in (value or "").split()]
+        return tokens
+
+    def _prefix_tokens(self, term):
+        start = bisect.bisect_left(self._sorted_tokens, term)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(term):
+                break
+            yield token
+
+    def _fuzzy_tokens(self, term):
+        budget = _typo_budget(term)
+        if budget == 0:
+            return
+        grams = trigrams(term)
+        counts = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                counts[token] = counts.get(token, 0) + 1
+        # Each edit can destroy at most three trigrams
+        needed = max(1, len(grams) - 3 * budget)
+        for token, shared in counts.items():
+            if shared >= needed and within_distance(term, token, budget):
+                yield token
+
+    def _term_tokens(self, term):
+        """Index tokens a query term matches, with their match factor."""
+        matched = {term: EXACT} if term in self._postings else {}
+        if len(term) >= MIN_PREFIX:
+            for token in self._prefix_tokens(term):
+                matched.setdefault(token, PREFIX)
+        for token in self._fuzzy_tokens(term):
+            matched.setdefault(token, FUZZY)
+        return matched
+
+    def _score(self, tokens, candidates=None):
+        """Best weighted hit per document, optionally only for `candidates`."""
+        scores = {}
+        if candidates is None:
+            for token, factor in tokens.items():
+                for idx, weight in self._postings[token].items():
+                    if weight * factor > scores.get(idx, 0.0):
+                        scores[idx] = weight * factor
+            return scores
+        postings = [(self._postings[token], factor) for token, factor in tokens.items()]
+        for idx in candidates:
+            best = 0.0
+            for posting, factor in postings:
+                weight = posting.get(idx)
+                if weight is not None and weight * factor > best:
+                    best = weight * factor
+            if best:
+                scores[idx] = best
+        return scores
+
+    def search(self, query, limit=None):
+        """Spells matching every term of `query`, best first."""
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        matches = [self._term_tokens(term) for term in terms]
+        # Start from the most selective term and only narrow from there
+        matches.sort(key=lambda tokens: sum(len(self._postings[t]) for t in tokens))
+        totals = None
+        for tokens in matches:
+            if not tokens:
+                return []
+            scores = self._score(tokens, totals)
+            if totals is not None:
+                scores = {idx: totals[idx] + score for idx, score in scores.items()}
+            totals = scores
+            if not totals:
+                return []
+
+        whole = " ".join(terms)
+        rank = self._name_rank
+        ranked = sorted(
+            totals.items(),
+            key=lambda item: (
+                -(item[1] + (10.0 if self._names[item[0]] == whole else 0.0)),
+                rank[item[0]],
+            ),
+        )
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.spells[idx] for idx, _ in ranked]
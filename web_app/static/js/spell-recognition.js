@@ -156,6 +156,42 @@ let audioChunks = [];
 let isRecording = false;
 let audioStream = null;
 let currentMimeType = 'audio/webm';
+// Live session streaming PCM to /ws/assess while the MediaRecorder runs as a fallback
+let liveStream = null;
+
+const STREAM_SAMPLE_RATE = 16000;
+// Resamples the microphone to 16 kHz mono int16 and posts ~100 ms chunks
+const PCM_WORKLET = `
+class PcmDownsampler extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        this.ratio = sampleRate / options.processorOptions.targetRate;
+        this.position = 0;
+        this.chunk = new Int16Array(options.processorOptions.targetRate / 10);
+        this.filled = 0;
+    }
+    process(inputs) {
+        const input = inputs[0] && inputs[0][0];
+        if (!input) {
+            return true;
+        }
+        for (; this.position < input.length; this.position += this.ratio) {
+            const i = Math.floor(this.position);
+            const next = i + 1 < input.length ? input[i + 1] : input[i];
+            const sample = input[i] + (next - input[i]) * (this.position - i);
+            this.chunk[this.filled++] = Math.max(-1, Math.min(1, sample)) * 0x7fff;
+            if (this.filled === this.chunk.length) {
+                this.port.postMessage(this.chunk.buffer, [this.chunk.buffer]);
+                this.chunk = new Int16Array(this.chunk.length);
+                this.filled = 0;
+            }
+        }
+        this.position -= input.length;
+        return true;
+    }
+}
+registerProcessor('pcm-downsampler', PcmDownsampler);
+`;
 
 function initSpeechRecognition() {
     if (!('webkitSpeechRecognition' in window) && !('SpeechRecognition' in window)) {
@@ -536,7 +572,11 @@ function startRecording() {
     };
     
     mediaRecorder.onstop = () => {
-        uploadAudio();
+        // A live session that is still going will report (or fall back) itself,
+        // and one that already answered needs no upload
+        if (!liveStream && !(recordingSession && recordingSession.answered)) {
+            uploadAudio();
+        }
     };
     
     mediaRecorder.onerror = (event) => {
@@ -548,6 +588,9 @@ function startRecording() {
     
     mediaRecorder.start();
     isRecording = true;
+    startStreaming(currentSpell || 'Unknown');
+    // Set synchronously by startStreaming; null when streaming is unsupported
+    const recordingSession = liveStream;
     const spellName = currentSpell || 'Unknown spell';
     if (currentSpell) {
         loadSpellData().then(spellData => {
@@ -566,6 +609,9 @@ function startRecording() {
 
 function stopRecording() {
     if (mediaRecorder && isRecording) {
+        if (liveStream) {
+            liveStream.stop();
+        }
         mediaRecorder.stop();
         isRecording = false;
         updateOutputWindow('Processing audio...');
@@ -573,6 +619,122 @@ function stopRecording() {
     }
 }
 
+// Stream the microphone as 16 kHz PCM over a WebSocket so the attempt is
+// scored while it is spoken. The server says when the speech has ended,
+// which stops the recording; if the session fails, the MediaRecorder's
+// copy is uploaded as usual.
+async function startStreaming(spellName) {
+    if (!window.WebSocket || !window.AudioWorkletNode) {
+        return;
+    }
+    const scheme = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const session = { stopped: false, finished: false, answered: false };
+    liveStream = session;
+
+    const fallBack = (reason) => {
+        if (session.finished) {
+            return;
+        }
+        console.warn('Streaming unavailable, uploading instead:', reason);
+        finishStreaming(session);
+        // Once the recorder has stopped its onstop has been and gone; otherwise it uploads
+        if (mediaRecorder.state === 'inactive') {
+            uploadAudio();
+        }
+    };
+
+    try {
+        session.socket = new WebSocket(`${scheme}//${window.location.host}/ws/assess`);
+        session.socket.binaryType = 'arraybuffer';
+        session.context = new AudioContext();
+        const workletUrl = URL.createObjectURL(new Blob([PCM_WORKLET], { type: 'application/javascript' }));
+        await session.context.audioWorklet.addModule(workletUrl);
+        URL.revokeObjectURL(workletUrl);
+        session.source = session.context.createMediaStreamSource(audioStream);
+        session.node = new AudioWorkletNode(session.context, 'pcm-downsampler', {
+            processorOptions: { targetRate: STREAM_SAMPLE_RATE }
+        });
+    } catch (error) {
+        fallBack(error);
+        return;
+    }
+
+    // Audio recorded before the socket opens is queued, not lost
+    const pending = [];
+    session.node.port.onmessage = (event) => {
+        if (session.stopped || session.finished) {
+            return;
+        }
+        if (session.socket.readyState === WebSocket.OPEN) {
+            session.socket.send(event.data);
+        } else {
+            pending.push(event.data);
+        }
+    };
+    session.source.connect(session.node);
+
+    session.stop = () => {
+        if (session.stopped || session.finished) {
+            return;
+        }
+        session.stopped = true;
+        if (session.socket.readyState === WebSocket.OPEN) {
+            session.socket.send(JSON.stringify({ event: 'stop' }));
+        }
+    };
+
+    session.socket.onopen = () => {
+        session.socket.send(JSON.stringify({ spell: spellName, sample_rate: STREAM_SAMPLE_RATE }));
+        pending.splice(0).forEach((chunk) => session.socket.send(chunk));
+        if (session.stopped) {
+            session.socket.send(JSON.stringify({ event: 'stop' }));
+        }
+    };
+
+    session.socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.event === 'speech_end') {
+            // The server heard the end of the spell; no need to wait for a click
+            stopRecording();
+        } else if (message.event === 'result') {
+            // Answered: stop the recorder first so its onstop sees that
+            session.answered = true;
+            stopRecording();
+            finishStreaming(session);
+            console.log('ML result:', message);
+            renderSpellResult(message, spellName);
+        } else if (message.event === 'error') {
+            if (/no speech/i.test(message.error || '')) {
+                session.answered = true;
+                stopRecording();
+                finishStreaming(session);
+                updateOutputWindow('No speech detected. Please try again.');
+            } else {
+                fallBack(message.error);
+            }
+        }
+    };
+
+    session.socket.onerror = () => fallBack('WebSocket error');
+    session.socket.onclose = () => fallBack('WebSocket closed');
+}
+
+function finishStreaming(session) {
+    session.finished = true;
+    if (liveStream === session) {
+        liveStream = null;
+    }
+    if (session.source) {
+        session.source.disconnect();
+    }
+    if (session.context) {
+        session.context.close();
+    }
+    if (session.socket && session.socket.readyState <= WebSocket.OPEN) {
+        session.socket.close();
+    }
+}
+
 async function uploadAudio() {
     if (audioChunks.length === 0) {
         updateOutputWindow('No audio recorded. Please try again.');
@@ -588,49 +750,95 @@ async function uploadAudio() {
     formData.append('spell', spellName);
     
     try {
-        const response = await fetch('/api/audio', {
+        // The upload is queued and answered at once; the score arrives later
+        const response = await fetch('/api/audio/jobs', {
             method: 'POST',
             body: formData
         });
-        
-        const result = await response.json();
-        console.log('ML result:', result);
 
+        const job = await response.json();
         if (!response.ok) {
-            updateOutputWindow('Upload error: ' + (result.error || 'Unknown error'));
+            updateOutputWindow('Upload error: ' + (job.error || 'Unknown error'));
             return;
         }
 
-        const displaySpell = result.spell || spellName;
+        updateOutputWindow('Assessing your pronunciation...');
+        const finished = await waitForJob(job.job_id);
+        console.log('ML result:', finished);
 
-        if (result.success) {
-            const displaySpell = result.spell || spellName;
-            const grade = result.grade || 'N/A';
-            const comment = result.grade_label || '';
-
-            updateOutputWindow(
-                `Spell: ${displaySpell}<br>` +
-                // `You said: "${recognized}"<br>` +
-                `Grade: ${grade} – ${comment}`,
-                displaySpell
-            );
-
-            if (currentSpell && SPELL_ANIMATIONS[currentSpell]) {
-                playSpellAnimation(currentSpell);
-            }
-        } else {
-            updateOutputWindow(
-                `We couldn't recognize your spell "${displaySpell}". ` +
-                (result.error || 'Please try again.'),
-                displaySpell
-            );
+        if (finished.status === 'failed') {
+            updateOutputWindow('Upload error: ' + (finished.error || 'Unknown error'));
+            return;
         }
+        renderSpellResult(finished.result || {}, job.spell || spellName);
     } catch (error) {
         console.error('Upload error:', error);
         updateOutputWindow('Upload error: ' + error.message);
     }
 }
 
+// Resolve with the finished job, via Server-Sent Events when available
+// and long-polling otherwise (or if the event stream drops).
+function waitForJob(jobId) {
+    if (!window.EventSource) {
+        return pollJob(jobId);
+    }
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        source.addEventListener('result', (event) => {
+            source.close();
+            resolve(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            source.close();
+            pollJob(jobId).then(resolve, reject);
+        };
+    });
+}
+
+async function pollJob(jobId) {
+    for (;;) {
+        const response = await fetch(`/api/jobs/${jobId}?wait=20`);
+        if (response.status === 503) {
+            const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+            await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+            continue;
+        }
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Could not fetch assessment');
+        }
+        if (job.status === 'done' || job.status === 'failed') {
+            return job;
+        }
+    }
+}
+
+function renderSpellResult(result, spellName) {
+    const displaySpell = result.spell || spellName;
+
+    if (result.success) {
+        const grade = result.grade || 'N/A';
+        const comment = result.grade_label || '';
+
+        updateOutputWindow(
+            `Spell: ${displaySpell}<br>` +
+            `Grade: ${grade} – ${comment}`,
+            displaySpell
+        );
+
+        if (currentSpell && SPELL_ANIMATIONS[currentSpell]) {
+            playSpellAnimation(currentSpell);
+        }
+    } else {
+        updateOutputWindow(
+            `We couldn't recognize your spell "${displaySpell}". ` +
+            (result.error || 'Please try again.'),
+            displaySpell
+        );
+    }
+}
+
 function showAssessmentResult(result, spellName) {
     const statusLine = document.getElementById('status-line');
     const gradeLine = document.getElementById('assessment-grade-line');
@@ -726,7 +934,8 @@ async function loadSpellData() {
     }
     
     try {
-        const response = await fetch('/api/spells');
+        // Only the fields this page uses; the browser revalidates with the ETag
+        const response = await fetch('/api/spells?fields=spell,pronunciation');
         spellDataCache = await response.json();
         return spellDataCache;
     } catch (error) {
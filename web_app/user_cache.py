@@ -0,0 +1,74 @@
+"""Per-process TTL cache of logged-in users."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    LRU of User objects keyed by id, each entry trusted for `ttl` seconds.
+
+    Authenticated requests resolve the session's user from here, so only
+    the first request after a login (or after expiry) queries Mongo.
+    Anything that changes a user's cached fields must call `invalidate`.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Cache sized by USER_CACHE_TTL / USER_CACHE_SIZE."""
+        return cls(
+            ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+            max_entries=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        )
+
+    def get(self, user_id, load):
+        """The cached user, or `load()`'s result (cached unless None)."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        user = load()
+        if user is not None:
+            self.put(user_id, user)
+        return user
+
+    def put(self, user_id, user):
+        """Remember a freshly loaded or just-created user."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (self._clock() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Forget a user so the next request reloads them."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        """Hit and miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,114 @@
+"""
+WebSocket proxy for streamed assessments.
+
+The browser streams PCM to /ws/assess here; each session is relayed to
+the ml-client's /ws/assess, so the ML service stays private and the
+session is tied to the logged-in user. Each session holds one worker
+thread (plus a short-lived relay thread) for the few seconds it lasts.
+"""
+
+import json
+import threading
+
+from flask_login import current_user
+from ml_client import CircuitOpenError
+
+try:
+    from flask_sock import Sock  # pylint: disable=import-error
+    from simple_websocket import Client, ConnectionClosed  # pylint: disable=import-error
+except ImportError:
+    Sock = Client = None
+    ConnectionClosed = ConnectionError
+
+# Messages after which the ml-client closes the session
+FINAL_EVENTS = ("result", "error")
+OPENING_TIMEOUT = 10.0
+# How often the relay thread checks whether the session is over
+POLL_SECONDS = 0.5
+
+
+def error_message(error):
+    """The JSON text of an error event."""
+    return json.dumps({"event": "error", "error": error})
+
+
+def relay(browser, upstream, opening):
+    """
+    Send `opening` upstream, then pass the browser's audio and control
+    messages to the ml-client on a helper thread while its events come
+    back on this one, until the final event or either side closes.
+    """
+    upstream.send(json.dumps(opening))
+    done = threading.Event()
+
+    def forward():
+        try:
+            while not done.is_set():
+                message = browser.receive(timeout=POLL_SECONDS)
+                if message is not None:
+                    upstream.send(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=forward, daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                message = upstream.receive(timeout=POLL_SECONDS)
+            except ConnectionClosed:
+                browser.send(error_message("ML service closed the stream"))
+                return
+            if message is None:
+                if done.is_set():
+                    # The browser went away; nothing left to answer
+                    return
+                continue
+            browser.send(message)
+            if json.loads(message).get("event") in FINAL_EVENTS:
+                return
+    finally:
+        done.set()
+        upstream.close()
+        thread.join(POLL_SECONDS * 2)
+
+
+def register_ws_proxy(app):
+    """Add the /ws/assess route; returns False when flask-sock isn't installed."""
+    if Sock is None:
+        return False
+    sock = Sock(app)
+
+    @sock.route("/ws/assess")
+    def assess_ws(ws):
+        """Relay one streamed attempt to the ml-client."""
+        if not current_user.is_authenticated:
+            ws.send(error_message("Login required"))
+            return
+        try:
+            opening = json.loads(ws.receive(timeout=OPENING_TIMEOUT) or "{}")
+        except ValueError:
+            opening = {}
+        if not opening.get("spell"):
+            ws.send(error_message("The first message must name the spell"))
+            return
+        opening["user"] = current_user.id
+
+        breaker = app.ml_client.breaker
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            ws.send(error_message(str(e)))
+            return
+        try:
+            upstream = Client.connect(app.ml_client.ws_url("/ws/assess"))
+        except Exception as e:  # pylint: disable=broad-except
+            breaker.record_failure()
+            ws.send(error_message(f"Could not reach ML service: {e}"))
+            return
+        breaker.record_success()
+        relay(ws, upstream, opening)
+
+    return True
@@ -0,0 +1,17 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn imports this module in each worker after forking (preload_app
+is off), so every worker process gets its own MongoClient, HTTP
+connection pool and password-hashing pool.
+"""
+
+import threading
+
+from app import create_app, preload_catalog
+
+app = create_app()
+# In the background so a slow Mongo doesn't hold up the worker's boot
+threading.Thread(target=preload_catalog, args=(app,), daemon=True).start()